@@ -1,48 +1,400 @@
+import argparse
 import json
 import os
+import queue
+import threading
 import time
 from datetime import datetime
-from chinese_error_corrector import ChineseErrorCorrector
+from chinese_error_corrector import (ChineseErrorCorrector, add_generation_args, add_model_args, generation_kwargs,
+                                     model_kwargs)
+from cascade_corrector import add_cascade_args, build_cascade, summarize_cascade
+from correction_cache import DEFAULT_CACHE_PATH, CorrectionCache
+from error_detector import add_detector_args, build_detector
+from text_alignment import edit_spans, split_by_alignment
+from washed_store import WashedStore, load_washed_file
+
+CONFIDENCE_ROUTES = ('skip', 'detector')
+
+# 清洗结果默认位置；不存在时回退到旧格式的ocr_washed目录（与generate_prediction.py回退到bbox_washed一致）
+DEFAULT_WASHED_PATH = "data/paddleocr_version/washed"
+LEGACY_WASHED_DIR = "data/paddleocr_version/ocr_washed"
+
+def resolve_input_path(input_dir):
+    """清洗结果路径：默认的紧凑格式目录不存在时回退到旧的ocr_washed目录，都不存在时给出明确的错误"""
+    if os.path.exists(input_dir):
+        return input_dir
+    if input_dir == DEFAULT_WASHED_PATH and os.path.exists(LEGACY_WASHED_DIR):
+        print(f"{input_dir} 不存在，使用旧格式的清洗结果 {LEGACY_WASHED_DIR}")
+        return LEGACY_WASHED_DIR
+    raise FileNotFoundError(f"清洗结果 {input_dir} 不存在，请先运行 data_washer.py 生成，或用 --input_dir 指定")
+
+class CorrectionJournal:
+    """
+    逐句追加写入的纠错日志（JSON Lines），每批生成后落盘
+
+    崩溃重启时用于恢复未写完文件中已经完成的句子；最后一行可能不完整，读取时忽略
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+
+    def load(self):
+        """返回 {(doc_id, sentence_id): (source_sentence, predict_sentence)}"""
+        entries = {}
+        if not os.path.exists(self.path):
+            return entries
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                entries[(entry["doc_id"], entry["sentence_id"])] = (entry["source_sentence"], entry["predict_sentence"])
+        return entries
+
+    def open(self, append=True):
+        """打开日志；append为False时清空旧日志"""
+        self._file = open(self.path, 'a' if append else 'w', encoding='utf-8')
+
+    def append(self, entries):
+        """追加 [(doc_id, sentence_id, source_sentence, predict_sentence), ...] 并落盘"""
+        for doc_id, sentence_id, source_sentence, predict_sentence in entries:
+            self._file.write(json.dumps({
+                "doc_id": doc_id,
+                "sentence_id": sentence_id,
+                "source_sentence": source_sentence,
+                "predict_sentence": predict_sentence
+            }, ensure_ascii=False) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def remove(self):
+        self.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def write_json_atomic(data, path):
+    """先写临时文件再改名，中途崩溃不会留下不完整的文件"""
+    temp_path = path + '.tmp'
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(temp_path, path)
+
+# 流水线队列的结束标记
+_DONE = object()
+
+def run_pipeline(items, prepare, generate, write, depth=2):
+    """
+    三段流水线：读取线程对后续的item执行prepare，当前线程（生成线程）只执行generate，写出线程执行write
+
+    prepare/generate抛出的异常作为该item的结果交给 write(item, result) 处理；
+    write抛出异常时停止流水线并在当前线程重新抛出。两个队列最多各缓存depth个item，depth为0时三步在当前线程依次执行。
+
+    Returns:
+        各阶段耗时及生成线程利用率（生成耗时 / 流水线总耗时）
+    """
+    stats = dict.fromkeys(("prepare_seconds", "generate_seconds", "write_seconds",
+                           "wait_prepare_seconds", "wait_write_seconds"), 0.0)
+    start = time.perf_counter()
+
+    def timed(name, func, *args):
+        begin = time.perf_counter()
+        try:
+            return func(*args)
+        finally:
+            stats[name] += time.perf_counter() - begin
+
+    def attempt(name, func, *args):
+        try:
+            return timed(name, func, *args)
+        except Exception as e:
+            return e
+
+    def run_generate(prepared):
+        return prepared if isinstance(prepared, Exception) else attempt("generate_seconds", generate, prepared)
+
+    if depth <= 0:
+        for item in items:
+            timed("write_seconds", write, item, run_generate(attempt("prepare_seconds", prepare, item)))
+    else:
+        prepared_queue = queue.Queue(maxsize=depth)
+        generated_queue = queue.Queue(maxsize=depth)
+        stop = threading.Event()
+        errors = []
+
+        # 另一端停止后不再阻塞
+        def put(target, value):
+            while not stop.is_set():
+                try:
+                    target.put(value, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        def get(source):
+            while not stop.is_set():
+                try:
+                    return source.get(timeout=0.1)
+                except queue.Empty:
+                    continue
+            return _DONE
+
+        def reader():
+            for item in items:
+                if not put(prepared_queue, (item, attempt("prepare_seconds", prepare, item))):
+                    return
+            put(prepared_queue, _DONE)
+
+        def writer():
+            while True:
+                entry = get(generated_queue)
+                if entry is _DONE:
+                    return
+                try:
+                    timed("write_seconds", write, *entry)
+                except BaseException as e:
+                    errors.append(e)
+                    stop.set()
+                    return
+
+        threads = [threading.Thread(target=reader, name="pipeline-reader", daemon=True),
+                   threading.Thread(target=writer, name="pipeline-writer", daemon=True)]
+        for thread in threads:
+            thread.start()
+        try:
+            while True:
+                entry = timed("wait_prepare_seconds", get, prepared_queue)
+                if entry is _DONE:
+                    break
+                item, prepared = entry
+                if not timed("wait_write_seconds", put, generated_queue, (item, run_generate(prepared))):
+                    break
+            put(generated_queue, _DONE)
+            threads[1].join()
+        finally:
+            stop.set()
+            for thread in threads:
+                thread.join()
+        if errors:
+            raise errors[0]
+
+    stats["wall_seconds"] = time.perf_counter() - start
+    stats["depth"] = depth
+    stats["generation_utilisation"] = stats["generate_seconds"] / stats["wall_seconds"] if stats["wall_seconds"] > 0 else 0.0
+    return stats
 
 class BatchCorrector:
-    def __init__(self):
-        self.corrector = ChineseErrorCorrector()
-        self.input_dir = "data/paddleocr_version/ocr_washed"
-        self.output_dir = "data/paddleocr_version/ocr_corrected"
+    def __init__(self, input_dir=DEFAULT_WASHED_PATH, output_dir="data/paddleocr_version/ocr_corrected",
+                 model_path="models/ChineseErrorCorrector2-7B", batch_size=8, corrector=None, cache=None,
+                 detector=None, confidence_threshold=None, confidence_route='skip', window_tokens=None, pipeline_depth=2):
+        # corrector可以是本地模型，也可以是纠错服务的客户端（CorrectionClient）
+        self.corrector = corrector or ChineseErrorCorrector(model_path)
+        # 句子级结果缓存（CorrectionCache），None为不使用
+        self.cache = cache
+        # 错误检测器（MLMErrorDetector），判断为无需纠错的句子直接保留原句；None为全部纠错
+        self.detector = detector
+        # 按OCR置信度路由：句中字符全部来自置信度不低于阈值的行时，
+        # 'skip' 直接保留原句，'detector' 只由检测器决定是否纠错（其余句子不经检测器直接纠错）
+        if confidence_route not in CONFIDENCE_ROUTES:
+            raise ValueError(f"未知的置信度路由方式: {confidence_route}")
+        if confidence_threshold is not None and confidence_route == 'detector' and detector is None:
+            raise ValueError("置信度路由 'detector' 需要同时启用检测器（--detector_threshold）")
+        self.confidence_threshold = confidence_threshold
+        self.confidence_route = confidence_route
+        # 清洗结果：紧凑格式目录/批量 .jsonl 文件，也兼容旧的ocr_washed目录
+        self.input_dir = input_dir
+        self.output_dir = output_dir
+        # 每次送入模型的句子数
+        self.batch_size = batch_size
+        # 段落窗口模式：把文档中连续的句子打包到该token预算内一起纠错，None为逐句纠错
+        self.window_tokens = window_tokens
+        # 分词/生成/写出流水线每个队列缓存的批数，0为在同一线程依次执行
+        self.pipeline_depth = pipeline_depth
         self.time_log_file = "correction_time_log.json"
+        # 已完成句子的追加日志，用于--resume
+        self.journal = CorrectionJournal(os.path.join(output_dir, "correction_journal.jsonl"))
         self.time_records = {
             "start_time": "",
             "end_time": "",
             "total_duration": 0,
             "files": []
         }
+
+    def make_batches(self, items, lengths=None):
+        """
+        按句子token长度排序后切分为批次，长度相近的句子在同一批，减少左侧填充
+
+        Args:
+            items: [(key, sentence), ...]
+            lengths: {key: token数}，已计算过时传入，不再重复分词
+
+        Returns:
+            [[(key, sentence), ...], ...]
+        """
+        if lengths is None:
+            lengths = {key: self.corrector.token_length(sentence) for key, sentence in items}
+        ordered = sorted(items, key=lambda item: lengths[item[0]])
+        return [ordered[i:i + self.batch_size] for i in range(0, len(ordered), self.batch_size)]
+
+    def make_windows(self, sentence_keys, documents):
+        """
+        把各文档中连续的待纠错句子按token预算打包为段落窗口
+
+        Args:
+            sentence_keys: {sentence: [(doc_id, sentence_id), ...]}，待纠错的句子
+            documents: {doc_id: (path, sentences)}
+
+        Returns:
+            {窗口文本: [placement, ...]}，placement为 (((doc_id, sentence_id), (start, end)), ...)，
+            区间为该句在窗口文本中的位置；超过预算的单个句子单独成为一个窗口
+        """
+        needed = {key for keys in sentence_keys.values() for key in keys}
+        windows = {}
+
+        def flush(window):
+            if not window:
+                return
+            placement, offset = [], 0
+            for key, sentence in window:
+                placement.append((key, (offset, offset + len(sentence))))
+                offset += len(sentence)
+            windows.setdefault(''.join(sentence for _, sentence in window), []).append(tuple(placement))
+
+        for doc_id, (_, sentences) in documents.items():
+            window, length = [], 0
+            for sentence_id, sentence in enumerate(sentences):
+                key = (doc_id, sentence_id)
+                if key not in needed:
+                    # 已完成的句子打断窗口，窗口内只有连续的句子
+                    flush(window)
+                    window, length = [], 0
+                    continue
+                sentence_length = self.corrector.token_length(sentence)
+                if window and length + sentence_length > self.window_tokens:
+                    flush(window)
+                    window, length = [], 0
+                window.append((key, sentence))
+                length += sentence_length
+            flush(window)
+        return windows
+
+    @staticmethod
+    def split_output(unit_text, output, placement):
+        """
+        把一个单元（句子或窗口）的纠错结果按字符对齐切回各句
+
+        Returns:
+            [((doc_id, sentence_id), predict_sentence), ...]
+        """
+        if len(placement) == 1:
+            return [(placement[0][0], output)]
+        parts = split_by_alignment(unit_text, output, [span for _, span in placement])
+        return [(key, part.strip()) for (key, _), part in zip(placement, parts)]
+
+    def lookup_cache(self, sentences):
+        """查询缓存，返回 {sentence: result}（未启用缓存时为空）"""
+        return self.cache.get_many(sentences) if self.cache is not None else {}
+
+    def pass_through(self, sentences):
+        """检测器判断为无需纠错的句子（未启用检测器时为空集合）"""
+        sentences = list(sentences)
+        if self.detector is None or not sentences:
+            return set()
+        return {sentence for sentence, flag in zip(sentences, self.detector.needs_correction(sentences)) if not flag}
+
+    def route(self, pending, confidences):
+        """
+        决定哪些句子不送入纠错模型
+
+        Args:
+            pending: {sentence: [(doc_id, sentence_id), ...]}
+            confidences: {(doc_id, sentence_id): 句子置信度或None}
+
+        Returns:
+            (保留原句的句子集合, 路由统计)
+        """
+        start = time.time()
+        stats = {}
+        if self.confidence_threshold is None:
+            passed = self.pass_through(pending)
+        else:
+            # 同一句子出现在多处时，所有出现位置都是高置信度才算
+            confident = [sentence for sentence, keys in pending.items()
+                         if all(confidences.get(key) is not None and confidences[key] >= self.confidence_threshold
+                                for key in keys)]
+            stats = {"threshold": self.confidence_threshold, "route": self.confidence_route,
+                     "sentences": len(pending), "confident": len(confident)}
+            if self.confidence_route == 'skip':
+                confident = set(confident)
+                passed = confident | self.pass_through(sentence for sentence in pending if sentence not in confident)
+            else:
+                passed = self.pass_through(confident)
+            stats["skipped"] = len(passed)
+        stats["seconds"] = time.time() - start
+        return passed, stats
+
+    def correct_unique(self, sentences):
+        """缓存中没有且检测器判断需要纠错的句子按长度分批纠错，结果写入缓存；返回 {sentence: result}"""
+        results = self.lookup_cache(sentences)
+        unique = [sentence for sentence in dict.fromkeys(sentences) if sentence not in results]
+        passed = self.pass_through(unique)
+        results.update((sentence, sentence) for sentence in passed)
+        pending = [(sentence, sentence) for sentence in unique if sentence not in passed]
+        for batch in self.make_batches(pending):
+            outputs = self.corrector.correct_batch([sentence for _, sentence in batch])
+            results.update(zip((sentence for sentence, _ in batch), outputs))
+            if self.cache is not None:
+                self.cache.put_many(zip((sentence for sentence, _ in batch), outputs))
+        return results
+
+    def pipeline_stages(self):
+        """
+        流水线的三步：分词、生成、解码
+
+        纠错服务的客户端没有分步接口，整批在生成步完成
+        """
+        if hasattr(self.corrector, "prepare_batch"):
+            return self.corrector.prepare_batch, self.corrector.generate_batch, self.corrector.decode_batch
+        return (lambda texts, sentence_lengths=None: texts), self.corrector.correct_batch, (lambda outputs: outputs)
+
+    def correct_sentences(self, sentences):
+        """按长度分批纠错，返回与输入顺序一致的结果"""
+        results = self.correct_unique(sentences)
+        return [results[sentence] for sentence in sentences]
         
     def process_single_file(self, input_file):
         """处理单个文件"""
+        return self.process_document(load_washed_file(input_file), os.path.basename(input_file))
+
+    def process_document(self, document, filename):
+        """处理单个文档（WashedDocument）"""
         file_start_time = time.time()
         
         try:
-            # 读取输入文件
-            with open(input_file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                
             # 准备新的数据结构
             corrected_data = {
-                "path": data["path"],
+                "path": document.path,
                 "corrected_text_list": []
             }
             
             # 处理每个句子
-            for item in data["washed_text_list"]:
-                source_sentence = item["sentence"]
-                # 纠错处理
-                corrected = self.corrector.correct(source_sentence)
-                
+            sentences = document.sentences()
+            for sentence_id, (source_sentence, corrected) in enumerate(
+                    zip(sentences, self.correct_sentences(sentences))):
                 # 添加到结果列表
                 corrected_data["corrected_text_list"].append({
-                    "sentence_id": item["sentence_id"],
+                    "sentence_id": sentence_id,
                     "source_sentence": source_sentence,
-                    "predict_sentence": corrected
+                    "predict_sentence": corrected,
+                    "edits": edit_spans(source_sentence, corrected)
                 })
                 
             # 计算处理时间
@@ -51,7 +403,7 @@ class BatchCorrector:
             
             # 记录文件处理时间
             self.time_records["files"].append({
-                "filename": os.path.basename(input_file),
+                "filename": filename,
                 "start_time": datetime.fromtimestamp(file_start_time).strftime('%Y-%m-%d %H:%M:%S'),
                 "end_time": datetime.fromtimestamp(file_end_time).strftime('%Y-%m-%d %H:%M:%S'),
                 "duration_seconds": duration
@@ -60,11 +412,32 @@ class BatchCorrector:
             return corrected_data
             
         except Exception as e:
-            print(f"处理文件 {input_file} 时出错: {str(e)}")
+            print(f"处理文件 {filename} 时出错: {str(e)}")
             return None
             
-    def process_all_files(self):
-        """处理所有文件"""
+    def is_completed(self, doc_id, sentences):
+        """输出文件已存在且原句与当前清洗结果一致"""
+        output_file = os.path.join(self.output_dir, f"{doc_id}.json")
+        if not os.path.exists(output_file):
+            return False
+        try:
+            with open(output_file, 'r', encoding='utf-8') as f:
+                corrected = json.load(f)["corrected_text_list"]
+        except (json.JSONDecodeError, KeyError):
+            return False
+        return [item["source_sentence"] for item in corrected] == sentences
+
+    def write_time_log(self):
+        write_json_atomic(self.time_records, self.time_log_file)
+
+    def process_all_files(self, resume=False, doc_ids=None):
+        """
+        处理所有文件
+
+        Args:
+            resume: 跳过已完成的输出文件，并复用日志中未写完文件已完成的句子
+            doc_ids: 只处理这些文档（多进程分片时使用），None为全部
+        """
         # 创建输出目录
         os.makedirs(self.output_dir, exist_ok=True)
         
@@ -73,42 +446,328 @@ class BatchCorrector:
         total_start_time = time.time()
         count = 0
 
-        # 处理每个文件
-        for filename in os.listdir(self.input_dir):
-            if filename.endswith('.json'):
-                print(f"正在处理文件: {filename}")
-                input_file = os.path.join(self.input_dir, filename)
-                output_file = os.path.join(self.output_dir, filename)
-                
-                # 处理文件
-                result = self.process_single_file(input_file)
-                
-                if result:
-                    # 保存处理结果
-                    with open(output_file, 'w', encoding='utf-8') as f:
-                        json.dump(result, f, ensure_ascii=False, indent=2)
-                    count += 1
-                    print(f"已完成文件处理: {count} & {filename}")
-
-                else:
-                    print(f"文件处理失败: {filename}")
-                    
+        # 收集所有文件的句子，跨文件按长度分批
+        documents = {}
+        confidences = {}
+        skipped = 0
+        self.input_dir = resolve_input_path(self.input_dir)
+        store = WashedStore(self.input_dir)
+        for doc_id in (store.doc_ids() if doc_ids is None else doc_ids):
+            document = store.get(doc_id)
+            sentences = document.sentences()
+            if resume and self.is_completed(doc_id, sentences):
+                skipped += 1
+                continue
+            documents[doc_id] = (document.path, sentences)
+            for sentence_id in range(len(sentences)):
+                confidences[(doc_id, sentence_id)] = document.sentence_confidence(sentence_id)
+        items = [((doc_id, sentence_id), sentence)
+                 for doc_id, (_, sentences) in documents.items() for sentence_id, sentence in enumerate(sentences)]
+
+        predictions = {}
+        failed = set()
+        remaining = {doc_id: len(sentences) for doc_id, (_, sentences) in documents.items()}
+
+        journal_entries = {}
+        if resume:
+            journal_entries = self.journal.load()
+            # 保留上次运行中已完成文件的时间记录
+            if os.path.exists(self.time_log_file):
+                with open(self.time_log_file, 'r', encoding='utf-8') as f:
+                    previous_files = json.load(f).get("files", [])
+                self.time_records["files"] = [record for record in previous_files
+                                              if record["filename"][:-len('.json')] not in documents]
+        self.journal.open(append=resume)
+
+        # 先用日志中已完成的句子（原句一致才复用），再查缓存；
+        # 未命中的句子去重后再送入模型，同一句子只生成一次
+        resumed = 0
+        rest = []
+        for key, sentence in items:
+            entry = journal_entries.get(key)
+            if entry is not None and entry[0] == sentence:
+                predictions[key] = entry[1]
+                remaining[key[0]] -= 1
+                resumed += 1
+            else:
+                rest.append((key, sentence))
+        # 逐句模式先按句子查缓存；段落窗口模式下按窗口文本查缓存
+        cached = self.lookup_cache([sentence for _, sentence in rest]) if not self.window_tokens else {}
+        sentence_keys = {}
+        for key, sentence in rest:
+            if sentence in cached:
+                predictions[key] = cached[sentence]
+                remaining[key[0]] -= 1
+            else:
+                sentence_keys.setdefault(sentence, []).append(key)
+        cache_hits = len(rest) - sum(map(len, sentence_keys.values()))
+
+        # 高置信度行的句子及检测器判断为无需纠错的句子保留原句，不送入模型（也不写入缓存）
+        passed, routing = self.route(sentence_keys, confidences)
+        for sentence in passed:
+            for key in sentence_keys.pop(sentence):
+                predictions[key] = sentence
+                remaining[key[0]] -= 1
+
+        # 送入模型的单元：{单元文本: [placement, ...]}，placement为 ((key, 句子在单元文本中的区间), ...)
+        if self.window_tokens:
+            pending = self.make_windows(sentence_keys, documents)
+            cached = self.lookup_cache(list(pending))
+            for window, output in cached.items():
+                for placement in pending.pop(window):
+                    for key, prediction in self.split_output(window, output, placement):
+                        predictions[key] = prediction
+                        remaining[key[0]] -= 1
+                        cache_hits += 1
+        else:
+            pending = {sentence: [((key, None),) for key in keys] for sentence, keys in sentence_keys.items()}
+        unit_name = "窗口" if self.window_tokens else "句"
+
+        # 每个单元只分词一次：分桶排序和生成上限/停止条件都使用这里的token数
+        lengths = {text: self.corrector.token_length(text) for text in pending}
+        batches = self.make_batches([(text, text) for text in pending], lengths)
+        if resume:
+            print(f"断点续跑: 跳过已完成文件 {skipped} 个, 复用日志中的句子 {resumed} 个")
+        if "confident" in routing:
+            print(f"置信度路由: {routing['sentences']} 个不同句子中 {routing['confident']} 个来自置信度>="
+                  f"{self.confidence_threshold} 的行 ({self.confidence_route}), 共 {routing['skipped']} 个保留原句, "
+                  f"耗时 {routing['seconds']:.2f} 秒")
+        if self.detector is not None:
+            print(f"检测器: {self.detector.stats['scored']} 个句子中 {self.detector.stats['passed']} 个无需纠错 "
+                  f"(阈值 {self.detector.threshold})")
+        print(f"共 {len(documents)} 个文件, {len(items)} 个句子, 缓存命中 {cache_hits}, "
+              f"待生成 {len(pending)} 个不同{'窗口' if self.window_tokens else '句子'}, {len(batches)} 批 "
+              f"(batch_size={self.batch_size})")
+
+        # 每个文件的处理时间：所在批次耗时按句子数分摊
+        file_durations = {doc_id: 0.0 for doc_id in documents}
+        file_start_times = {}
+        file_end_times = {}
+        generation_time = 0.0
+
+        def finish_document(doc_id):
+            saved = self.save_document(doc_id, documents[doc_id], predictions, failed)
+            if saved:
+                file_start_time = file_start_times.get(doc_id, time.time())
+                self.time_records["files"].append({
+                    "filename": f"{doc_id}.json",
+                    "start_time": datetime.fromtimestamp(file_start_time).strftime('%Y-%m-%d %H:%M:%S'),
+                    "end_time": datetime.fromtimestamp(file_end_times.get(doc_id, file_start_time)).strftime('%Y-%m-%d %H:%M:%S'),
+                    "duration_seconds": file_durations[doc_id]
+                })
+            return saved
+
+        # 全部命中日志/缓存或没有句子的文件
+        for doc_id in documents:
+            if remaining[doc_id] == 0:
+                count += finish_document(doc_id)
+
+        prepare_batch, generate_batch, decode_batch = self.pipeline_stages()
+
+        def generate(prepared):
+            batch_start_time = time.time()
+            generated = generate_batch(prepared)
+            return generated, batch_start_time, time.time()
+
+        # 在写出线程中执行：解码、写缓存和日志、写出已完成的文件
+        def write(item, result):
+            nonlocal count, generation_time
+            batch_idx, batch = item
+            outputs = None
+            if isinstance(result, Exception):
+                print(f"处理第 {batch_idx} 批时出错: {str(result)}")
+                batch_start_time = batch_end_time = time.time()
+            else:
+                generated, batch_start_time, batch_end_time = result
+                try:
+                    outputs = decode_batch(generated)
+                except Exception as e:
+                    print(f"处理第 {batch_idx} 批时出错: {str(e)}")
+            generation_time += batch_end_time - batch_start_time
+            if outputs is not None:
+                if self.cache is not None:
+                    self.cache.put_many(zip((text for text, _ in batch), outputs))
+                assigned = [assignment for position, (text, _) in enumerate(batch)
+                            for placement in pending[text]
+                            for assignment in self.split_output(text, outputs[position], placement)]
+                self.journal.append([(doc_id, sentence_id, documents[doc_id][1][sentence_id], prediction)
+                                     for (doc_id, sentence_id), prediction in assigned])
+                predictions.update(assigned)
+
+            batch_keys = [key for text, _ in batch for placement in pending[text] for key, _ in placement]
+            for doc_id, _ in batch_keys:
+                if outputs is None:
+                    failed.add(doc_id)
+                file_durations[doc_id] += (batch_end_time - batch_start_time) / len(batch_keys)
+                file_start_times.setdefault(doc_id, batch_start_time)
+                file_end_times[doc_id] = batch_end_time
+                remaining[doc_id] -= 1
+
+            speed = len(batch) / (batch_end_time - batch_start_time) if batch_end_time > batch_start_time else 0.0
+            print(f"已完成批次: {batch_idx}/{len(batches)} ({len(batch)} {unit_name}, {speed:.2f} {unit_name}/秒)")
+
+            # 某个文件的句子全部完成后立即写出
+            for doc_id in {key[0] for key in batch_keys}:
+                if remaining[doc_id] == 0:
+                    count += finish_document(doc_id)
+            self.write_time_log()
+
+        try:
+            # 读取线程提前对后续批次分词，生成线程只做模型计算，写出线程解码并落盘
+            pipeline = run_pipeline(list(enumerate(batches, 1)),
+                                    lambda item: prepare_batch([text for text, _ in item[1]],
+                                                               [lengths[text] for text, _ in item[1]]),
+                                    generate, write, self.pipeline_depth)
+        finally:
+            self.journal.close()
+
+        # 所有文件都已写出时日志不再需要
+        if not failed:
+            self.journal.remove()
+
+        # 吞吐量按实际送入模型的句子计算
+        generated_sentences = sum(len(placement) for placements in pending.values() for placement in placements) \
+            if self.window_tokens else len(pending)
+        sentences_per_second = generated_sentences / generation_time if generation_time > 0 else 0.0
+        self.time_records["batch_size"] = self.batch_size
+        self.time_records["window_tokens"] = self.window_tokens
+        self.time_records["sentences"] = len(items)
+        self.time_records["sentences_per_second"] = sentences_per_second
+        self.time_records["generated_sentences"] = generated_sentences
+        # 生成调用数：逐句模式为不同句子数，段落窗口模式为窗口数
+        self.time_records["generation_calls"] = len(pending)
+        self.time_records["generation_seconds"] = generation_time
+        # 各种结束方式的句子数（length为被生成上限截断的句子）
+        self.time_records["generation_stats"] = dict(self.corrector.generation_stats)
+        if self.detector is not None:
+            self.time_records["detector"] = dict(self.detector.stats, threshold=self.detector.threshold)
+        if "confident" in routing:
+            self.time_records["routing"] = routing
+        if getattr(self.corrector, "speculative", False):
+            self.time_records["speculative_stats"] = dict(self.corrector.speculative_stats)
+        if self.cache is not None:
+            self.time_records["cache"] = self.cache.stats()
+        if hasattr(self.corrector, "cascade_stats"):
+            self.time_records["cascade"] = dict(self.corrector.cascade_stats)
+        self.time_records["pipeline"] = pipeline
+        # 本次运行中加载模型各阶段的耗时（全部命中缓存时为空）
+        if getattr(self.corrector, "startup_timings", None) is not None:
+            self.time_records["startup"] = dict(self.corrector.startup_timings)
+
         # 记录结束时间和总时长
         total_end_time = time.time()
         self.time_records["end_time"] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
         self.time_records["total_duration"] = total_end_time - total_start_time
         
         # 保存时间记录
-        with open(self.time_log_file, 'w', encoding='utf-8') as f:
-            json.dump(self.time_records, f, ensure_ascii=False, indent=2)
+        self.write_time_log()
             
         print(f"\n处理完成！")
         print(f"总处理时间: {self.time_records['total_duration']:.2f} 秒")
+        print(f"吞吐量: {self.time_records['sentences_per_second']:.2f} 句/秒")
+        generation_stats = self.time_records["generation_stats"]
+        print(f"结束方式: 模型结束 {generation_stats.get('eos', 0)}, 句末标点 {generation_stats.get('sentence_end', 0)}, "
+              f"换行 {generation_stats.get('newline', 0)}, 被生成上限截断 {generation_stats.get('length', 0)}")
+        if batches:
+            print(f"生成线程利用率: {pipeline['generation_utilisation']:.1%} (生成 {pipeline['generate_seconds']:.2f} 秒, "
+                  f"等待分词 {pipeline['wait_prepare_seconds']:.2f} 秒, 等待写出 {pipeline['wait_write_seconds']:.2f} 秒; "
+                  f"分词 {pipeline['prepare_seconds']:.2f} 秒, 写出 {pipeline['write_seconds']:.2f} 秒, "
+                  f"队列深度 {self.pipeline_depth})")
+        if "speculative_stats" in self.time_records:
+            stats = self.time_records["speculative_stats"]
+            print(f"投机解码: 草稿接受率 {stats['accepted'] / max(stats['drafted'], 1):.1%}, "
+                  f"每次前向 {stats['tokens'] / max(stats['forward_passes'], 1):.2f} token")
+        if "cascade" in self.time_records:
+            print(summarize_cascade(self.time_records["cascade"]))
+        if self.cache is not None:
+            print(f"缓存命中率: {self.cache.hit_rate:.1%} ({self.cache.hits}/{self.cache.hits + self.cache.misses}), "
+                  f"缓存条目: {len(self.cache)}")
         print(f"详细时间记录已保存到: {self.time_log_file}")
 
+    def save_document(self, doc_id, document_info, predictions, failed):
+        """组装并保存单个文件的纠错结果，成功返回1"""
+        filename = f"{doc_id}.json"
+        if doc_id in failed:
+            print(f"文件处理失败: {filename}")
+            return 0
+
+        path, sentences = document_info
+        result = {
+            "path": path,
+            "corrected_text_list": [
+                {
+                    "sentence_id": sentence_id,
+                    "source_sentence": source_sentence,
+                    "predict_sentence": predictions[(doc_id, sentence_id)],
+                    # 原句到纠错结果的编辑，区间为在原句（清洗结果中的句子）中的字符偏移
+                    "edits": edit_spans(source_sentence, predictions[(doc_id, sentence_id)])
+                }
+                for sentence_id, source_sentence in enumerate(sentences)
+            ]
+        }
+        write_json_atomic(result, os.path.join(self.output_dir, filename))
+        print(f"已完成文件处理: {filename}")
+        return 1
+
+def add_corrector_args(parser):
+    """添加纠错相关的命令行参数（batch_corrector与parallel_corrector共用）"""
+    parser.add_argument('--input_dir', type=str, default=DEFAULT_WASHED_PATH,
+                        help='清洗结果目录或 .jsonl 批量文件')
+    parser.add_argument('--output_dir', type=str, default="data/paddleocr_version/ocr_corrected")
+    parser.add_argument('--model_path', type=str, default="models/ChineseErrorCorrector2-7B")
+    parser.add_argument('--batch_size', type=int, default=8, help='每批句子数（跨文件按token长度分桶）')
+    add_model_args(parser)
+    add_generation_args(parser)
+    parser.add_argument('--resume', action='store_true',
+                        help='断点续跑：跳过已完成的输出文件，并复用日志中未写完文件已完成的句子')
+    parser.add_argument('--cache_path', type=str, default=DEFAULT_CACHE_PATH, help='句子级纠错结果缓存（SQLite）')
+    parser.add_argument('--no_cache', action='store_true', help='不读写结果缓存')
+    parser.add_argument('--cache_max_entries', type=int, default=None, help='缓存最多条目数，超出按最近使用淘汰')
+    parser.add_argument('--cache_max_mb', type=float, default=None, help='缓存结果最大总大小（MB）')
+    parser.add_argument('--time_log_file', type=str, default="correction_time_log.json")
+    add_detector_args(parser)
+    parser.add_argument('--window_tokens', type=int, default=None,
+                        help='段落窗口模式：把文档中连续的句子打包到该token预算内一起纠错，再按字符对齐切回各句')
+    parser.add_argument('--confidence_threshold', type=float, default=None,
+                        help='句中字符全部来自OCR置信度不低于该值的行时按 --confidence_route 处理')
+    parser.add_argument('--confidence_route', type=str, default='skip', choices=CONFIDENCE_ROUTES,
+                        help='skip: 保留原句; detector: 只由检测器决定是否纠错，其余句子不经检测器直接纠错')
+    add_cascade_args(parser)
+    parser.add_argument('--pipeline_depth', type=int, default=2,
+                        help='读取线程提前分词、写出线程解码落盘时每个队列缓存的批数，0为在同一线程依次执行')
+
+def build_batch_corrector(args, model=None):
+    """按命令行参数创建BatchCorrector；model为None时在本进程加载纠错模型"""
+    if model is None:
+        model = ChineseErrorCorrector(args.model_path, **model_kwargs(args), **generation_kwargs(args))
+        # 指定 --cascade_model_path 时先由小模型纠错，没有把握的句子再交给该模型
+        model = build_cascade(args, model, **model_kwargs(args), **generation_kwargs(args))
+    cache = None
+    if not args.no_cache:
+        max_bytes = int(args.cache_max_mb * 1024 * 1024) if args.cache_max_mb else None
+        cache = CorrectionCache(args.cache_path, model.cache_context(), args.cache_max_entries, max_bytes)
+    corrector = BatchCorrector(args.input_dir, args.output_dir, args.model_path, args.batch_size, model, cache,
+                               build_detector(args), args.confidence_threshold, args.confidence_route,
+                               args.window_tokens, args.pipeline_depth)
+    corrector.time_log_file = args.time_log_file
+    return corrector
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='批量文本纠错')
+    add_corrector_args(parser)
+    parser.add_argument('--server', type=str, default=None,
+                        help='使用已启动的纠错服务（Unix socket路径或host:port），不在本进程加载模型')
+    return parser.parse_args()
+
 def main():
-    corrector = BatchCorrector()
-    corrector.process_all_files()
+    args = parse_args()
+    model = None
+    if args.server:
+        # 生成长度参数由服务端决定
+        from correction_server import CorrectionClient
+        model = CorrectionClient(args.server)
+    corrector = build_batch_corrector(args, model)
+    corrector.process_all_files(resume=args.resume)
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
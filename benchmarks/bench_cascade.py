@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+两级纠错（小模型优先，没有把握时升级到大模型）的对比
+句子来源与 sweep_detector_threshold.py 相同：--eval_file（含参考答案），
+或 evaluation_scores/<得分>/predict.json 拆成的句子对（以其中的纠错结果为参考）
+
+1. 大模型、小模型分别纠正全部句子，记录每级的每批延迟和F0.5
+2. 对每组阈值（最小token概率 x 改动比例）模拟两级纠错：报告升级率、F0.5和估算耗时
+   （小模型全部耗时 + 升级句子数 x 大模型平均每句耗时）
+3. 用CascadeCorrector按 --min_confidence/--max_edit_ratio 实际运行一次，报告升级率、每级延迟和F0.5
+
+用法（在仓库根目录执行）:
+    python benchmarks/bench_cascade.py --small_model_path models/ChineseErrorCorrector-1.5B --limit 200
+    python benchmarks/bench_cascade.py --small_model_path models/small --eval_file data/heldout_sentences.jsonl
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.sweep_detector_threshold import load_predict_pairs
+from cascade_corrector import CascadeCorrector, needs_escalation, summarize_cascade
+from chinese_error_corrector import ChineseErrorCorrector, add_generation_args, generation_kwargs
+from correction_metrics import load_eval_file, mean_f05
+from generation_metrics import percentile
+
+
+def run_tier(corrector, sources, batch_size, with_confidence=False):
+    """按批纠正全部句子，返回 (结果, token概率, 每批延迟)"""
+    outputs, confidences, latencies = [], [], []
+    for i in range(0, len(sources), batch_size):
+        batch = sources[i:i + batch_size]
+        start = time.perf_counter()
+        if with_confidence:
+            batch_outputs, batch_confidences = corrector.correct_batch_with_confidence(batch)
+            confidences.extend(batch_confidences)
+        else:
+            batch_outputs = corrector.correct_batch(batch)
+        latencies.append(time.perf_counter() - start)
+        outputs.extend(batch_outputs)
+    return outputs, confidences, latencies
+
+
+def parse_thresholds(text):
+    """逗号分隔的阈值，'none'为不使用该条件"""
+    return [None if value.strip().lower() == 'none' else float(value) for value in text.split(',')]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='两级纠错对比')
+    parser.add_argument('--predict_file', type=str, default='evaluation_scores/0.5102/predict.json')
+    parser.add_argument('--eval_file', type=str, default=None, help='评测句子集（JSON/JSONL，含source和target）')
+    parser.add_argument('--model_path', type=str, default='models/ChineseErrorCorrector2-7B', help='大模型')
+    parser.add_argument('--small_model_path', type=str, required=True, help='小模型')
+    parser.add_argument('--batch_size', type=int, default=8)
+    parser.add_argument('--limit', type=int, default=None, help='只取前N个句子')
+    parser.add_argument('--min_confidence', type=float, default=0.5, help='实际运行时的最小token概率阈值')
+    parser.add_argument('--max_edit_ratio', type=float, default=0.3, help='实际运行时的改动比例阈值')
+    parser.add_argument('--confidences', type=str, default=None,
+                        help='模拟的最小token概率阈值（逗号分隔，none为不按概率升级），'
+                             '不指定时取none及小模型概率的10%%,30%%,50%%,70%%,90%%分位数')
+    parser.add_argument('--edit_ratios', type=str, default='none,0.1,0.3,0.5', help='模拟的改动比例阈值')
+    add_generation_args(parser)
+    args = parser.parse_args()
+
+    if args.eval_file:
+        sources, targets = load_eval_file(args.eval_file)
+    else:
+        sources, targets = load_predict_pairs(args.predict_file)
+    sources, targets = sources[:args.limit], targets[:args.limit]
+    if not sources:
+        print("没有评测句子")
+        return
+    reference_name = '参考答案' if args.eval_file else '记录的纠错结果'
+
+    if args.speculative:
+        print("警告: 投机解码不提供token概率，按最小token概率升级的条件不生效")
+    small = ChineseErrorCorrector(args.small_model_path, **generation_kwargs(args))
+    large = ChineseErrorCorrector(args.model_path, **generation_kwargs(args))
+    # 先加载模型，加载耗时不计入延迟
+    small.model, large.model
+
+    small_outputs, confidences, small_latencies = run_tier(small, sources, args.batch_size, with_confidence=True)
+    large_outputs, _, large_latencies = run_tier(large, sources, args.batch_size)
+    small_seconds, large_seconds = sum(small_latencies), sum(large_latencies)
+    large_per_sentence = large_seconds / len(sources)
+
+    print(f"句子数: {len(sources)}, F0.5相对{reference_name}计算")
+    print(f"\n{'模型':<8} {'F0.5':>8} {'总耗时(秒)':>10} {'p50(ms/批)':>12} {'p90(ms/批)':>12} {'句/秒':>8}")
+    for name, outputs, latencies in (("小模型", small_outputs, small_latencies),
+                                     ("大模型", large_outputs, large_latencies)):
+        print(f"{name:<8} {mean_f05(targets, outputs):>8.4f} {sum(latencies):>10.2f} "
+              f"{percentile(latencies, 50) * 1000:>12.1f} {percentile(latencies, 90) * 1000:>12.1f} "
+              f"{len(sources) / sum(latencies):>8.2f}")
+
+    print(f"\n模拟两级纠错（估算耗时 = 小模型耗时 + 升级句子数 x 大模型平均每句 {large_per_sentence * 1000:.1f} ms）")
+    print(f"{'最小概率':>8} {'改动比例':>8} {'升级率':>8} {'F0.5':>8} {'估算耗时(秒)':>12} {'相对大模型':>10}")
+    if args.confidences:
+        confidence_thresholds = parse_thresholds(args.confidences)
+    else:
+        known = sorted(confidence for confidence in confidences if confidence is not None)
+        confidence_thresholds = [None] + sorted({round(known[len(known) * q // 10], 6) for q in (1, 3, 5, 7, 9)}
+                                                if known else set())
+    for min_confidence in confidence_thresholds:
+        for max_edit_ratio in parse_thresholds(args.edit_ratios):
+            escalate = [needs_escalation(source, output, confidence, min_confidence, max_edit_ratio) is not None
+                        for source, output, confidence in zip(sources, small_outputs, confidences)]
+            outputs = [large_output if flag else small_output
+                       for small_output, large_output, flag in zip(small_outputs, large_outputs, escalate)]
+            seconds = small_seconds + sum(escalate) * large_per_sentence
+            print(f"{str(min_confidence):>8} {str(max_edit_ratio):>8} {sum(escalate) / len(sources):>8.1%} "
+                  f"{mean_f05(targets, outputs):>8.4f} {seconds:>12.2f} {seconds / large_seconds:>10.1%}")
+
+    cascade = CascadeCorrector(small, large, args.min_confidence, args.max_edit_ratio)
+    start = time.perf_counter()
+    outputs = []
+    for i in range(0, len(sources), args.batch_size):
+        outputs.extend(cascade.correct_batch(sources[i:i + args.batch_size]))
+    wall = time.perf_counter() - start
+    stats = cascade.cascade_stats
+    print(f"\n实际运行（最小概率 {args.min_confidence}, 改动比例 {args.max_edit_ratio}）: F0.5 "
+          f"{mean_f05(targets, outputs):.4f}, 总耗时 {wall:.2f} 秒（大模型 {large_seconds:.2f} 秒）")
+    print(summarize_cascade(stats))
+    print(f"每句延迟: 小模型 {stats['small_seconds'] / max(stats['small_sentences'], 1) * 1000:.1f} ms, "
+          f"大模型 {stats['large_seconds'] / max(stats['large_sentences'], 1) * 1000:.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+纠错器冷启动对比
+把基线版本（默认上一个提交）导出到临时目录，与当前工作区分别在新进程中测量：
+1. 首次纠错时间：导入模块、创建ChineseErrorCorrector、完成第一句纠错的耗时（含解释器启动）
+2. 全部命中缓存的增量运行：两个版本使用同一个结果缓存运行 batch_corrector.py 的进程总耗时
+
+用法（在仓库根目录执行）:
+    python benchmarks/bench_cold_start.py --input_dir data/paddleocr_version/washed --repeats 3
+    python benchmarks/bench_cold_start.py --baseline_ref HEAD~3 --model_path models/ChineseErrorCorrector2-7B
+"""
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+FIRST_CORRECTION = """
+import json, sys, time
+start = time.perf_counter()
+from chinese_error_corrector import ChineseErrorCorrector
+imported = time.perf_counter()
+corrector = ChineseErrorCorrector(sys.argv[1])
+constructed = time.perf_counter()
+corrector.correct(sys.argv[2])
+done = time.perf_counter()
+print(json.dumps({"import": imported - start, "construct": constructed - imported, "first_correct": done - constructed}))
+"""
+
+
+def export_tree(ref, target):
+    """用git archive导出指定版本的文件"""
+    archive = subprocess.run(['git', 'archive', ref], cwd=ROOT, check=True, capture_output=True).stdout
+    subprocess.run(['tar', '-x', '-C', target], input=archive, check=True)
+
+
+def run_timed(command, cwd):
+    """运行子进程，返回 (墙钟时间, 标准输出最后一行)"""
+    start = time.perf_counter()
+    result = subprocess.run(command, cwd=cwd, capture_output=True, text=True)
+    elapsed = time.perf_counter() - start
+    if result.returncode != 0:
+        raise RuntimeError(f"{' '.join(command)} 失败:\n{result.stderr[-2000:]}")
+    lines = result.stdout.strip().splitlines()
+    return elapsed, lines[-1] if lines else ""
+
+
+def median(values):
+    ordered = sorted(values)
+    return ordered[len(ordered) // 2]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='纠错器冷启动对比')
+    parser.add_argument('--baseline_ref', type=str, default='HEAD~1', help='作为基线的git版本')
+    parser.add_argument('--model_path', type=str, default='models/ChineseErrorCorrector2-7B')
+    parser.add_argument('--input_dir', type=str, default='data/paddleocr_version/washed',
+                        help='增量运行的输入目录，为空字符串时跳过增量运行')
+    parser.add_argument('--sentence', type=str, default='少先队员因该为老人让坐。')
+    parser.add_argument('--repeats', type=int, default=3)
+    args = parser.parse_args()
+    model_path = os.path.abspath(args.model_path)
+
+    work_dir = tempfile.mkdtemp(prefix='bench_cold_start_')
+    baseline_dir = os.path.join(work_dir, 'baseline')
+    os.makedirs(baseline_dir)
+    export_tree(args.baseline_ref, baseline_dir)
+    trees = [(f"基线 {args.baseline_ref}", baseline_dir), ("当前", ROOT)]
+    cache_path = os.path.join(work_dir, 'cache.db')
+
+    try:
+        if args.input_dir:
+            input_dir = os.path.abspath(args.input_dir)
+
+            def batch_command(name, index):
+                out = os.path.join(work_dir, f"{name}_{index}")
+                return [sys.executable, 'batch_corrector.py', '--input_dir', input_dir, '--output_dir', out,
+                        '--model_path', model_path, '--cache_path', cache_path,
+                        '--time_log_file', out + '_time_log.json']
+
+            # 先用当前版本填充结果缓存，之后两个版本的运行都全部命中
+            print("填充结果缓存...")
+            run_timed(batch_command('warmup', 0), ROOT)
+
+        results = []
+        for label, tree in trees:
+            first, phases, incremental = [], [], []
+            for index in range(args.repeats):
+                elapsed, line = run_timed([sys.executable, '-c', FIRST_CORRECTION, model_path, args.sentence], tree)
+                first.append(elapsed)
+                phases.append(json.loads(line))
+                if args.input_dir:
+                    name = 'baseline' if tree == baseline_dir else 'current'
+                    incremental.append(run_timed(batch_command(name, index), tree)[0])
+                print(f"{label} 第{index + 1}次: 首次纠错 {elapsed:.2f} 秒"
+                      + (f", 增量运行 {incremental[-1]:.2f} 秒" if incremental else ""))
+            best = min(range(len(first)), key=lambda i: first[i])
+            results.append((label, median(first), phases[best], median(incremental) if incremental else None))
+
+        print(f"\n{'版本':<16} {'首次纠错(秒)':>12} {'导入':>8} {'创建':>8} {'第一句':>8} {'增量运行(秒)':>12}")
+        for label, first, phase, incremental in results:
+            print(f"{label:<16} {first:>12.2f} {phase['import']:>8.2f} {phase['construct']:>8.2f} "
+                  f"{phase['first_correct']:>8.2f} " + (f"{incremental:>12.2f}" if incremental is not None else f"{'-':>12}"))
+        print("首次纠错和增量运行取中位数，分阶段耗时取首次纠错最快的一次；均含解释器启动")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
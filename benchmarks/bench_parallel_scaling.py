@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+多进程分片纠错的扩展效率
+分别用1/2/4/8个进程处理同一批清洗结果（不使用结果缓存），报告墙钟时间、吞吐量、
+加速比和扩展效率（加速比/进程数），并检查各进程数下的输出与单进程一致
+
+用法（在仓库根目录执行）:
+    python benchmarks/bench_parallel_scaling.py --input_dir data/paddleocr_version/washed --workers 1,2,4,8
+"""
+
+import argparse
+import filecmp
+import os
+import shutil
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from batch_corrector import add_corrector_args
+from parallel_corrector import run_sharded
+
+
+def same_outputs(dir_a, dir_b):
+    names = sorted(name for name in os.listdir(dir_a) if name.endswith('.json'))
+    if names != sorted(name for name in os.listdir(dir_b) if name.endswith('.json')):
+        return False
+    return all(filecmp.cmp(os.path.join(dir_a, name), os.path.join(dir_b, name), shallow=False) for name in names)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='多进程分片纠错的扩展效率')
+    add_corrector_args(parser)
+    parser.add_argument('--workers', type=str, default='1,2,4,8', help='逗号分隔的进程数')
+    parser.add_argument('--balance', type=str, default='sentences', choices=['sentences', 'tokens'])
+    parser.add_argument('--devices', type=str, default=None, help='逗号分隔的GPU编号，不指定时使用CPU')
+    args = parser.parse_args()
+    args.no_cache = True
+    args.resume = False
+
+    work_dir = tempfile.mkdtemp(prefix='bench_parallel_')
+    results = []
+    try:
+        for num_workers in [int(n) for n in args.workers.split(',')]:
+            args.output_dir = os.path.join(work_dir, f"workers_{num_workers}")
+            args.time_log_file = os.path.join(work_dir, f"time_log_{num_workers}.json")
+            merged = run_sharded(args, num_workers)
+            generation_seconds = max((shard["generation_seconds"] for shard in merged["shards"]), default=0)
+            results.append((num_workers, merged["total_duration"], merged["generated_sentences"], generation_seconds,
+                            args.output_dir))
+
+        print(f"\n可用CPU核心: {len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else os.cpu_count()}")
+        print(f"{'进程数':>6} {'墙钟(秒)':>10} {'句/秒':>8} {'加速比':>8} {'效率':>8} {'仅生成句/秒':>12} {'输出一致':>8}")
+        base_workers, base_wall = results[0][0], results[0][1]
+        for num_workers, wall, sentences, generation_seconds, output_dir in results:
+            speedup = base_wall / wall if wall > 0 else 0.0
+            efficiency = speedup * base_workers / num_workers
+            generation_rate = sentences / generation_seconds if generation_seconds > 0 else 0.0
+            print(f"{num_workers:>6} {wall:>10.2f} {sentences / wall:>8.2f} {speedup:>8.2f} {efficiency:>8.1%} "
+                  f"{generation_rate:>12.2f} {str(same_outputs(results[0][4], output_dir)):>8}")
+        print("墙钟时间包含各进程加载模型的时间；“仅生成”按最慢分片的生成耗时计算")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+分词/生成/写出流水线的对比
+同一个模型以不同的队列深度处理同一批清洗结果（每次使用新的结果缓存，写缓存、日志和输出文件的开销都计入），
+报告总耗时、生成耗时、生成线程利用率及等待时间，并检查各深度的输出与深度0（同一线程依次执行）一致
+
+用法（在仓库根目录执行）:
+    python benchmarks/bench_pipeline.py --input_dir data/paddleocr_version/washed --depths 0,1,2,4
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from batch_corrector import add_corrector_args, build_batch_corrector
+from chinese_error_corrector import ChineseErrorCorrector, generation_kwargs, model_kwargs
+
+
+def load_outputs(output_dir):
+    outputs = {}
+    for name in sorted(os.listdir(output_dir)):
+        if name.endswith('.json'):
+            with open(os.path.join(output_dir, name), 'r', encoding='utf-8') as f:
+                outputs[name] = json.load(f)
+    return outputs
+
+
+def main():
+    parser = argparse.ArgumentParser(description='分词/生成/写出流水线的对比')
+    add_corrector_args(parser)
+    parser.add_argument('--depths', type=str, default='0,1,2,4', help='逗号分隔的队列深度')
+    args = parser.parse_args()
+    args.resume = False
+    args.no_cache = False
+
+    model = ChineseErrorCorrector(args.model_path, **model_kwargs(args), **generation_kwargs(args))
+    work_dir = tempfile.mkdtemp(prefix='bench_pipeline_')
+    results = []
+    try:
+        # 先运行一次加载模型，避免首次运行计入加载耗时
+        args.pipeline_depth = 0
+        args.output_dir = os.path.join(work_dir, "warmup")
+        args.cache_path = os.path.join(work_dir, "warmup.sqlite")
+        args.time_log_file = os.path.join(work_dir, "time_log_warmup.json")
+        build_batch_corrector(args, model).process_all_files()
+
+        for depth in [int(n) for n in args.depths.split(',')]:
+            args.pipeline_depth = depth
+            args.output_dir = os.path.join(work_dir, f"depth_{depth}")
+            args.cache_path = os.path.join(work_dir, f"cache_{depth}.sqlite")
+            args.time_log_file = os.path.join(work_dir, f"time_log_{depth}.json")
+            corrector = build_batch_corrector(args, model)
+            corrector.process_all_files()
+            results.append((depth, corrector.time_records, load_outputs(args.output_dir)))
+
+        print(f"\n{'队列深度':>8} {'总耗时(秒)':>10} {'流水线(秒)':>10} {'生成(秒)':>10} {'利用率':>8} "
+              f"{'等待分词':>8} {'等待写出':>8} {'分词(秒)':>8} {'写出(秒)':>8} {'输出一致':>8}")
+        baseline = results[0][2]
+        for depth, records, outputs in results:
+            pipeline = records["pipeline"]
+            print(f"{depth:>8} {records['total_duration']:>10.2f} {pipeline['wall_seconds']:>10.2f} "
+                  f"{pipeline['generate_seconds']:>10.2f} {pipeline['generation_utilisation']:>8.1%} "
+                  f"{pipeline['wait_prepare_seconds']:>8.2f} {pipeline['wait_write_seconds']:>8.2f} "
+                  f"{pipeline['prepare_seconds']:>8.2f} {pipeline['write_seconds']:>8.2f} "
+                  f"{'是' if outputs == baseline else '否':>8}")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+复用对话模板+prompt前缀KV cache的效果
+对每个句子分别测量完整prefill（前缀+句子）与复用前缀cache后只prefill句子部分的耗时，
+并检查两种方式的纠错结果是否一致
+
+用法（在仓库根目录执行）:
+    python benchmarks/bench_prefix_cache.py --num_sentences 64 --check_outputs 8
+"""
+
+import argparse
+import copy
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import torch
+
+from chinese_error_corrector import ChineseErrorCorrector
+from washed_store import WashedStore
+
+
+def timed_forward(model, input_ids, past_key_values=None):
+    """一次prefill前向的耗时（秒）"""
+    start = time.perf_counter()
+    with torch.no_grad():
+        model(input_ids, past_key_values=past_key_values, use_cache=True)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description='前缀KV cache复用的prefill耗时对比')
+    parser.add_argument('--input_dir', type=str, default='data/paddleocr_version/washed')
+    parser.add_argument('--model_path', type=str, default='models/ChineseErrorCorrector2-7B')
+    parser.add_argument('--num_sentences', type=int, default=64)
+    parser.add_argument('--check_outputs', type=int, default=8, help='比较多少句的完整生成结果')
+    args = parser.parse_args()
+
+    sentences = []
+    for _, document in WashedStore(args.input_dir):
+        sentences.extend(document.sentences())
+        if len(sentences) >= args.num_sentences:
+            break
+    sentences = sentences[:args.num_sentences]
+    if not sentences:
+        print(f"未找到输入: {args.input_dir}")
+        return
+
+    corrector = ChineseErrorCorrector(args.model_path)
+    model, tokenizer = corrector.model, corrector.tokenizer
+    template_ids = corrector.template_ids()
+    if template_ids is None:
+        print("该分词器无法按句子切分对话模板，前缀缓存不可用")
+        return
+    prefix_ids, suffix_ids = template_ids
+
+    cache_start = time.perf_counter()
+    prefix_cache = corrector.prefix_cache(prefix_ids)
+    cache_time = time.perf_counter() - cache_start
+
+    full_times, cached_times, tokenize_full, tokenize_sentence = [], [], [], []
+    full_tokens, cached_tokens = [], []
+    for sentence in sentences:
+        start = time.perf_counter()
+        full_ids = tokenizer(corrector.build_input_text(sentence)).input_ids
+        tokenize_full.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        row = corrector._sentence_ids(sentence, prefix_ids, suffix_ids)
+        tokenize_sentence.append(time.perf_counter() - start)
+
+        full_times.append(timed_forward(model, torch.tensor([full_ids], device=model.device)))
+        cached_times.append(timed_forward(model, torch.tensor([row], device=model.device),
+                                          copy.deepcopy(prefix_cache)))
+        full_tokens.append(len(full_ids))
+        cached_tokens.append(len(row))
+
+    print(f"句子数: {len(sentences)}, 前缀token数: {len(prefix_ids)}, 前缀cache计算一次耗时: {cache_time * 1000:.1f} ms")
+    print(f"每次调用prefill token: 完整 {statistics.mean(full_tokens):.1f} -> 复用前缀 {statistics.mean(cached_tokens):.1f}")
+    print(f"每次调用prefill耗时: 完整 {statistics.mean(full_times) * 1000:.2f} ms -> "
+          f"复用前缀 {statistics.mean(cached_times) * 1000:.2f} ms "
+          f"(每次节省 {(statistics.mean(full_times) - statistics.mean(cached_times)) * 1000:.2f} ms)")
+    print(f"每次调用分词耗时: 完整模板 {statistics.mean(tokenize_full) * 1e6:.0f} us -> "
+          f"只分句子 {statistics.mean(tokenize_sentence) * 1e6:.0f} us")
+
+    if args.check_outputs:
+        checked = sentences[:args.check_outputs]
+        corrector.use_prefix_cache = False
+        plain = [corrector.correct(sentence) for sentence in checked]
+        corrector.use_prefix_cache = True
+        cached = [corrector.correct(sentence) for sentence in checked]
+        batched = corrector.correct_batch(checked)
+        print(f"生成结果一致: 逐句 {sum(a == b for a, b in zip(plain, cached))}/{len(checked)}, "
+              f"批量 {sum(a == b for a, b in zip(plain, batched))}/{len(checked)}")
+
+
+if __name__ == '__main__':
+    main()
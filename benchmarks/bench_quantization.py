@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+int8动态量化CPU推理与未量化模型的对比
+每种模式在独立的子进程中加载模型并纠错同一组句子，报告生成速度（token/秒）、进程峰值内存，
+以及量化后F0.5的变化：
+- 提供 --eval_file（含source/target）时，分别计算两种模式相对参考答案的F0.5
+- 否则以未量化模型的输出为参考，计算量化模型输出的F0.5和完全一致的比例
+
+用法（在仓库根目录执行）:
+    python benchmarks/bench_quantization.py --num_sentences 64 --num_threads 8
+    python benchmarks/bench_quantization.py --eval_file data/heldout_sentences.jsonl
+"""
+
+import argparse
+import multiprocessing
+import os
+import random
+import resource
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from chinese_error_corrector import add_generation_args
+from correction_metrics import load_eval_file, mean_f05
+from washed_store import WashedStore
+
+
+def sample_sentences(input_dir, num_sentences, seed):
+    sentences = [sentence for _, document in WashedStore(input_dir) for sentence in document.sentences()]
+    random.Random(seed).shuffle(sentences)
+    return sentences[:num_sentences]
+
+
+def run_mode(quantize, args, sentences, result_queue):
+    """子进程：加载模型、纠错并返回结果和资源占用"""
+    from chinese_error_corrector import ChineseErrorCorrector, generation_kwargs
+
+    load_start = time.perf_counter()
+    corrector = ChineseErrorCorrector(args.model_path, quantize=quantize, num_threads=args.num_threads,
+                                      num_interop_threads=args.num_interop_threads, **generation_kwargs(args))
+    load_seconds = time.perf_counter() - load_start
+
+    outputs = []
+    start = time.perf_counter()
+    for i in range(0, len(sentences), args.batch_size):
+        outputs.extend(corrector.correct_batch(sentences[i:i + args.batch_size]))
+    seconds = time.perf_counter() - start
+
+    result_queue.put({
+        "outputs": outputs,
+        "load_seconds": load_seconds,
+        "seconds": seconds,
+        # 生成token数按输出文本重新分词统计（不含结束符）
+        "tokens": sum(corrector.token_length(output) for output in outputs),
+        # Linux下ru_maxrss单位为KB
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    })
+
+
+def measure(quantize, args, sentences):
+    """在独立进程中运行，保证峰值内存互不影响"""
+    context = multiprocessing.get_context('spawn')
+    result_queue = context.Queue()
+    process = context.Process(target=run_mode, args=(quantize, args, sentences, result_queue))
+    process.start()
+    result = result_queue.get()
+    process.join()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='int8动态量化的速度、内存和效果对比')
+    parser.add_argument('--model_path', type=str, default='models/ChineseErrorCorrector2-7B')
+    parser.add_argument('--input_dir', type=str, default='data/paddleocr_version/washed',
+                        help='没有--eval_file时从清洗结果中抽样句子')
+    parser.add_argument('--eval_file', type=str, default=None, help='评测句子集（JSON/JSONL，含source和可选target）')
+    parser.add_argument('--num_sentences', type=int, default=64)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--batch_size', type=int, default=8)
+    parser.add_argument('--num_threads', type=int, default=None)
+    parser.add_argument('--num_interop_threads', type=int, default=None)
+    add_generation_args(parser)
+    args = parser.parse_args()
+
+    targets = None
+    if args.eval_file:
+        sentences, targets = load_eval_file(args.eval_file)
+    else:
+        sentences = sample_sentences(args.input_dir, args.num_sentences, args.seed)
+    if not sentences:
+        print("没有评测句子")
+        return
+
+    results = {mode: measure(mode, args, sentences) for mode in ('none', 'int8')}
+
+    print(f"句子数: {len(sentences)}, batch_size={args.batch_size}, num_threads={args.num_threads}")
+    print(f"{'模式':>6} {'加载(秒)':>10} {'生成(秒)':>10} {'token/秒':>10} {'峰值内存(MB)':>14}")
+    for mode, result in results.items():
+        print(f"{mode:>6} {result['load_seconds']:>10.2f} {result['seconds']:>10.2f} "
+              f"{result['tokens'] / result['seconds']:>10.2f} {result['peak_rss_mb']:>14.0f}")
+
+    baseline, quantized = results['none']['outputs'], results['int8']['outputs']
+    if targets is not None:
+        f05_baseline, f05_quantized = mean_f05(targets, baseline), mean_f05(targets, quantized)
+        print(f"F0.5（相对参考答案）: 未量化 {f05_baseline:.4f}, int8 {f05_quantized:.4f}, "
+              f"变化 {f05_quantized - f05_baseline:+.4f}")
+    print(f"int8相对未量化输出: F0.5 {mean_f05(baseline, quantized):.4f}, "
+          f"完全一致 {sum(a == b for a, b in zip(baseline, quantized))}/{len(sentences)}")
+
+
+if __name__ == '__main__':
+    main()
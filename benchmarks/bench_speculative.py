@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+从原句取草稿的投机解码（prompt lookup）与普通贪心解码的对比
+两种方式逐句纠错同一组句子，检查输出是否完全一致，并报告草稿接受率、
+每次前向得到的token数和加速比
+
+用法（在仓库根目录执行）:
+    python benchmarks/bench_speculative.py --num_sentences 64 --num_draft_tokens 8
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from chinese_error_corrector import ChineseErrorCorrector, add_generation_args, generation_kwargs
+from washed_store import WashedStore
+
+
+def sample_sentences(input_dir, num_sentences, seed):
+    sentences = [sentence for _, document in WashedStore(input_dir) for sentence in document.sentences()]
+    random.Random(seed).shuffle(sentences)
+    return sentences[:num_sentences]
+
+
+def timed_correct(corrector, sentences):
+    outputs = []
+    start = time.perf_counter()
+    for sentence in sentences:
+        outputs.append(corrector.correct(sentence))
+    return outputs, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description='投机解码与贪心解码的速度和一致性对比')
+    parser.add_argument('--input_dir', type=str, default='data/paddleocr_version/washed')
+    parser.add_argument('--model_path', type=str, default='models/ChineseErrorCorrector2-7B')
+    parser.add_argument('--num_sentences', type=int, default=64)
+    parser.add_argument('--seed', type=int, default=0)
+    add_generation_args(parser)
+    args = parser.parse_args()
+
+    sentences = sample_sentences(args.input_dir, args.num_sentences, args.seed)
+    if not sentences:
+        print(f"未找到输入: {args.input_dir}")
+        return
+
+    kwargs = generation_kwargs(args)
+    kwargs["speculative"] = False
+    corrector = ChineseErrorCorrector(args.model_path, **kwargs)
+    # 预热（前缀cache等）
+    corrector.correct(sentences[0])
+
+    corrector.speculative = False
+    greedy, greedy_seconds = timed_correct(corrector, sentences)
+    corrector.speculative = True
+    speculative, speculative_seconds = timed_correct(corrector, sentences)
+
+    stats = corrector.speculative_stats
+    tokens = sum(corrector.token_length(output) for output in greedy)
+    print(f"句子数: {len(sentences)}, 每轮最多草稿token: {corrector.num_draft_tokens}")
+    print(f"输出完全一致: {sum(a == b for a, b in zip(greedy, speculative))}/{len(sentences)}")
+    print(f"草稿接受率: {stats['accepted'] / max(stats['drafted'], 1):.1%} ({stats['accepted']}/{stats['drafted']})")
+    print(f"每次前向生成token: {stats['tokens'] / max(stats['forward_passes'], 1):.2f} "
+          f"({stats['tokens']} token / {stats['forward_passes']} 次前向)")
+    print(f"耗时: 贪心 {greedy_seconds:.2f} 秒 ({tokens / greedy_seconds:.1f} token/秒) -> "
+          f"投机 {speculative_seconds:.2f} 秒 ({tokens / speculative_seconds:.1f} token/秒), "
+          f"加速比 {greedy_seconds / speculative_seconds:.2f}")
+    mismatched = [(s, a, b) for s, a, b in zip(sentences, greedy, speculative) if a != b]
+    for sentence, a, b in mismatched[:5]:
+        print(f"不一致: {sentence!r}\n  贪心: {a!r}\n  投机: {b!r}")
+
+
+if __name__ == '__main__':
+    main()
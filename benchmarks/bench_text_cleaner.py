@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+文本清理引擎基准测试
+对比旧版逐次re.finditer + set索引的实现与预编译掩码引擎TextCleaner：
+1. 在ocr_summary的全部文档上校验输出完全一致
+2. 在拼接得到的长OCR文本上比较耗时
+
+用法（在仓库根目录执行）:
+    python benchmarks/bench_text_cleaner.py --input_dir data/paddleocr_version/ocr_summary
+"""
+
+import argparse
+import glob
+import json
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data_washer import CLEAN_PATTERNS, TextCleaner
+
+
+def legacy_clean_text_with_bbox(text, chars):
+    """旧版实现（逐条规则finditer，set记录删除位置，字符串+=拼接）"""
+    if not text or not chars:
+        return text, chars
+
+    to_delete = set()
+    for pattern in CLEAN_PATTERNS:
+        for match in re.finditer(pattern, text):
+            start, end = match.span()
+            to_delete.update(range(start, end))
+
+    filtered_chars = []
+    filtered_text = ""
+    current_pos = 0
+    for char_info in chars:
+        if current_pos not in to_delete:
+            filtered_chars.append(char_info)
+            filtered_text += char_info["char"]
+        current_pos += 1
+    return filtered_text, filtered_chars
+
+
+def legacy_clean_document(fragments):
+    """旧版文档流程：process_file逐片段清理一次，split_sentences对全文再清理一次"""
+    all_text = ""
+    all_chars = []
+    for text, chars in fragments:
+        if text and chars:
+            cleaned_text, cleaned_chars = legacy_clean_text_with_bbox(text, chars)
+            if cleaned_text and cleaned_chars:
+                all_text += cleaned_text
+                all_chars.extend(cleaned_chars)
+    text, chars = legacy_clean_text_with_bbox(all_text, all_chars)
+    return all_text, text, chars
+
+
+def load_fragments(input_dir):
+    documents = []
+    for path in sorted(glob.glob(os.path.join(input_dir, '*_results.json'))):
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        documents.append([(r.get('source_text', ''), r.get('char_boxes', [])) for r in data.get('results', [])])
+    return documents
+
+
+def timed(func, repeat):
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='文本清理引擎基准测试')
+    parser.add_argument('--input_dir', type=str, default='data/paddleocr_version/ocr_summary')
+    parser.add_argument('--long_docs', type=int, default=20, help='拼接多少篇文档构成一条长文本')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    documents = load_fragments(args.input_dir)
+    if not documents:
+        print(f"未找到输入文件: {args.input_dir}")
+        return
+    cleaner = TextCleaner()
+
+    # 1. 逐文档一致性与耗时
+    legacy_time, legacy_results = timed(lambda: [legacy_clean_document(doc) for doc in documents], args.repeat)
+    engine_time, engine_results = timed(lambda: [cleaner.clean_document(doc) for doc in documents], args.repeat)
+    mismatches = sum(1 for a, b in zip(legacy_results, engine_results) if a != b)
+    print(f"文档数: {len(documents)}, 输出不一致: {mismatches}")
+    print(f"逐文档清理  旧版: {legacy_time * 1000:.1f} ms  新版: {engine_time * 1000:.1f} ms  "
+          f"加速: {legacy_time / engine_time:.1f}x")
+
+    # 2. 长文本：将多篇文档的片段拼接为一条长OCR文本
+    long_texts = []
+    flat = [fragment for doc in documents for fragment in doc if fragment[0] and fragment[1]]
+    for i in range(0, len(flat), args.long_docs):
+        group = flat[i:i + args.long_docs]
+        long_texts.append((''.join(t for t, _ in group), [c for _, chars in group for c in chars]))
+    avg_len = sum(len(t) for t, _ in long_texts) / len(long_texts)
+
+    legacy_time, legacy_results = timed(lambda: [legacy_clean_text_with_bbox(t, c) for t, c in long_texts], args.repeat)
+    engine_time, engine_results = timed(lambda: [cleaner.clean(t, c) for t, c in long_texts], args.repeat)
+    mismatches = sum(1 for a, b in zip(legacy_results, engine_results) if a != b)
+    print(f"长文本数: {len(long_texts)}, 平均长度: {avg_len:.0f} 字符, 输出不一致: {mismatches}")
+    print(f"长文本清理  旧版: {legacy_time * 1000:.1f} ms  新版: {engine_time * 1000:.1f} ms  "
+          f"加速: {legacy_time / engine_time:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
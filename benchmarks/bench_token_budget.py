@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+按字符切分与按纠错模型token预算切分的对比
+统计每次生成调用的输入token数（含固定prompt和chat模板）、句子token数分布、
+过短句子数量以及按文件顺序组batch时的padding比例
+
+用法（在仓库根目录执行）:
+    python benchmarks/bench_token_budget.py --token_budget 48 --batch_size 8
+"""
+
+import argparse
+import glob
+import os
+import statistics
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from chinese_error_corrector import DEFAULT_PROMPT
+from data_washer import PaddleTextWasher
+
+
+def call_token_counts(tokenizer, sentences):
+    """每个句子作为一次生成调用时的输入token数"""
+    counts = []
+    for sentence in sentences:
+        messages = [{"role": "user", "content": DEFAULT_PROMPT + sentence}]
+        input_ids = tokenizer.apply_chat_template(messages, tokenize=True, add_generation_prompt=True)
+        if isinstance(input_ids, dict) or hasattr(input_ids, 'keys'):
+            input_ids = input_ids['input_ids']
+        counts.append(len(input_ids))
+    return counts
+
+
+def padding_fraction(lengths, batch_size):
+    """按顺序每batch_size个为一批、左padding到批内最长时，padding token占比"""
+    padded = real = 0
+    for i in range(0, len(lengths), batch_size):
+        batch = lengths[i:i + batch_size]
+        padded += max(batch) * len(batch)
+        real += sum(batch)
+    return 1 - real / padded if padded else 0.0
+
+
+def report(name, tokenizer, documents, washer, batch_size, short_tokens):
+    sentences = []
+    for document in documents:
+        text = document['text']
+        for start, end in washer.sentence_spans(text):
+            sentence = text[start:end].strip()
+            if sentence:
+                sentences.append(sentence)
+
+    totals = call_token_counts(tokenizer, sentences)
+    sentence_tokens = [len(tokenizer(s, add_special_tokens=False)['input_ids']) for s in sentences]
+    print(f"[{name}]")
+    print(f"  生成调用数: {len(sentences)}  (每篇文档 {len(sentences) / len(documents):.1f})")
+    print(f"  每次调用输入token: 平均 {statistics.mean(totals):.1f}, "
+          f"中位数 {statistics.median(totals):.0f}, 最小 {min(totals)}, 最大 {max(totals)}")
+    print(f"  句子token: 平均 {statistics.mean(sentence_tokens):.1f}, 标准差 {statistics.pstdev(sentence_tokens):.1f}, "
+          f"少于{short_tokens}个token的句子 {sum(1 for n in sentence_tokens if n < short_tokens)}")
+    print(f"  batch_size={batch_size} 顺序组批padding比例: {padding_fraction(totals, batch_size):.1%}, "
+          f"按长度排序后: {padding_fraction(sorted(totals), batch_size):.1%}")
+    return ''.join(sentences)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='按token预算切分的效果对比')
+    parser.add_argument('--input_dir', type=str, default='data/paddleocr_version/ocr_summary')
+    parser.add_argument('--corrector_tokenizer', type=str, default='models/ChineseErrorCorrector2-7B')
+    parser.add_argument('--token_budget', type=int, default=48)
+    parser.add_argument('--batch_size', type=int, default=8)
+    parser.add_argument('--short_tokens', type=int, default=8, help='统计少于多少个token的过短句子')
+    args = parser.parse_args()
+
+    char_washer = PaddleTextWasher()
+    token_washer = PaddleTextWasher(length_unit='token', token_budget=args.token_budget,
+                                    corrector_tokenizer_path=args.corrector_tokenizer)
+    documents = [char_washer.load_document(path)
+                 for path in sorted(glob.glob(os.path.join(args.input_dir, '*_results.json')))]
+    if not documents:
+        print(f"未找到输入文件: {args.input_dir}")
+        return
+
+    tokenizer = token_washer.corrector_tokenizer
+    before = report('按字符切分 (max_sentence_length=50)', tokenizer, documents, char_washer,
+                    args.batch_size, args.short_tokens)
+    after = report(f'按token预算切分 (token_budget={args.token_budget})', tokenizer, documents, token_washer,
+                   args.batch_size, args.short_tokens)
+    print(f"切分后文本一致: {before == after}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+清洗结果存储格式对比
+比较旧的 bbox_washed + ocr_washed 与紧凑格式（目录或 .jsonl 批量文件）的磁盘占用和解析耗时。
+解析耗时按下游的实际用法计算：纠错阶段读取句子，预测阶段读取每个句子的字符和bbox。
+
+用法（在仓库根目录执行，先分别以 legacy 和 compact 格式运行 data_washer.py）:
+    python benchmarks/bench_washed_format.py --washed data/paddleocr_version/washed
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from washed_store import WashedStore
+
+
+def disk_usage(path):
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path) if name.endswith('.json'))
+
+
+def load_legacy(bbox_dir, ocr_dir):
+    """旧格式：纠错阶段读ocr_washed，预测阶段读bbox_washed"""
+    char_count = 0
+    for filename in sorted(os.listdir(ocr_dir)):
+        if not filename.endswith('.json'):
+            continue
+        with open(os.path.join(ocr_dir, filename), 'r', encoding='utf-8') as f:
+            [item['sentence'] for item in json.load(f)['washed_text_list']]
+        with open(os.path.join(bbox_dir, filename), 'r', encoding='utf-8') as f:
+            bbox_data = json.load(f)
+        char_count += sum(len(sentence['chars']) for sentence in bbox_data['sentences'])
+    return char_count
+
+
+def load_compact(path):
+    """紧凑格式：同一份文件同时提供句子和字符bbox"""
+    char_count = 0
+    for _, document in WashedStore(path):
+        sentences = document.sentences()
+        char_count += sum(len(document.sentence_chars(i)) for i in range(len(sentences)))
+    return char_count
+
+
+def timed(func, repeat):
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='清洗结果存储格式对比')
+    parser.add_argument('--bbox_washed_dir', type=str, default='data/paddleocr_version/bbox_washed')
+    parser.add_argument('--ocr_washed_dir', type=str, default='data/paddleocr_version/ocr_washed')
+    parser.add_argument('--washed', type=str, default='data/paddleocr_version/washed',
+                        help='紧凑格式目录或 .jsonl 批量文件')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    legacy_bytes = disk_usage(args.bbox_washed_dir) + disk_usage(args.ocr_washed_dir)
+    compact_bytes = disk_usage(args.washed)
+    legacy_time, legacy_chars = timed(lambda: load_legacy(args.bbox_washed_dir, args.ocr_washed_dir), args.repeat)
+    compact_time, compact_chars = timed(lambda: load_compact(args.washed), args.repeat)
+
+    print(f"旧格式 (bbox_washed + ocr_washed): {legacy_bytes / 1024:.0f} KB, 解析 {legacy_time * 1000:.1f} ms, "
+          f"字符框 {legacy_chars}")
+    print(f"紧凑格式 ({args.washed}): {compact_bytes / 1024:.0f} KB, 解析 {compact_time * 1000:.1f} ms, "
+          f"字符框 {compact_chars}")
+    print(f"磁盘占用缩小 {legacy_bytes / compact_bytes:.1f}x, 解析加速 {legacy_time / compact_time:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+段落窗口纠错与逐句纠错的对比
+同一个模型分别以逐句模式和段落窗口模式处理同一批清洗结果（不使用结果缓存），
+报告每个文档的生成调用数、生成耗时与总耗时，以及两种模式逐句结果的一致程度
+
+用法（在仓库根目录执行）:
+    python benchmarks/bench_window_correction.py --input_dir data/paddleocr_version/washed --windows 64,128,256
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from batch_corrector import add_corrector_args, build_batch_corrector
+from chinese_error_corrector import ChineseErrorCorrector, generation_kwargs, model_kwargs
+from correction_metrics import compute_f05_char_level
+
+
+def load_predictions(output_dir):
+    predictions = {}
+    for name in sorted(os.listdir(output_dir)):
+        if not name.endswith('.json'):
+            continue
+        with open(os.path.join(output_dir, name), 'r', encoding='utf-8') as f:
+            for item in json.load(f)["corrected_text_list"]:
+                predictions[(name, item["sentence_id"])] = item["predict_sentence"]
+    return predictions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='段落窗口纠错与逐句纠错的对比')
+    add_corrector_args(parser)
+    parser.add_argument('--windows', type=str, default='64,128,256', help='逗号分隔的窗口token预算')
+    args = parser.parse_args()
+    args.no_cache = True
+    args.resume = False
+
+    model = ChineseErrorCorrector(args.model_path, **model_kwargs(args), **generation_kwargs(args))
+    work_dir = tempfile.mkdtemp(prefix='bench_window_')
+    results = []
+    try:
+        for window_tokens in [None] + [int(n) for n in args.windows.split(',')]:
+            args.window_tokens = window_tokens
+            args.output_dir = os.path.join(work_dir, f"window_{window_tokens or 0}")
+            args.time_log_file = os.path.join(work_dir, f"time_log_{window_tokens or 0}.json")
+            corrector = build_batch_corrector(args, model)
+            corrector.process_all_files()
+            records = corrector.time_records
+            results.append((window_tokens, len(records["files"]), records, load_predictions(args.output_dir)))
+
+        print(f"\n{'模式':>10} {'文件数':>6} {'生成调用':>8} {'调用/文档':>10} {'生成(秒)':>10} {'总耗时(秒)':>10} "
+              f"{'句/秒':>8} {'与逐句一致':>10} {'F0.5':>8}")
+        baseline = results[0][3]
+        for window_tokens, files, records, predictions in results:
+            same = sum(predictions.get(key) == value for key, value in baseline.items())
+            f05 = sum(compute_f05_char_level(value, predictions.get(key, '')) for key, value in baseline.items()) \
+                / len(baseline) if baseline else 0.0
+            label = f"窗口{window_tokens}" if window_tokens else "逐句"
+            print(f"{label:>10} {files:>6} {records['generation_calls']:>8} "
+                  f"{records['generation_calls'] / max(files, 1):>10.2f} {records['generation_seconds']:>10.2f} "
+                  f"{records['total_duration']:>10.2f} {records['sentences_per_second']:>8.2f} "
+                  f"{same:>5}/{len(baseline):<4} {f05:>8.4f}")
+        print("F0.5为各模式逐句结果相对逐句模式结果的平均值")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+错误检测器阈值扫描：节省的生成调用数与损失的F0.5
+对每个阈值，得分低于阈值的句子保留原句，其余取纠错结果，报告送入生成模型的句子比例和F0.5的变化
+
+句子来源：
+- 默认读取 evaluation_scores/<得分>/predict.json，把文档级 source_text/predict_text 按原文的空格切分并对齐为句子对，
+  以其中的纠错结果作为“全部纠错”的输出；没有参考答案，F0.5相对全部纠错的输出计算（不设检测器时为1）
+- 提供 --eval_file（含source和target）时，用纠错模型纠正全部句子，F0.5相对参考答案计算
+
+用法（在仓库根目录执行）:
+    python benchmarks/sweep_detector_threshold.py --predict_file evaluation_scores/0.5102/predict.json
+    python benchmarks/sweep_detector_threshold.py --eval_file data/heldout_sentences.jsonl --thresholds 4,6,8,10
+"""
+
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from correction_metrics import load_eval_file, mean_f05
+from error_detector import DEFAULT_DETECTOR_PATH, MLMErrorDetector
+from text_alignment import segment_spans, split_by_alignment
+
+
+def load_predict_pairs(predict_file):
+    """predict.json 中的文档拆成 (原句, 纠错结果) 句子对"""
+    with open(predict_file, 'r', encoding='utf-8') as f:
+        items = json.load(f)
+    sources, corrected = [], []
+    for item in items:
+        source_text, predict_text = item["source_text"], item["predict_text"]
+        if not source_text:
+            continue
+        spans = segment_spans(source_text)
+        for (start, end), output in zip(spans, split_by_alignment(source_text, predict_text, spans)):
+            sentence = source_text[start:end].strip()
+            if sentence:
+                sources.append(sentence)
+                corrected.append(output.strip())
+    return sources, corrected
+
+
+def correct_all(args, sources):
+    from chinese_error_corrector import ChineseErrorCorrector, generation_kwargs
+
+    corrector = ChineseErrorCorrector(args.model_path, **generation_kwargs(args))
+    outputs = []
+    for i in range(0, len(sources), args.batch_size):
+        outputs.extend(corrector.correct_batch(sources[i:i + args.batch_size]))
+    return outputs
+
+
+def main():
+    from chinese_error_corrector import add_generation_args
+
+    parser = argparse.ArgumentParser(description='错误检测器阈值扫描')
+    parser.add_argument('--predict_file', type=str, default='evaluation_scores/0.5102/predict.json')
+    parser.add_argument('--eval_file', type=str, default=None, help='评测句子集（JSON/JSONL，含source和target）')
+    parser.add_argument('--model_path', type=str, default='models/ChineseErrorCorrector2-7B',
+                        help='使用 --eval_file 时的纠错模型')
+    parser.add_argument('--batch_size', type=int, default=8)
+    parser.add_argument('--detector_model_path', type=str, default=DEFAULT_DETECTOR_PATH)
+    parser.add_argument('--detector_max_rows', type=int, default=256)
+    parser.add_argument('--thresholds', type=str, default=None,
+                        help='逗号分隔的阈值，不指定时取句子得分的0%%,10%%,...,90%%分位数')
+    add_generation_args(parser)
+    args = parser.parse_args()
+
+    targets = None
+    if args.eval_file:
+        sources, targets = load_eval_file(args.eval_file)
+        corrected = correct_all(args, sources)
+    else:
+        sources, corrected = load_predict_pairs(args.predict_file)
+    if not sources:
+        print("没有评测句子")
+        return
+    references = targets if targets is not None else corrected
+
+    detector = MLMErrorDetector(args.detector_model_path, max_rows=args.detector_max_rows)
+    scores = detector.score(sources)
+    print(f"句子数: {len(sources)}, 检测耗时 {detector.stats['seconds']:.2f} 秒 "
+          f"({len(sources) / detector.stats['seconds']:.1f} 句/秒)")
+
+    if args.thresholds:
+        thresholds = [float(t) for t in args.thresholds.split(',')]
+    else:
+        ordered = sorted(scores)
+        thresholds = sorted({ordered[len(ordered) * q // 10] for q in range(10)})
+
+    changed = [source != output for source, output in zip(sources, corrected)]
+    full_f05 = mean_f05(references, corrected)
+    print(f"全部纠错: F0.5 {full_f05:.4f}（相对{'参考答案' if targets is not None else '全部纠错的输出'}），"
+          f"纠错模型改动的句子 {sum(changed)}/{len(sources)}")
+    print(f"{'阈值':>8} {'送入生成':>10} {'节省调用':>10} {'F0.5':>8} {'F0.5损失':>10} {'保留的改动':>12}")
+    for threshold in thresholds:
+        flags = [score >= threshold for score in scores]
+        gated = [output if flag else source for source, output, flag in zip(sources, corrected, flags)]
+        f05 = mean_f05(references, gated)
+        kept = sum(flag and change for flag, change in zip(flags, changed))
+        print(f"{threshold:>8.2f} {sum(flags):>10} {1 - sum(flags) / len(sources):>10.1%} {f05:>8.4f} "
+              f"{full_f05 - f05:>10.4f} {kept:>6}/{sum(changed):<5}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+两级纠错：小模型先纠正每个句子，只有小模型没有把握的句子再交给大模型（ChineseErrorCorrector2-7B）
+
+满足任一条件的句子升级到大模型：
+- 小模型生成token的最小概率低于 min_confidence
+- 小模型改动的字符数超过原句字符数的 max_edit_ratio
+
+CascadeCorrector的接口与ChineseErrorCorrector相同（correct / correct_batch / token_length / cache_context），
+可以直接交给BatchCorrector使用。
+"""
+
+import os
+import time
+
+from text_alignment import edit_spans
+
+
+def edit_ratio(source, target):
+    """改动的字符数（替换/删除/插入取两侧较长者）占原句字符数的比例"""
+    changed = 0
+    for edit in edit_spans(source, target):
+        (i1, i2), (j1, j2) = edit["source_span"], edit["target_span"]
+        changed += max(i2 - i1, j2 - j1)
+    return changed / max(len(source), 1)
+
+
+def needs_escalation(source, output, confidence, min_confidence, max_edit_ratio):
+    """
+    小模型的结果是否需要交给大模型
+
+    Returns:
+        升级原因：'low_confidence'、'edit_ratio'，不需要升级时为None
+    """
+    if min_confidence is not None and confidence is not None and confidence < min_confidence:
+        return "low_confidence"
+    if max_edit_ratio is not None and edit_ratio(source, output) > max_edit_ratio:
+        return "edit_ratio"
+    return None
+
+
+class CascadeCorrector:
+    """
+    小模型优先、大模型兜底的两级纠错器
+
+    Args:
+        small: 小模型的ChineseErrorCorrector，纠正所有句子
+        large: 大模型的ChineseErrorCorrector，只纠正升级的句子（没有句子升级时不会加载）
+        min_confidence: 小模型生成token的最小概率低于该值时升级，None为不按概率升级
+        max_edit_ratio: 小模型改动超过原句字符数的该比例时升级，None为不按改动升级
+    """
+
+    def __init__(self, small, large, min_confidence=0.5, max_edit_ratio=0.3):
+        self.small = small
+        self.large = large
+        self.min_confidence = min_confidence
+        self.max_edit_ratio = max_edit_ratio
+        # 升级统计及每级的调用数、句子数和耗时
+        self.cascade_stats = {
+            "sentences": 0, "escalated": 0, "low_confidence": 0, "edit_ratio": 0,
+            "small_calls": 0, "small_sentences": 0, "small_seconds": 0.0,
+            "large_calls": 0, "large_sentences": 0, "large_seconds": 0.0,
+        }
+
+    @property
+    def generation_stats(self):
+        """两级生成的结束方式之和（升级的句子在两级各计一次）"""
+        stats = dict(self.small.generation_stats)
+        for reason, count in self.large.generation_stats.items():
+            stats[reason] = stats.get(reason, 0) + count
+        return stats
+
+    @property
+    def startup_timings(self):
+        timings = {f"小模型 {name}": seconds for name, seconds in self.small.startup_timings.items()}
+        timings.update((f"大模型 {name}", seconds) for name, seconds in self.large.startup_timings.items())
+        return timings
+
+    def token_length(self, text):
+        # 所有句子都先经过小模型，按小模型的分词分桶
+        return self.small.token_length(text)
+
+    def cache_context(self):
+        return {
+            "cascade": {
+                "small": self.small.cache_context(),
+                "large": self.large.cache_context(),
+                "min_confidence": self.min_confidence,
+                "max_edit_ratio": self.max_edit_ratio,
+            }
+        }
+
+    def correct(self, text):
+        return self.correct_batch([text])[0]
+
+    def correct_batch(self, texts):
+        return self.correct_batch_with_tiers(texts)[0]
+
+    def correct_batch_with_tiers(self, texts):
+        """
+        两级纠错
+
+        Returns:
+            (纠错结果列表, 每句的升级原因列表（未升级为None）)
+        """
+        if not texts:
+            return [], []
+        stats = self.cascade_stats
+        start = time.perf_counter()
+        outputs, confidences = self.small.correct_batch_with_confidence(texts)
+        stats["small_seconds"] += time.perf_counter() - start
+        stats["small_calls"] += 1
+        stats["small_sentences"] += len(texts)
+
+        reasons = [needs_escalation(text, output, confidence, self.min_confidence, self.max_edit_ratio)
+                   for text, output, confidence in zip(texts, outputs, confidences)]
+        escalated = [index for index, reason in enumerate(reasons) if reason is not None]
+        stats["sentences"] += len(texts)
+        stats["escalated"] += len(escalated)
+        for reason in reasons:
+            if reason is not None:
+                stats[reason] += 1
+
+        if escalated:
+            start = time.perf_counter()
+            large_outputs = self.large.correct_batch([texts[index] for index in escalated])
+            stats["large_seconds"] += time.perf_counter() - start
+            stats["large_calls"] += 1
+            stats["large_sentences"] += len(escalated)
+            for index, output in zip(escalated, large_outputs):
+                outputs[index] = output
+        return outputs, reasons
+
+
+def summarize_cascade(stats):
+    """升级率及每级平均耗时的一行摘要"""
+    def per_call(tier):
+        return stats[f"{tier}_seconds"] / stats[f"{tier}_calls"] * 1000 if stats[f"{tier}_calls"] else 0.0
+
+    return (f"两级纠错: 升级 {stats['escalated']}/{stats['sentences']} "
+            f"({stats['escalated'] / max(stats['sentences'], 1):.1%}; 低概率 {stats['low_confidence']}, "
+            f"改动过多 {stats['edit_ratio']}), 小模型 {stats['small_seconds']:.2f} 秒 "
+            f"({per_call('small'):.1f} ms/批), 大模型 {stats['large_seconds']:.2f} 秒 ({per_call('large'):.1f} ms/批)")
+
+
+def add_cascade_args(parser):
+    """添加两级纠错相关的命令行参数"""
+    parser.add_argument('--cascade_model_path', type=str, default=None,
+                        help='启用两级纠错：先用该小模型纠错，没有把握的句子再交给 --model_path 的模型')
+    parser.add_argument('--cascade_min_confidence', type=float, default=0.5,
+                        help='小模型生成token的最小概率低于该值时升级，<=0 为不按概率升级')
+    parser.add_argument('--cascade_max_edit_ratio', type=float, default=0.3,
+                        help='小模型改动超过原句字符数的该比例时升级，<0 为不按改动升级')
+
+
+def tier_metrics_file(metrics_file, tier):
+    """小模型的生成记录写入单独的文件：xxx.jsonl -> xxx.small.jsonl"""
+    if not metrics_file:
+        return None
+    root, ext = os.path.splitext(metrics_file)
+    return f"{root}.{tier}{ext}"
+
+
+def build_cascade(args, large, **kwargs):
+    """
+    按命令行参数把大模型包装为两级纠错器，未指定 --cascade_model_path 时直接返回large
+
+    Args:
+        kwargs: 小模型的ChineseErrorCorrector参数（与大模型相同的模型加载和生成参数）
+    """
+    if not args.cascade_model_path:
+        return large
+    from chinese_error_corrector import ChineseErrorCorrector
+
+    if getattr(args, "speculative", False) and args.cascade_min_confidence > 0:
+        # 投机解码不计算token概率，小模型的结果没有置信度
+        print("警告: 投机解码不提供token概率，--cascade_min_confidence 不生效，只按改动比例升级")
+    kwargs["metrics_file"] = tier_metrics_file(kwargs.get("metrics_file"), "small")
+    small = ChineseErrorCorrector(args.cascade_model_path, **kwargs)
+    return CascadeCorrector(small, large,
+                            args.cascade_min_confidence if args.cascade_min_confidence > 0 else None,
+                            args.cascade_max_edit_ratio if args.cascade_max_edit_ratio >= 0 else None)
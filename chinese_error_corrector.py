@@ -1,42 +1,709 @@
-import torch
-from transformers import AutoModelForCausalLM, AutoTokenizer
+import copy
+import glob
+import hashlib
+import json
+import math
+import os
+import sys
+import time
+from contextlib import contextmanager
+
+# torch和transformers导入需要数秒，首次加载分词器/模型时才导入，
+# 全部命中缓存或断点续跑已完成的运行不会导入
+from generation_metrics import MetricsWriter, StepTimer, build_record
+
+# 纠错prompt，待纠错句子直接拼接在其后
+DEFAULT_PROMPT = "你是一个文本纠错专家，纠正输入句子中的语法、拼写、标点错误，并输出语义通顺的句子，输入句子为："
+
+# 套用对话模板时代替句子的占位符，用于切分出模板的前缀和后缀
+_SENTENCE_PLACEHOLDER = "\x00SENTENCE\x00"
+
+# 输出长度达到输入长度后，遇到这些字符即停止生成
+SENTENCE_END_CHARS = "。！？；!?;"
+
+# 固定上限（未启用按输入长度限制时使用）
+MAX_NEW_TOKENS = 512
+
+# 所有生成路径（批量、前缀缓存、投机解码、两级纠错）统一使用贪心解码，
+# 不跟随模型generation_config中的采样/重复惩罚设置，各路径的结果才可比
+GREEDY_DECODING = {
+    "do_sample": False,
+    "num_beams": 1,
+    "repetition_penalty": 1.0,
+    "temperature": None,
+    "top_p": None,
+    "top_k": None,
+}
+
+QUANTIZE_MODES = ('none', 'int8')
+
+# 预先分好词的对话模板前缀/后缀，按分词器文件和prompt区分
+DEFAULT_TEMPLATE_CACHE = "data/paddleocr_version/template_ids.json"
+
+
+def tokenizer_fingerprint(model_path):
+    """分词器及对话模板相关文件的指纹"""
+    digest = hashlib.sha256()
+    for path in sorted(glob.glob(os.path.join(model_path, "tokenizer*")) +
+                       glob.glob(os.path.join(model_path, "*.jinja")) +
+                       glob.glob(os.path.join(model_path, "vocab*")) +
+                       glob.glob(os.path.join(model_path, "merges.txt"))):
+        digest.update(os.path.basename(path).encode('utf-8'))
+        with open(path, 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()[:16]
+
+
+def set_torch_threads(num_threads=None, num_interop_threads=None):
+    """设置torch算子内/算子间线程数（算子间线程数只能在首次并行计算前设置）"""
+    import torch
+
+    if num_threads:
+        torch.set_num_threads(num_threads)
+    if num_interop_threads:
+        try:
+            torch.set_num_interop_threads(num_interop_threads)
+        except RuntimeError:
+            print("警告: 算子间线程数只能在首次并行计算前设置，已忽略 num_interop_threads")
+
+
+def quantize_int8(model):
+    """对所有Linear层做int8动态量化（权重int8，激活在运行时量化），仅用于CPU推理"""
+    import torch
+    from torch.ao.quantization import quantize_dynamic
+
+    return quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+
+
+def lookup_draft(source_ids, generated, num_draft, max_ngram=3, cursor=0):
+    """
+    从原句中取草稿token（prompt lookup）
+
+    用已生成部分末尾的n-gram（n从max_ngram到1）在原句token中查找，取匹配位置之后的num_draft个token。
+    纠错输出基本按顺序复制原句，优先取cursor（上次匹配到的位置）之后的匹配。
+
+    Returns:
+        (draft, match_end)，match_end为草稿在原句中的起始位置；找不到时draft为空
+    """
+    for n in range(min(max_ngram, len(generated)), 0, -1):
+        tail = generated[-n:]
+        fallback = None
+        for start in range(len(source_ids) - n):
+            if source_ids[start:start + n] == tail:
+                if start + n >= cursor:
+                    return source_ids[start + n:start + n + num_draft], start + n
+                if fallback is None:
+                    fallback = start + n
+        if fallback is not None:
+            return source_ids[fallback:fallback + num_draft], fallback
+    return [], cursor
+
+
+class CorrectionStoppingCriteria:
+    """
+    逐行判断是否停止生成
+
+    generate只要求停止条件可调用，这里不继承transformers的StoppingCriteria，导入本模块时不必加载torch
+
+    - 生成token数达到该行上限：截断（length）
+    - 生成token数不少于句子token数，且最后一个token以换行或句末标点结尾：停止（newline / sentence_end）
+
+    Args:
+        tokenizer: 用于解码最后一个token
+        prompt_length: 输入（含填充）的token数
+        sentence_lengths: 每行句子的token数
+        limits: 每行的max_new_tokens
+        eos_token_ids: 模型自身的结束token，以其结束的行不计入截断
+        copy_stop: 是否启用遇换行/句末标点停止
+    """
+
+    def __init__(self, tokenizer, prompt_length, sentence_lengths, limits, eos_token_ids, copy_stop=True):
+        self.tokenizer = tokenizer
+        self.prompt_length = prompt_length
+        self.sentence_lengths = sentence_lengths
+        self.limits = limits
+        self.eos_token_ids = set(eos_token_ids)
+        self.copy_stop = copy_stop
+        # 每行的结束原因：None为未结束，'eos'为模型自行结束
+        self.reasons = [None] * len(limits)
+        # 每行结束时已生成的token数
+        self.finished_at = [None] * len(limits)
+        self._token_text = {}
+
+    def _ends_with(self, token_id):
+        """token解码后以换行/句末标点结尾时返回对应原因"""
+        if token_id not in self._token_text:
+            self._token_text[token_id] = self.tokenizer.decode([token_id])
+        text = self._token_text[token_id]
+        if text.endswith("\n"):
+            return "newline"
+        if text and text[-1] in SENTENCE_END_CHARS:
+            return "sentence_end"
+        return None
+
+    def update(self, row, token_id, generated):
+        """
+        第row行生成了第generated个token（token_id）后更新结束原因
+
+        Returns:
+            该行是否已结束
+        """
+        if self.reasons[row] is None and generated > 0:
+            if token_id in self.eos_token_ids:
+                self.reasons[row] = "eos"
+            elif self.copy_stop and generated >= self.sentence_lengths[row] and self._ends_with(token_id):
+                self.reasons[row] = self._ends_with(token_id)
+            elif generated >= self.limits[row]:
+                self.reasons[row] = "length"
+            if self.reasons[row] is not None:
+                self.finished_at[row] = generated
+        return self.reasons[row] is not None
+
+    def __call__(self, input_ids, scores, **kwargs):
+        generated = input_ids.shape[1] - self.prompt_length
+        import torch
+
+        done = [self.update(row, token_id, generated) for row, token_id in enumerate(input_ids[:, -1].tolist())]
+        return torch.tensor(done, dtype=torch.bool, device=input_ids.device)
+
+
+class TokenConfidence:
+    """
+    记录每步各行所选token的概率，不修改分数
+
+    贪心解码时所选token即分数最大的token，概率为softmax的最大值；和停止条件一样不继承transformers的类
+    """
+
+    def __init__(self):
+        self.step_probs = []
+
+    def __call__(self, input_ids, scores):
+        import torch
+
+        self.step_probs.append(torch.softmax(scores.float(), dim=-1).max(dim=-1).values.tolist())
+        return scores
+
+    def row_minimum(self, row, steps):
+        """第row行前steps步中最小的token概率"""
+        return min((probs[row] for probs in self.step_probs[:steps]), default=1.0)
+
 
 class ChineseErrorCorrector:
-    def __init__(self, model_path="models/ChineseErrorCorrector2-7B"):
-        self.model = AutoModelForCausalLM.from_pretrained(
-            model_path,
-            torch_dtype="auto",
-            device_map="auto",
-            low_cpu_mem_usage=True
-        )
-        self.tokenizer = AutoTokenizer.from_pretrained(model_path)
-        self.prompt = "你是一个文本纠错专家，纠正输入句子中的语法、拼写、标点错误，并输出语义通顺的句子，输入句子为："
+    def __init__(self, model_path="models/ChineseErrorCorrector2-7B", use_prefix_cache=True,
+                 max_new_tokens_ratio=1.5, max_new_tokens_slack=16, copy_stop=True,
+                 quantize='none', num_threads=None, num_interop_threads=None,
+                 speculative=False, num_draft_tokens=8, max_ngram=3, metrics_file=None,
+                 template_cache=DEFAULT_TEMPLATE_CACHE):
+        if quantize not in QUANTIZE_MODES:
+            raise ValueError(f"未知的量化方式: {quantize}")
+        self.quantize = quantize
+        self.num_threads = num_threads
+        self.num_interop_threads = num_interop_threads
+        self.model_path = model_path
+        # 分词器和模型在首次使用时加载（见tokenizer/model属性），各阶段耗时记录在startup_timings中
+        self._tokenizer = None
+        self._model = None
+        self.startup_timings = {}
+        self.prompt = DEFAULT_PROMPT
+        # 对话模板+prompt的前缀每次都相同：token ids和KV cache只计算一次，token ids保存在template_cache中
+        self.use_prefix_cache = use_prefix_cache
+        self.template_cache = template_cache
+        self._template = None
+        self._prefix_cache = None
+        # 每句的生成上限 = 句子token数 * ratio + slack（不超过MAX_NEW_TOKENS），ratio为None时固定为MAX_NEW_TOKENS
+        self.max_new_tokens_ratio = max_new_tokens_ratio
+        self.max_new_tokens_slack = max_new_tokens_slack
+        self.copy_stop = copy_stop
+        # 各种结束方式的句子数，length为被上限截断的句子
+        self.generation_stats = {"sentences": 0, "eos": 0, "sentence_end": 0, "newline": 0, "length": 0}
+        # 投机解码：从原句取草稿token，一次前向验证多个（贪心解码，逐句处理）
+        self.speculative = speculative
+        self.num_draft_tokens = num_draft_tokens
+        self.max_ngram = max_ngram
+        self.speculative_stats = {"forward_passes": 0, "drafted": 0, "accepted": 0, "tokens": 0}
+        # 每次生成调用的计时记录（JSON Lines），None为不记录
+        self.metrics = MetricsWriter(metrics_file) if metrics_file else None
 
-    def correct(self, text):
+    @contextmanager
+    def _phase(self, name):
+        """记录并打印一个启动阶段的耗时"""
+        start = time.perf_counter()
+        yield
+        self.startup_timings[name] = time.perf_counter() - start
+        print(f"[启动] {name}: {self.startup_timings[name]:.2f} 秒")
+
+    def _import_runtime(self):
+        """首次需要时导入torch和transformers"""
+        if 'transformers' in sys.modules and 'torch' in sys.modules:
+            return
+        with self._phase("导入torch/transformers"):
+            import torch  # noqa: F401
+            import transformers  # noqa: F401
+
+    @property
+    def tokenizer(self):
+        if self._tokenizer is None:
+            self._import_runtime()
+            from transformers import AutoTokenizer
+
+            with self._phase("加载分词器"):
+                tokenizer = AutoTokenizer.from_pretrained(self.model_path)
+                # 批量生成时左侧填充，保证各句的生成位置对齐
+                tokenizer.padding_side = "left"
+                if tokenizer.pad_token is None:
+                    tokenizer.pad_token = tokenizer.eos_token
+            self._tokenizer = tokenizer
+        return self._tokenizer
+
+    @property
+    def model(self):
+        if self._model is None:
+            self._model = self._load_model()
+        return self._model
+
+    def _load_model(self):
+        """
+        加载模型权重
+
+        有safetensors文件时只从safetensors加载：权重文件通过mmap映射，按checkpoint自身的dtype放入模型，
+        不做整份state dict的读取和类型转换副本
+        """
+        self._import_runtime()
+        import torch
+        from transformers import AutoModelForCausalLM
+
+        set_torch_threads(self.num_threads, self.num_interop_threads)
+        use_safetensors = True if glob.glob(os.path.join(self.model_path, "*.safetensors")) else None
+        with self._phase("加载模型权重"):
+            if self.quantize == 'int8':
+                # 动态量化只支持CPU上的float32权重：按float32加载到CPU后量化Linear层
+                model = AutoModelForCausalLM.from_pretrained(
+                    self.model_path,
+                    torch_dtype=torch.float32,
+                    low_cpu_mem_usage=True,
+                    use_safetensors=use_safetensors
+                )
+            else:
+                model = AutoModelForCausalLM.from_pretrained(
+                    self.model_path,
+                    torch_dtype="auto",
+                    device_map="auto",
+                    low_cpu_mem_usage=True,
+                    use_safetensors=use_safetensors
+                )
+        if self.quantize == 'int8':
+            with self._phase("int8量化"):
+                model = quantize_int8(model.eval())
+
+        generation_config = model.generation_config
+        if generation_config.do_sample or (generation_config.repetition_penalty or 1.0) != 1.0:
+            print("注意: 纠错统一使用贪心解码，忽略模型generation_config中的采样/重复惩罚设置")
+        return model
+
+    def build_input_text(self, text):
+        """拼接prompt并套用对话模板"""
         messages = [
             {"role": "user", "content": self.prompt + text}
         ]
-        
-        input_text = self.tokenizer.apply_chat_template(
+        return self.tokenizer.apply_chat_template(
             messages,
             tokenize=False,
             add_generation_prompt=True
         )
-        
-        model_inputs = self.tokenizer([input_text], return_tensors="pt").to(self.model.device)
-        
+
+    def token_length(self, text):
+        """句子本身的token数（不含prompt），用于按长度分桶"""
+        return len(self.tokenizer(text, add_special_tokens=False).input_ids)
+
+    def correct(self, text):
+        return self.correct_batch([text])[0]
+
+    def cache_context(self):
+        """决定纠错结果的模型及生成配置，作为结果缓存键的一部分"""
+        from correction_cache import weights_fingerprint
+
+        return {
+            "model_path": self.model_path,
+            "weights": weights_fingerprint(self.model_path),
+            "quantize": self.quantize,
+            "prompt": self.prompt,
+            "decoding": GREEDY_DECODING,
+            "speculative": self.speculative,
+            "num_draft_tokens": self.num_draft_tokens if self.speculative else None,
+            "max_ngram": self.max_ngram if self.speculative else None,
+            "max_new_tokens": MAX_NEW_TOKENS,
+            "max_new_tokens_ratio": self.max_new_tokens_ratio,
+            "max_new_tokens_slack": self.max_new_tokens_slack,
+            "copy_stop": self.copy_stop,
+        }
+
+    def max_new_tokens_for(self, sentence_length):
+        """按句子token数确定生成上限"""
+        if self.max_new_tokens_ratio is None:
+            return MAX_NEW_TOKENS
+        return min(MAX_NEW_TOKENS, math.ceil(sentence_length * self.max_new_tokens_ratio) + self.max_new_tokens_slack)
+
+    def template_ids(self):
+        """
+        对话模板在句子前后的token ids（随self.prompt变化自动重建）
+
+        Returns:
+            (prefix_ids, suffix_ids)，无法按句子切分模板时返回None
+        """
+        if self._template is not None and self._template[0] == self.prompt:
+            return self._template[1]
+
+        with self._phase("模板分词"):
+            key = hashlib.sha256(f"{tokenizer_fingerprint(self.model_path)}\x00{self.prompt}".encode('utf-8')).hexdigest()
+            saved = self._load_template_cache()
+            if key in saved:
+                ids = tuple(saved[key]) if saved[key] is not None else None
+            else:
+                ids = self._tokenize_template()
+                saved[key] = ids
+                self._save_template_cache(saved)
+        self._template = (self.prompt, ids)
+        self._prefix_cache = None
+        return ids
+
+    def _tokenize_template(self):
+        prefix_text, _, suffix_text = self.build_input_text(_SENTENCE_PLACEHOLDER).partition(_SENTENCE_PLACEHOLDER)
+        ids = (self.tokenizer(prefix_text).input_ids,
+               self.tokenizer(suffix_text, add_special_tokens=False).input_ids)
+        # 分词器若在首尾自动添加特殊token，拼接结果会和整体分词不同，此时不使用缓存
+        probe = "测试句子。"
+        if ids[0] + self.tokenizer(probe, add_special_tokens=False).input_ids + ids[1] != \
+                self.tokenizer(self.build_input_text(probe)).input_ids:
+            return None
+        return ids
+
+    def _load_template_cache(self):
+        if not self.template_cache or not os.path.exists(self.template_cache):
+            return {}
+        try:
+            with open(self.template_cache, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return {}
+
+    def _save_template_cache(self, saved):
+        if not self.template_cache:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.template_cache) or '.', exist_ok=True)
+            temp_path = f"{self.template_cache}.{os.getpid()}.tmp"
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(saved, f)
+            os.replace(temp_path, self.template_cache)
+        except OSError as e:
+            print(f"警告: 无法保存模板分词结果 {self.template_cache}: {e}")
+
+    def _sentence_ids(self, text, prefix_ids, suffix_ids):
+        """
+        句子及模板后缀的token ids（接在前缀之后）
+
+        句首为标点等非字母数字字符时，可能与prompt末尾的标点合并为一个token，
+        这种情况对整段分词，前缀不一致时返回None
+        """
+        if text[:1].isalnum():
+            return self.tokenizer(text, add_special_tokens=False).input_ids + suffix_ids
+        ids = self.tokenizer(self.build_input_text(text)).input_ids
+        if ids[:len(prefix_ids)] != prefix_ids:
+            return None
+        return ids[len(prefix_ids):]
+
+    def prefix_cache(self, prefix_ids):
+        """前缀的past_key_values，首次调用时计算"""
+        if self._prefix_cache is None:
+            import torch
+
+            model = self.model
+            with self._phase("前缀KV cache"), torch.no_grad():
+                outputs = model(torch.tensor([prefix_ids], device=model.device), use_cache=True)
+            self._prefix_cache = outputs.past_key_values
+        return self._prefix_cache
+
+    def correct_batch(self, texts):
+        """
+        一次生成多个句子的纠错结果
+
+        输入左侧填充并带attention mask，结果与逐句调用correct一致（贪心解码）。
+        长度相近的句子放在同一批可以减少填充。
+        启用前缀缓存时只对句子分词，模板前缀的KV cache复制到整批后复用。
+        分为 prepare_batch（分词）、generate_batch（模型计算）、decode_batch（解码）三步，
+        BatchCorrector的流水线在不同线程中分别调用。
+        """
+        if not texts:
+            return []
+        return self.decode_batch(self.generate_batch(self.prepare_batch(texts)))
+
+    def correct_batch_with_confidence(self, texts):
+        """
+        纠错结果及每句生成token的最小概率（模型对自身输出的把握）
+
+        Returns:
+            (纠错结果列表, 概率列表)；投机解码不记录概率，概率为None
+        """
+        if not texts:
+            return [], []
+        generated = self.generate_batch(dict(self.prepare_batch(texts), confidence=True))
+        return self.decode_batch(generated), generated.get("confidences", [None] * len(texts))
+
+    def prepare_batch(self, texts, sentence_lengths=None):
+        """
+        生成前的准备，只使用分词器：套用模板并分词，计算每句的token数
+
+        只做不填充的分词（填充在generate_batch中手工完成），不修改分词器的填充设置，
+        可以与生成线程中停止条件的解码同时进行
+
+        Args:
+            sentence_lengths: 每句的token_length，分桶时已计算过的直接传入，不再重复分词
+        """
+        start = time.perf_counter()
+        if sentence_lengths is None:
+            sentence_lengths = [self.token_length(text) for text in texts]
+        prepared = {"texts": texts, "prefix_ids": None, "sentence_lengths": list(sentence_lengths)}
+        if not self.speculative:
+            rows = None
+            if self.use_prefix_cache:
+                template_ids = self.template_ids()
+                if template_ids is not None:
+                    rows = [self._sentence_ids(text, *template_ids) for text in texts]
+                    if None in rows:
+                        rows = None
+                    else:
+                        prepared["prefix_ids"] = template_ids[0]
+            if rows is None:
+                rows = [self.tokenizer(self.build_input_text(text)).input_ids for text in texts]
+            prepared["rows"] = rows
+        prepared["prepare_seconds"] = time.perf_counter() - start
+        return prepared
+
+    def generate_batch(self, prepared):
+        """
+        对prepare_batch的结果做模型计算，不解码
+
+        每行为 [前缀] + 填充 + 句子及模板后缀，填充被mask掉；复用前缀KV cache时
+        位置编码由attention mask累加得到，与不填充时一致
+        """
+        import torch
+
+        # 首次调用时加载模型，加载耗时不计入本次调用的生成记录
+        model = self.model
+        texts = prepared["texts"]
+        if self.speculative:
+            return dict(prepared, responses=[self._correct_speculative(text, length)
+                                             for text, length in zip(texts, prepared["sentence_lengths"])])
+        # 生成记录的调用开始时间包含分词耗时，不含在流水线中排队等待的时间
+        call_start = time.perf_counter() - prepared["prepare_seconds"]
+
+        rows = prepared["rows"]
+        prefix_ids = prepared["prefix_ids"] or []
+        max_len = max(len(row) for row in rows)
+        pad_id = self.tokenizer.pad_token_id
+        input_ids = [prefix_ids + [pad_id] * (max_len - len(row)) + row for row in rows]
+        attention_mask = [[1] * len(prefix_ids) + [0] * (max_len - len(row)) + [1] * len(row) for row in rows]
+
+        past_key_values = None
+        if prepared["prefix_ids"] is not None:
+            # generate会向cache追加内容，每次使用副本
+            past_key_values = copy.deepcopy(self.prefix_cache(prefix_ids))
+            if len(rows) > 1:
+                past_key_values.batch_repeat_interleave(len(rows))
+
+        return self._generate(prepared, torch.tensor(input_ids, device=model.device),
+                              torch.tensor(attention_mask, device=model.device), past_key_values, call_start)
+
+    def decode_batch(self, generated):
+        """解码generate_batch的结果并统计结束方式，返回纠错结果"""
+        if "responses" in generated:
+            return generated["responses"]
+        responses = self.tokenizer.batch_decode(generated["generated_ids"], skip_special_tokens=True)
+        return self._finish(responses, generated["criteria"])
+
+    def _stopping_criteria(self, sentence_lengths, prompt_length):
+        limits = [self.max_new_tokens_for(length) for length in sentence_lengths]
+        eos_token_ids = self.model.generation_config.eos_token_id
+        if eos_token_ids is None:
+            eos_token_ids = [self.tokenizer.eos_token_id]
+        elif isinstance(eos_token_ids, int):
+            eos_token_ids = [eos_token_ids]
+        return CorrectionStoppingCriteria(self.tokenizer, prompt_length, sentence_lengths, limits,
+                                          eos_token_ids, self.copy_stop)
+
+    def _finish(self, responses, criteria):
+        """统计结束方式；因换行停止的去掉末尾换行"""
+        self.generation_stats["sentences"] += len(responses)
+        for row, reason in enumerate(criteria.reasons):
+            # 达到max(limits)时generate直接结束，criteria未必记录了原因
+            reason = reason or "length"
+            self.generation_stats[reason] += 1
+            if reason == "newline":
+                responses[row] = responses[row].rstrip("\n")
+        return responses
+
+    def _generate(self, prepared, input_ids, attention_mask, past_key_values, call_start):
+        """按每句的生成上限和停止条件生成，返回prepared加上生成的token ids和停止条件"""
+        from transformers import LogitsProcessorList, StoppingCriteriaList
+
+        texts = prepared["texts"]
+        criteria = self._stopping_criteria(prepared["sentence_lengths"], input_ids.shape[1])
+        timer = StepTimer() if self.metrics is not None else None
+        confidence = TokenConfidence() if prepared.get("confidence") else None
+        processors = [processor for processor in (timer, confidence) if processor is not None]
+
+        generate_start = time.perf_counter()
         generated_ids = self.model.generate(
-            **model_inputs,
-            max_new_tokens=512
+            input_ids=input_ids,
+            attention_mask=attention_mask,
+            past_key_values=past_key_values,
+            max_new_tokens=max(criteria.limits),
+            stopping_criteria=StoppingCriteriaList([criteria]),
+            logits_processor=LogitsProcessorList(processors) if processors else None,
+            pad_token_id=self.tokenizer.pad_token_id,
+            **GREEDY_DECODING
         )
-        
-        generated_ids = [
-            output_ids[len(input_ids):] for input_ids, output_ids in zip(model_inputs.input_ids, generated_ids)
-        ]
-        
-        response = self.tokenizer.batch_decode(generated_ids, skip_special_tokens=True)[0]
+        end = time.perf_counter()
+
+        # 左侧填充后所有输入等长，生成部分从同一位置开始
+        generated_ids = generated_ids[:, input_ids.shape[1]:]
+        if self.metrics is not None:
+            attended = attention_mask.sum(dim=1).tolist()
+            steps = generated_ids.shape[1]
+            self.metrics.write(build_record(
+                call_start, generate_start, timer.step_times, end, texts, attended,
+                [finished or steps for finished in criteria.finished_at],
+                [reason or "length" for reason in criteria.reasons],
+                1 - sum(attended) / attention_mask.numel()))
+        result = dict(prepared, generated_ids=generated_ids, criteria=criteria)
+        if confidence is not None:
+            # 已结束的行之后的步骤是填充，不计入
+            steps = generated_ids.shape[1]
+            result["confidences"] = [confidence.row_minimum(row, finished or steps)
+                                     for row, finished in enumerate(criteria.finished_at)]
+        return result
+
+    def _correct_speculative(self, text, sentence_length=None):
+        """
+        prompt lookup投机解码（单句，贪心）
+
+        每轮用原句中匹配到的草稿token与上一轮的新token一起前向一次，
+        接受与模型贪心预测一致的最长前缀，再加上模型在第一个不一致处的预测，
+        KV cache裁掉未被接受的草稿部分。输出与逐token贪心解码相同。
+        """
+        import torch
+        from transformers import DynamicCache
+
+        call_start = time.perf_counter()
+        template_ids = self.template_ids() if self.use_prefix_cache else None
+        row = self._sentence_ids(text, *template_ids) if template_ids is not None else None
+        if row is not None:
+            input_ids = template_ids[0] + row
+            past_key_values = copy.deepcopy(self.prefix_cache(template_ids[0]))
+        else:
+            input_ids = self.tokenizer(self.build_input_text(text)).input_ids
+            past_key_values = DynamicCache()
+        source_ids = self.tokenizer(text, add_special_tokens=False).input_ids
+        if sentence_length is None:
+            sentence_length = self.token_length(text)
+        criteria = self._stopping_criteria([sentence_length], len(input_ids))
+        limit = criteria.limits[0]
+        stats = self.speculative_stats
+
+        generated = []
+        # 每个token得到的时间，用于生成记录
+        token_times = []
+        generate_start = time.perf_counter()
+        # 尚未写入KV cache的token
+        pending = input_ids[past_key_values.get_seq_length():]
+        cursor = 0
+        with torch.no_grad():
+            while True:
+                draft, match_start = [], cursor
+                if generated:
+                    draft, match_start = lookup_draft(source_ids, generated, self.num_draft_tokens,
+                                                      self.max_ngram, cursor)
+                    # 不超过生成上限
+                    draft = draft[:max(0, limit - len(generated) - 1)]
+
+                logits = self.model(torch.tensor([pending + draft], device=self.model.device),
+                                    past_key_values=past_key_values, use_cache=True).logits
+                predictions = logits[0, len(pending) - 1:].argmax(-1).tolist()
+                now = time.perf_counter()
+                accepted = 0
+                while accepted < len(draft) and draft[accepted] == predictions[accepted]:
+                    accepted += 1
+                # 去掉未被接受的草稿在cache中的部分
+                if len(draft) > accepted:
+                    past_key_values.crop(-(len(draft) - accepted))
+
+                stats["forward_passes"] += 1
+                stats["drafted"] += len(draft)
+                stats["accepted"] += accepted
+                done = False
+                for token_id in predictions[:accepted + 1]:
+                    generated.append(token_id)
+                    token_times.append(now)
+                    stats["tokens"] += 1
+                    if criteria.update(0, token_id, len(generated)):
+                        done = True
+                        break
+                if done:
+                    break
+                pending = [generated[-1]]
+                if draft:
+                    cursor = match_start + accepted
+
+        response = self._finish([self.tokenizer.decode(generated, skip_special_tokens=True)], criteria)[0]
+        if self.metrics is not None:
+            self.metrics.write(build_record(
+                call_start, generate_start, token_times, time.perf_counter(), [text],
+                [len(input_ids)], [len(generated)], criteria.reasons, 0.0, mode="speculative"))
         return response
 
+
+def add_generation_args(parser):
+    """添加生成长度相关的命令行参数（batch_corrector与correction_server共用）"""
+    parser.add_argument('--max_new_tokens_ratio', type=float, default=1.5,
+                        help='生成上限 = 句子token数 * ratio + slack；<=0 时固定为512')
+    parser.add_argument('--max_new_tokens_slack', type=int, default=16)
+    parser.add_argument('--no_copy_stop', action='store_true',
+                        help='不在输出长度达到输入长度后遇换行/句末标点停止')
+    parser.add_argument('--speculative', action='store_true',
+                        help='投机解码：从原句取草稿token一次验证多个（贪心，逐句处理）')
+    parser.add_argument('--num_draft_tokens', type=int, default=8, help='投机解码每轮最多草稿token数')
+    parser.add_argument('--metrics_file', type=str, default=None,
+                        help='把每次生成调用的TTFT、prefill、解码速度、填充比例等写入该JSONL文件')
+
+
+def add_model_args(parser):
+    """添加模型加载相关的命令行参数"""
+    parser.add_argument('--quantize', type=str, default='none', choices=QUANTIZE_MODES,
+                        help='int8: 在CPU上对Linear层做int8动态量化')
+    parser.add_argument('--num_threads', type=int, default=None, help='torch算子内线程数')
+    parser.add_argument('--num_interop_threads', type=int, default=None, help='torch算子间线程数')
+
+
+def model_kwargs(args):
+    """把add_model_args的参数转换为ChineseErrorCorrector的关键字参数"""
+    return {
+        "quantize": args.quantize,
+        "num_threads": args.num_threads,
+        "num_interop_threads": args.num_interop_threads,
+    }
+
+
+def generation_kwargs(args):
+    """把add_generation_args的参数转换为ChineseErrorCorrector的关键字参数"""
+    return {
+        "max_new_tokens_ratio": args.max_new_tokens_ratio if args.max_new_tokens_ratio > 0 else None,
+        "max_new_tokens_slack": args.max_new_tokens_slack,
+        "copy_stop": not args.no_copy_stop,
+        "speculative": args.speculative,
+        "num_draft_tokens": args.num_draft_tokens,
+        "metrics_file": args.metrics_file,
+    }
+
 def main():
     # 初始化纠错器
     corrector = ChineseErrorCorrector()
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+句子级纠错结果的持久化缓存（SQLite）
+
+键由 (模型路径+权重指纹, prompt, 生成参数, 原句) 计算，任一项变化都不会命中旧结果。
+使用WAL模式，多个进程可以同时读；按最近使用时间淘汰，可限制条目数和总大小。
+"""
+
+import glob
+import hashlib
+import json
+import os
+import sqlite3
+import time
+
+DEFAULT_CACHE_PATH = "data/paddleocr_version/correction_cache.sqlite"
+
+# 计算权重指纹时每个权重文件读取的字节数
+_FINGERPRINT_BYTES = 1 << 20
+
+
+def weights_fingerprint(model_path):
+    """
+    模型权重的指纹
+
+    完整哈希7B权重太慢，这里对config.json全文以及每个权重文件的名称、大小和开头1MB做哈希，
+    重新下载或替换权重都会改变指纹
+    """
+    digest = hashlib.sha256()
+    config_path = os.path.join(model_path, "config.json")
+    if os.path.exists(config_path):
+        with open(config_path, 'rb') as f:
+            digest.update(f.read())
+    weight_files = sorted(glob.glob(os.path.join(model_path, "*.safetensors")) +
+                          glob.glob(os.path.join(model_path, "*.bin")))
+    for weight_file in weight_files:
+        digest.update(os.path.basename(weight_file).encode('utf-8'))
+        digest.update(str(os.path.getsize(weight_file)).encode('ascii'))
+        with open(weight_file, 'rb') as f:
+            digest.update(f.read(_FINGERPRINT_BYTES))
+    return digest.hexdigest()[:16]
+
+
+class CorrectionCache:
+    """
+    纠错结果缓存
+
+    Args:
+        path: SQLite文件路径
+        context: 模型及生成配置（dict），与原句一起决定缓存键
+        max_entries: 最多保留的条目数，None为不限
+        max_bytes: 缓存结果的最大总字节数，None为不限
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, context=None, max_entries=None, max_bytes=None):
+        self.path = path
+        self.context = json.dumps(context or {}, ensure_ascii=False, sort_keys=True)
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        # 其他进程写入时最多等待30秒；BatchCorrector的流水线在写出线程中写入结果，
+        # 同一时间只有一个线程使用连接
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS corrections ("
+            " key TEXT PRIMARY KEY,"
+            " sentence TEXT NOT NULL,"
+            " result TEXT NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_last_used ON corrections (last_used)")
+        self._conn.commit()
+
+    def key(self, sentence):
+        return hashlib.sha256(f"{self.context}\x00{sentence}".encode('utf-8')).hexdigest()
+
+    def get_many(self, sentences):
+        """
+        批量查询
+
+        Returns:
+            {sentence: result}，只包含命中的句子
+        """
+        keys = {self.key(sentence): sentence for sentence in set(sentences)}
+        found = {}
+        key_list = list(keys)
+        # SQLite对单条语句的参数个数有限制，分段查询
+        for i in range(0, len(key_list), 500):
+            chunk = key_list[i:i + 500]
+            rows = self._conn.execute(
+                f"SELECT key, result FROM corrections WHERE key IN ({','.join('?' * len(chunk))})", chunk)
+            for key, result in rows:
+                found[keys[key]] = result
+
+        if found:
+            now = time.time()
+            self._conn.executemany("UPDATE corrections SET last_used = ? WHERE key = ?",
+                                   [(now, self.key(sentence)) for sentence in found])
+            self._conn.commit()
+        for sentence in sentences:
+            if sentence in found:
+                self.hits += 1
+            else:
+                self.misses += 1
+        return found
+
+    def get(self, sentence):
+        """查询单句，未命中返回None"""
+        return self.get_many([sentence]).get(sentence)
+
+    def put_many(self, pairs):
+        """写入 [(sentence, result), ...]，超出容量时按最近使用时间淘汰"""
+        now = time.time()
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO corrections (key, sentence, result, size, last_used) VALUES (?, ?, ?, ?, ?)",
+            [(self.key(sentence), sentence, result, len(sentence.encode('utf-8')) + len(result.encode('utf-8')), now)
+             for sentence, result in pairs])
+        self._conn.commit()
+        self.evict()
+
+    def put(self, sentence, result):
+        self.put_many([(sentence, result)])
+
+    def evict(self):
+        """淘汰最久未使用的条目，返回删除数"""
+        removed = 0
+        if self.max_entries is not None:
+            removed += self._conn.execute(
+                "DELETE FROM corrections WHERE key IN ("
+                " SELECT key FROM corrections ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)).rowcount
+        if self.max_bytes is not None:
+            total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM corrections").fetchone()[0]
+            if total > self.max_bytes:
+                to_delete = []
+                for key, size in self._conn.execute("SELECT key, size FROM corrections ORDER BY last_used"):
+                    if total <= self.max_bytes:
+                        break
+                    to_delete.append((key,))
+                    total -= size
+                self._conn.executemany("DELETE FROM corrections WHERE key = ?", to_delete)
+                removed += len(to_delete)
+        if removed:
+            self._conn.commit()
+        return removed
+
+    def __len__(self):
+        return self._conn.execute("SELECT COUNT(*) FROM corrections").fetchone()[0]
+
+    @property
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def stats(self):
+        return {
+            "path": self.path,
+            "entries": len(self),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hit_rate,
+        }
+
+    def close(self):
+        self._conn.close()
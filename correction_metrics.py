@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+纠错效果指标
+compute_f05_char_level 与 evaluation_scores/evaluation.py 中的定义相同（字符集合上的F0.5），
+evaluation.py 是直接执行的脚本无法导入，这里单独提供给基准测试和路由策略使用
+"""
+
+import json
+
+
+def compute_f05_char_level(ref, pred):
+    ref_chars = set(ref)
+    pred_chars = set(pred)
+    correct = len(ref_chars & pred_chars)
+    pred_total = len(pred_chars)
+    ref_total = len(ref_chars)
+    if pred_total == 0 or ref_total == 0:
+        return 0.0
+    precision = correct / pred_total
+    recall = correct / ref_total
+    beta = 0.5
+    return (1 + beta ** 2) * precision * recall / (beta ** 2 * precision + recall) if (precision + recall) > 0 else 0.0
+
+
+def mean_f05(refs, preds):
+    """逐句F0.5的平均值"""
+    if not refs:
+        return 0.0
+    return sum(compute_f05_char_level(ref, pred) for ref, pred in zip(refs, preds)) / len(refs)
+
+
+def load_eval_file(path):
+    """
+    读取评测句子集：JSON数组或JSON Lines，每项包含 source（原句）和可选的 target（参考答案）
+
+    Returns:
+        (sources, targets)，没有参考答案时targets为None
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        content = f.read()
+    if content.lstrip().startswith('['):
+        items = json.loads(content)
+    else:
+        items = [json.loads(line) for line in content.splitlines() if line.strip()]
+    sources = [item["source"] for item in items]
+    targets = [item["target"] for item in items] if all("target" in item for item in items) else None
+    return sources, targets
@@ -0,0 +1,377 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+本地纠错服务
+常驻进程只加载一次纠错模型，多个调用方通过Unix socket或本机TCP共享。
+
+协议：每行一个JSON（UTF-8），同一连接上可以同时有多个未完成的请求
+    请求 {"id": 1, "op": "correct", "sentences": ["...", ...]}
+    响应 {"id": 1, "results": ["...", ...]}      出错时为 {"id": 1, "error": "..."}
+    请求 {"id": 2, "op": "cancel", "target": 1}  取消尚未开始生成的句子
+    请求 {"id": 3, "op": "stats"}                返回队列深度、批大小和延迟统计
+    请求 {"id": 4, "op": "context"}              返回模型及生成配置（用于结果缓存键）
+
+并发请求中的句子进入同一个asyncio队列，按最大批大小和最长等待时间凑成微批次，
+在单独的生成线程中调用correct_batch，事件循环不被阻塞。
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from generation_metrics import percentile
+
+DEFAULT_SOCKET_PATH = "/tmp/chinese_error_corrector.sock"
+
+
+def parse_address(address):
+    """'host:port' 解析为 (host, port)，其余视为Unix socket路径"""
+    if address and not address.startswith(('/', '.')) and ':' in address:
+        host, port = address.rsplit(':', 1)
+        return host, int(port)
+    return address, None
+
+
+def parse_message(line):
+    """
+    解析一行请求
+
+    Returns:
+        (请求, 错误信息)，不是合法的JSON对象时请求为None
+    """
+    try:
+        message = json.loads(line)
+    except ValueError as e:
+        return None, f"无效的JSON: {str(e)}"
+    if not isinstance(message, dict):
+        return None, "请求必须是JSON对象"
+    return message, None
+
+
+def is_sentence_list(sentences):
+    """correct请求的sentences必须是字符串列表"""
+    return isinstance(sentences, list) and all(isinstance(sentence, str) for sentence in sentences)
+
+
+class MicroBatcher:
+    """
+    把并发提交的句子凑成微批次
+
+    Args:
+        correct_batch: 批量纠错函数（在生成线程中调用）
+        max_batch_size: 每批最多句子数
+        max_wait_ms: 凑批时第一句最多等待的毫秒数
+    """
+
+    def __init__(self, correct_batch, max_batch_size=8, max_wait_ms=10):
+        self.correct_batch = correct_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.queue = asyncio.Queue()
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        self.stats = {
+            "sentences": 0,
+            "batches": 0,
+            "cancelled": 0,
+            "max_queue_depth": 0,
+        }
+        # 最近的排队等待和总延迟（秒）
+        self.queue_waits = deque(maxlen=1000)
+        self.latencies = deque(maxlen=1000)
+        self.batch_sizes = deque(maxlen=1000)
+
+    async def submit(self, sentence):
+        """提交一句，返回纠错结果；取消返回的任务即可取消尚未开始生成的句子"""
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((sentence, future, time.perf_counter()))
+        self.stats["max_queue_depth"] = max(self.stats["max_queue_depth"], self.queue.qsize())
+        return await future
+
+    async def _next_batch(self):
+        """取出一批未取消的句子：先等第一句，再在max_wait内尽量凑满"""
+        batch = []
+        deadline = None
+        while len(batch) < self.max_batch_size:
+            if deadline is None:
+                item = await self.queue.get()
+                deadline = time.perf_counter() + self.max_wait
+            else:
+                timeout = deadline - time.perf_counter()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self.queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+            if item[1].cancelled():
+                self.stats["cancelled"] += 1
+                continue
+            batch.append(item)
+        return batch
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._next_batch()
+            if not batch:
+                continue
+            start_time = time.perf_counter()
+            for _, _, submitted in batch:
+                self.queue_waits.append(start_time - submitted)
+            try:
+                results = await loop.run_in_executor(
+                    self._executor, self.correct_batch, [sentence for sentence, _, _ in batch])
+            except Exception as e:
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            end_time = time.perf_counter()
+            self.stats["batches"] += 1
+            self.stats["sentences"] += len(batch)
+            self.batch_sizes.append(len(batch))
+            for (_, future, submitted), result in zip(batch, results):
+                self.latencies.append(end_time - submitted)
+                if not future.done():
+                    future.set_result(result)
+
+    def snapshot(self):
+        """当前统计信息"""
+        return {
+            **self.stats,
+            "queue_depth": self.queue.qsize(),
+            "avg_batch_size": sum(self.batch_sizes) / len(self.batch_sizes) if self.batch_sizes else 0.0,
+            "queue_wait_ms": {
+                "p50": percentile(self.queue_waits, 50) * 1000,
+                "p95": percentile(self.queue_waits, 95) * 1000,
+            },
+            "latency_ms": {
+                "p50": percentile(self.latencies, 50) * 1000,
+                "p95": percentile(self.latencies, 95) * 1000,
+                "max": max(self.latencies, default=0.0) * 1000,
+            },
+        }
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+
+
+class CorrectionServer:
+    """纠错服务：接收连接并把请求交给MicroBatcher"""
+
+    def __init__(self, corrector, max_batch_size=8, max_wait_ms=10):
+        self.corrector = corrector
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self.batcher = None
+        self.requests = 0
+
+    async def _handle_correct(self, message, writer, write_lock):
+        request_id = message.get("id")
+        try:
+            results = await asyncio.gather(*(self.batcher.submit(s) for s in message["sentences"]))
+            response = {"id": request_id, "results": results}
+        except asyncio.CancelledError:
+            response = {"id": request_id, "error": "cancelled"}
+        except Exception as e:
+            response = {"id": request_id, "error": str(e)}
+        if writer.is_closing():
+            return
+        async with write_lock:
+            writer.write(json.dumps(response, ensure_ascii=False).encode('utf-8') + b'\n')
+            await writer.drain()
+
+    async def handle_connection(self, reader, writer):
+        write_lock = asyncio.Lock()
+        tasks = {}
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                message, error = parse_message(line)
+                op = message.get("op", "correct") if message is not None else None
+                if op == "correct" and not is_sentence_list(message.get("sentences")):
+                    op, error = None, "sentences必须是字符串列表"
+                if op == "correct":
+                    self.requests += 1
+                    task = asyncio.ensure_future(self._handle_correct(message, writer, write_lock))
+                    tasks[message.get("id")] = task
+                    task.add_done_callback(lambda _, key=message.get("id"): tasks.pop(key, None))
+                    continue
+
+                if error is not None:
+                    response = {"id": message.get("id") if message is not None else None, "error": error}
+                elif op == "cancel":
+                    task = tasks.get(message.get("target"))
+                    response = {"id": message.get("id"), "cancelled": task is not None and task.cancel()}
+                elif op == "stats":
+                    response = {"id": message.get("id"), "stats": {
+                        "requests": self.requests,
+                        **self.batcher.snapshot(),
+                        "generation": dict(getattr(self.corrector, "generation_stats", {})),
+                    }}
+                elif op == "context":
+                    response = {"id": message.get("id"), "context": self.corrector.cache_context()}
+                else:
+                    response = {"id": message.get("id"), "error": f"未知操作: {op}"}
+                async with write_lock:
+                    writer.write(json.dumps(response, ensure_ascii=False).encode('utf-8') + b'\n')
+                    await writer.drain()
+        except (ConnectionResetError, BrokenPipeError):
+            pass
+        finally:
+            # 客户端断开后，它尚未开始生成的句子不再处理
+            for task in list(tasks.values()):
+                task.cancel()
+            writer.close()
+
+    async def serve(self, socket_path=None, host=None, port=None):
+        self.batcher = MicroBatcher(self.corrector.correct_batch, self.max_batch_size, self.max_wait_ms)
+        batch_task = asyncio.ensure_future(self.batcher.run())
+        if port is not None:
+            server = await asyncio.start_server(self.handle_connection, host or "127.0.0.1", port)
+            print(f"纠错服务已启动: {host or '127.0.0.1'}:{port}")
+        else:
+            if os.path.exists(socket_path):
+                os.remove(socket_path)
+            server = await asyncio.start_unix_server(self.handle_connection, socket_path)
+            print(f"纠错服务已启动: {socket_path}")
+        print(f"max_batch_size={self.max_batch_size}, max_wait_ms={self.max_wait_ms}")
+
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            batch_task.cancel()
+            self.batcher.close()
+            if port is None and os.path.exists(socket_path):
+                os.remove(socket_path)
+
+
+class CorrectionClient:
+    """
+    纠错服务的同步客户端，接口与ChineseErrorCorrector相同（correct / correct_batch / token_length），
+    可直接传给BatchCorrector
+    """
+
+    def __init__(self, address=DEFAULT_SOCKET_PATH, timeout=None):
+        host_or_path, port = parse_address(address)
+        if port is not None:
+            self._sock = socket.create_connection((host_or_path, port))
+        else:
+            self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self._sock.connect(host_or_path)
+        self._buffer = b''
+        self.timeout = timeout
+        self._next_id = 0
+
+    def _send(self, message):
+        self._next_id += 1
+        message["id"] = self._next_id
+        self._sock.sendall(json.dumps(message, ensure_ascii=False).encode('utf-8') + b'\n')
+        return self._next_id
+
+    def _readline(self):
+        # 自行缓冲，超时后已收到的部分行不会丢失
+        while b'\n' not in self._buffer:
+            data = self._sock.recv(65536)
+            if not data:
+                raise ConnectionError("纠错服务已断开")
+            self._buffer += data
+        line, self._buffer = self._buffer.split(b'\n', 1)
+        return line
+
+    def _receive(self, *request_ids):
+        """读取指定请求的响应（按request_ids顺序返回），其他响应丢弃"""
+        responses = {}
+        while len(responses) < len(request_ids):
+            response = json.loads(self._readline())
+            if response.get("id") in request_ids:
+                responses[response["id"]] = response
+        return [responses[request_id] for request_id in request_ids]
+
+    def correct_batch(self, texts):
+        """
+        纠错多句；设置了timeout且超时时，向服务发送取消请求后抛出TimeoutError
+        """
+        if not texts:
+            return []
+        request_id = self._send({"op": "correct", "sentences": list(texts)})
+        self._sock.settimeout(self.timeout)
+        try:
+            response, = self._receive(request_id)
+        except socket.timeout:
+            self._sock.settimeout(None)
+            cancel_id = self._send({"op": "cancel", "target": request_id})
+            # 丢弃被取消请求的响应和取消确认
+            self._receive(request_id, cancel_id)
+            raise TimeoutError(f"纠错请求超时: {len(texts)} 句")
+        finally:
+            self._sock.settimeout(None)
+        if "error" in response:
+            raise RuntimeError(response["error"])
+        return response["results"]
+
+    def correct(self, text):
+        return self.correct_batch([text])[0]
+
+    def cache_context(self):
+        """服务端模型及生成配置"""
+        request_id = self._send({"op": "context"})
+        return self._receive(request_id)[0]["context"]
+
+    @property
+    def generation_stats(self):
+        """服务端自启动以来累计的结束方式统计"""
+        return self.stats().get("generation", {})
+
+    def token_length(self, text):
+        """客户端不加载分词器，用字符数近似，仅用于按长度排序分桶"""
+        return len(text)
+
+    def stats(self):
+        request_id = self._send({"op": "stats"})
+        return self._receive(request_id)[0]["stats"]
+
+    def close(self):
+        self._sock.close()
+
+
+def parse_args():
+    # 客户端不需要加载torch，模型相关模块只在启动服务时导入
+    from chinese_error_corrector import add_generation_args, add_model_args
+
+    parser = argparse.ArgumentParser(description='本地纠错服务（微批次）')
+    parser.add_argument('--model_path', type=str, default="models/ChineseErrorCorrector2-7B")
+    parser.add_argument('--socket_path', type=str, default=DEFAULT_SOCKET_PATH, help='Unix socket路径')
+    parser.add_argument('--host', type=str, default="127.0.0.1")
+    parser.add_argument('--port', type=int, default=None, help='指定后改为监听本机TCP端口')
+    parser.add_argument('--max_batch_size', type=int, default=8, help='每个微批次最多句子数')
+    parser.add_argument('--max_wait_ms', type=float, default=10, help='凑批时最长等待毫秒数')
+    add_model_args(parser)
+    add_generation_args(parser)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    from chinese_error_corrector import ChineseErrorCorrector, generation_kwargs, model_kwargs
+
+    print(f"加载纠错模型: {args.model_path}")
+    server = CorrectionServer(ChineseErrorCorrector(args.model_path, **model_kwargs(args), **generation_kwargs(args)),
+                              args.max_batch_size, args.max_wait_ms)
+    try:
+        asyncio.run(server.serve(args.socket_path, args.host, args.port))
+    except KeyboardInterrupt:
+        print("\n纠错服务已停止")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,346 +1,809 @@
+import argparse
 import json
+import multiprocessing
 import os
-from transformers import AutoTokenizer
+import time
+from bisect import bisect_right
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import compress
 import re
 
+from washed_store import (COMPACT_FORMAT, LEGACY_FORMAT, WashedBatchWriter, WashedDocument,
+                          save_washed_file)
+
+# 清理规则列表（按顺序均在同一份原始文本上匹配，匹配到的位置全部删除）
+CLEAN_PATTERNS = [
+    # 清理所有空格（包括中英文之间的空格）
+    r'\s+',
+    # 清理学号（8-12位数字）及其前面的文字
+    r'[^\d]*?\d{8,12}(?=\D|$)',
+    # 清理"学号"及其后面的数字
+    r'学号[：:\-~]*\d+',
+    # 清理题号（一、二、三...）
+    r'^[一二三四五六七八九十]+、',
+    # 清理数字题号
+    r'^\d+[、\.]',
+    # 清理写作题型说明
+    r'^写作[\(\（]\d+分[\)\）]',
+    # 清理题目说明
+    r'题目[：:\-~]+\d*',
+    # 清理姓名
+    r'姓名[：:\-~]+\w+',
+    # 清理班级
+    r'班级[：:\-~]+\w+',
+    # 清理常见标记符号
+    r'^[\-~\d]+',
+    # 清理括号内容
+    r'[\(\（].*?[\)\）]',
+    # 清理学校名称+学号组合
+    r'^[^\s\d]*?\d{8,}',
+    # 清理带书名号的标题
+    r'《[^》]*》',
+    # 清理学校简称（如：朴社）
+    r'^[一-龥]{1,4}社',
+    # 清理常见学校缩写+数字组合
+    r'^[一-龥]{1,4}[校社院系所]\d+',
+    # 清理标题形式（带书名号和破折号的组合）
+    r'^.*?《.*?》.*?[—\-]+',
+    # 清理开头的非中文字符和数字组合
+    r'^[^\u4e00-\u9fa5]+',
+]
+
+_DIGIT_RUN = re.compile(r'\d+')
+# 句子结束符与逗号
+SENTENCE_END_PATTERN = re.compile(r'[。！？；]')
+COMMA_PATTERN = re.compile(r'[，,]')
+# 常见的语义分割词
+SEMANTIC_MARKERS = ['但是', '因为', '所以', '而且', '不过', '然后', '接着', '并且', '如果', '虽然', '尽管', '否则', '要是']
+# 掩码取反（删除标记 -> 保留标记）
+_INVERT_MASK = bytes.maketrans(b'\x00\x01', b'\x01\x00')
+
+
+def _student_id_spans(text):
+    """
+    与 re.finditer(r'[^\\d]*?\\d{8,12}(?=\\D|$)', text) 结果完全一致的线性扫描
+
+    正则版本在没有数字的长文本上会从每个起点向后扫描到下一个数字，整体是平方复杂度。
+    从当前位置出发，非贪婪前缀只能停在下一段连续数字的开头：该段长度在8-12之间时
+    匹配从当前位置一直到数字段结尾；长度超过12时只有最后12位能满足前瞻断言；
+    不足8位则到该段结尾为止的任何起点都无法匹配，下一个起点从数字段结尾开始。
+    """
+    pos = 0
+    for run in _DIGIT_RUN.finditer(text):
+        run_start, run_end = run.span()
+        run_length = run_end - run_start
+        if 8 <= run_length <= 12:
+            yield pos, run_end
+        elif run_length > 12:
+            yield run_end - 12, run_end
+        pos = run_end
+
+
+class TextCleaner:
+    """
+    预编译的文本清理引擎
+
+    规则只编译一次；所有规则的匹配结果合并到一个布尔掩码中，
+    再按掩码一次性过滤字符和bbox。
+    """
+
+    # 规则的专用线性实现，匹配结果与对应正则完全一致
+    SPECIALIZED_RULES = {
+        r'[^\d]*?\d{8,12}(?=\D|$)': _student_id_spans,
+    }
+
+    def __init__(self, patterns=None):
+        self.rules = []
+        for pattern in (patterns if patterns is not None else CLEAN_PATTERNS):
+            if pattern in self.SPECIALIZED_RULES:
+                self.rules.append(self.SPECIALIZED_RULES[pattern])
+            else:
+                self.rules.append(re.compile(pattern).finditer)
+
+    def deletion_mask(self, text):
+        """
+        计算需要删除的位置
+
+        Returns:
+            与text等长的bytearray，1表示该位置被某条规则命中
+        """
+        mask = bytearray(len(text))
+        ones = b'\x01' * len(text)
+        for find_spans in self.rules:
+            for span in find_spans(text):
+                start, end = span if isinstance(span, tuple) else span.span()
+                if end > start:
+                    mask[start:end] = ones[start:end]
+        return mask
+
+    def clean(self, text, chars):
+        """
+        清理文本开头的非正文内容，同时保持bbox信息的一致性
+
+        掩码按text的位置计算、按chars的顺序应用；chars比text长时多出的部分全部保留
+        """
+        if not text or not chars:
+            return text, chars
+
+        keep = self.deletion_mask(text).translate(_INVERT_MASK)
+        if len(chars) > len(keep):
+            keep += b'\x01' * (len(chars) - len(keep))
+
+        filtered_chars = list(compress(chars, keep))
+        filtered_text = ''.join([char_info["char"] for char_info in filtered_chars])
+        return filtered_text, filtered_chars
+
+    def clean_document(self, fragments):
+        """
+        清理一个文档的所有OCR片段
+
+        先逐片段清理并拼接，再对拼接后的全文做一次清理（片段边界处的学号等只有在拼接后才能命中）
+
+        Args:
+            fragments: (text, chars) 列表
+
+        Returns:
+            (拼接后的文本, 最终文本, 最终字符列表)
+        """
+        joined_text = ""
+        joined_chars = []
+        for text, chars in fragments:
+            if text and chars:
+                cleaned_text, cleaned_chars = self.clean(text, chars)
+                if cleaned_text and cleaned_chars:
+                    joined_text += cleaned_text
+                    joined_chars.extend(cleaned_chars)
+
+        text, chars = self.clean(joined_text, joined_chars)
+        return joined_text, text, chars
+
+
+
+class MarkerMatcher:
+    """
+    多模式字符串匹配自动机（Aho-Corasick）
+
+    一次线性扫描即可找出所有分割词的出现位置，代替对每个分割词逐一调用endswith
+    """
+
+    def __init__(self, markers):
+        # goto: 状态转移表；fail: 失配指针；shortest: 在该状态结束的最短模式长度（0表示无）
+        self.goto = [{}]
+        self.fail = [0]
+        self.shortest = [0]
+
+        for marker in markers:
+            state = 0
+            for char in marker:
+                next_state = self.goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self.goto)
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.shortest.append(0)
+                    self.goto[state][char] = next_state
+                state = next_state
+            if marker and (not self.shortest[state] or len(marker) < self.shortest[state]):
+                self.shortest[state] = len(marker)
+
+        # 按层次遍历构建失配指针，并沿失配链合并最短模式长度
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self.goto[state].items():
+                queue.append(next_state)
+                fail_state = self.fail[state]
+                while fail_state and char not in self.goto[fail_state]:
+                    fail_state = self.fail[fail_state]
+                fail_target = self.goto[fail_state].get(char, 0)
+                self.fail[next_state] = fail_target if fail_target != next_state else 0
+                inherited = self.shortest[self.fail[next_state]]
+                if inherited and (not self.shortest[next_state] or inherited < self.shortest[next_state]):
+                    self.shortest[next_state] = inherited
+
+    def shortest_match_ends(self, text, start=0, end=None):
+        """
+        扫描 text[start:end]
+
+        Returns:
+            {结束位置: 以该位置结尾的最短模式长度}，位置为text中的绝对偏移（不含）
+        """
+        end = len(text) if end is None else end
+        goto, fail, shortest = self.goto, self.fail, self.shortest
+        ends = {}
+        state = 0
+        for pos in range(start, end):
+            char = text[pos]
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if shortest[state]:
+                ends[pos + 1] = shortest[state]
+        return ends
+
+
+def _load_fast_tokenizer(path):
+    """加载fast tokenizer（需要offset_mapping）"""
+    from transformers import AutoTokenizer
+    tokenizer = AutoTokenizer.from_pretrained(path, use_fast=True)
+    if not tokenizer.is_fast:
+        raise ValueError(f"{path} 没有可用的fast tokenizer，无法获取字符偏移")
+    return tokenizer
+
+
+def pack_spans(spans, measure, budget):
+    """
+    把相邻的短句区间合并到不超过预算的长度
+
+    Args:
+        spans: 按顺序相邻的 (start, end) 列表
+        measure: measure(start, end) 返回区间长度
+        budget: 合并后区间的最大长度，单个超长区间保持原样
+    """
+    packed = []
+    for start, end in spans:
+        if packed and measure(packed[-1][0], end) <= budget:
+            packed[-1] = (packed[-1][0], end)
+        else:
+            packed.append((start, end))
+    return packed
+
+
 class PaddleTextWasher:
-    def __init__(self):
-        # 使用本地的chinese-roberta-wwm-ext模型
-        self.tokenizer = AutoTokenizer.from_pretrained("models/chinese-roberta-wwm-ext")
+    def __init__(self, tokenizer_path="models/chinese-roberta-wwm-ext", length_unit='char', token_budget=48,
+                 corrector_tokenizer_path="models/ChineseErrorCorrector2-7B"):
+        # 使用本地的chinese-roberta-wwm-ext模型，首次需要语义切分时才加载
+        self.tokenizer_path = tokenizer_path
+        self._tokenizer = None
+        # 预先批量计算好的分词偏移 {text: offsets}
+        self.offset_cache = {}
         # 设置句子最大长度
         self.max_sentence_length = 50
+        # 句子长度的计量单位：char按字符计，token按纠错模型的token计，并把短句合并到token_budget
+        if length_unit not in ('char', 'token'):
+            raise ValueError(f"未知的长度单位: {length_unit}")
+        self.length_unit = length_unit
+        self.token_budget = token_budget
+        self.corrector_tokenizer_path = corrector_tokenizer_path
+        self._corrector_tokenizer = None
+        # 预编译的清理引擎和语义分割词匹配自动机
+        self.cleaner = TextCleaner()
+        self.marker_matcher = MarkerMatcher(SEMANTIC_MARKERS)
+
+    @property
+    def tokenizer(self):
+        """按需加载的fast tokenizer（只有过长且没有逗号的片段才会用到）"""
+        if self._tokenizer is None:
+            self._tokenizer = _load_fast_tokenizer(self.tokenizer_path)
+        return self._tokenizer
+
+    @property
+    def corrector_tokenizer(self):
+        """纠错模型的tokenizer，仅在按token计量句子长度时加载"""
+        if self._corrector_tokenizer is None:
+            self._corrector_tokenizer = _load_fast_tokenizer(self.corrector_tokenizer_path)
+        return self._corrector_tokenizer
+
+    @property
+    def length_limit(self):
+        """当前计量单位下的句子最大长度"""
+        return self.token_budget if self.length_unit == 'token' else self.max_sentence_length
+
+    def span_measure(self, text):
+        """
+        返回计算 text[start:end] 长度的函数
+
+        token模式下对整篇文本只分词一次，区间长度为结束位置落在区间内的纠错模型token数
+        """
+        if self.length_unit == 'char':
+            return lambda start, end: end - start
+
+        encoding = self.corrector_tokenizer(text, add_special_tokens=False, return_offsets_mapping=True)
+        token_ends = [end for _, end in encoding['offset_mapping']]
+        return lambda start, end: bisect_right(token_ends, end) - bisect_right(token_ends, start)
+
+    def token_offsets(self, text):
+        """
+        对文本分词并返回每个token在text中的字符偏移
+
+        Returns:
+            [(start, end), ...]，按token顺序排列
+        """
+        offsets = self.offset_cache.get(text)
+        if offsets is None:
+            encoding = self.tokenizer(text, add_special_tokens=False, return_offsets_mapping=True)
+            offsets = encoding['offset_mapping']
+        return offsets
+
+    def batch_token_offsets(self, texts):
+        """
+        一次批量调用tokenizer，对多个文本分词
+
+        Returns:
+            {text: [(start, end), ...]}，可直接作为offset_cache使用
+        """
+        unique_texts = list(dict.fromkeys(texts))
+        if not unique_texts:
+            return {}
+        encoding = self.tokenizer(unique_texts, add_special_tokens=False, return_offsets_mapping=True)
+        return dict(zip(unique_texts, encoding['offset_mapping']))
         
     def clean_text_with_bbox(self, text, chars):
         """
         清理文本开头的非正文内容，同时保持bbox信息的一致性
         """
-        if not text or not chars:
-            return text, chars
-            
-        # 清理模式列表
-        patterns = [
-            # 清理所有空格（包括中英文之间的空格）
-            (r'\s+', ''),
-            # 清理学号（8-12位数字）及其前面的文字
-            (r'[^\d]*?\d{8,12}(?=\D|$)', ''),
-            # 清理"学号"及其后面的数字
-            (r'学号[：:\-~]*\d+', ''),
-            # 清理题号（一、二、三...）
-            (r'^[一二三四五六七八九十]+、', ''),
-            # 清理数字题号
-            (r'^\d+[、\.]', ''),
-            # 清理写作题型说明
-            (r'^写作[\(\（]\d+分[\)\）]', ''),
-            # 清理题目说明
-            (r'题目[：:\-~]+\d*', ''),
-            # 清理姓名
-            (r'姓名[：:\-~]+\w+', ''),
-            # 清理班级
-            (r'班级[：:\-~]+\w+', ''),
-            # 清理常见标记符号
-            (r'^[\-~\d]+', ''),
-            # 清理括号内容
-            (r'[\(\（].*?[\)\）]', ''),
-            # 清理学校名称+学号组合
-            (r'^[^\s\d]*?\d{8,}', ''),
-            # 清理带书名号的标题
-            (r'《[^》]*》', ''),
-            # 清理学校简称（如：朴社）
-            (r'^[一-龥]{1,4}社', ''),
-            # 清理常见学校缩写+数字组合
-            (r'^[一-龥]{1,4}[校社院系所]\d+', ''),
-            # 清理标题形式（带书名号和破折号的组合）
-            (r'^.*?《.*?》.*?[—\-]+', ''),
-            # 清理开头的非中文字符和数字组合
-            (r'^[^\u4e00-\u9fa5]+', ''),
-        ]
-        
-        # 记录需要删除的字符位置
-        to_delete = set()
-        cleaned_text = text
-        
-        for pattern, replacement in patterns:
-            matches = list(re.finditer(pattern, cleaned_text))
-            for match in matches:
-                start, end = match.span()
-                to_delete.update(range(start, end))
-        
-        # 过滤掉需要删除的字符和对应的bbox
-        filtered_chars = []
-        filtered_text = ""
-        current_pos = 0
-        
-        for char_info in chars:
-            if current_pos not in to_delete:
-                filtered_chars.append(char_info)
-                filtered_text += char_info["char"]
-            current_pos += 1
-            
-        return filtered_text, filtered_chars
+        return self.cleaner.clean(text, chars)
 
     def semantic_split(self, text, chars):
         """
         基于语义进行句子切分，同时处理bbox信息
         """
-        if len(text) <= self.max_sentence_length:
-            return [(text, chars)]
-
-        # 常见的语义分割词
-        semantic_markers = ['但是', '因为', '所以', '而且', '不过', '然后', '接着', '并且', '如果', '虽然', '尽管', '否则', '要是']
-        
-        # 使用tokenizer进行分词
-        tokens = self.tokenizer.tokenize(text)
-        
-        # 初始化结果和当前片段
-        result = []
-        current_text = ''
-        current_chars = []
-        current_length = 0
-        char_index = 0
-        
-        for token in tokens:
-            # 去除tokenizer添加的特殊标记
-            clean_token = token.replace('##', '')
-            token_length = len(clean_token)
-            
-            # 获取当前token对应的字符和bbox
-            token_chars = chars[char_index:char_index + token_length]
-            char_index += token_length
-            
-            # 如果当前片段加上新token超过最大长度
-            if current_length + token_length > self.max_sentence_length:
-                if current_text:
-                    result.append((current_text.strip(), current_chars))
-                current_text = clean_token
-                current_chars = token_chars
-                current_length = token_length
-            else:
-                # 检查是否遇到语义分割词
-                next_text = current_text + clean_token
-                should_split = False
-                
-                for marker in semantic_markers:
-                    if next_text.endswith(marker):
-                        result.append((next_text.strip(), current_chars + token_chars))
-                        current_text = ''
-                        current_chars = []
-                        current_length = 0
-                        should_split = True
-                        break
-                
-                if not should_split:
-                    current_text = next_text
-                    current_chars.extend(token_chars)
-                    current_length += token_length
-        
-        # 添加最后一个片段
-        if current_text:
-            result.append((current_text.strip(), current_chars))
-        
-        return result
+        return self._materialize(text, chars, self._semantic_spans(text, 0, len(text), [], self.span_measure(text)))
 
     def split_by_comma(self, text, chars):
         """
         使用逗号分割过长的句子，同时处理bbox信息
         """
-        if len(text) <= self.max_sentence_length:
-            return [(text, chars)]
-            
-        # 找到所有逗号的位置
-        comma_positions = []
-        for i, char in enumerate(text):
-            if char in '，,':
-                comma_positions.append(i)
-                
-        if not comma_positions:
-            return self.semantic_split(text, chars)
-            
-        # 根据逗号位置分割
-        result = []
-        start = 0
-        current_text = ''
-        current_chars = []
-        
-        for pos in comma_positions:
-            if len(current_text) + (pos - start + 1) <= self.max_sentence_length:
-                current_text += text[start:pos + 1]
-                current_chars.extend(chars[start:pos + 1])
-            else:
-                if current_text:
-                    result.append((current_text.strip(), current_chars))
-                current_text = text[start:pos + 1]
-                current_chars = chars[start:pos + 1]
-            start = pos + 1
-            
-        # 处理最后一段
-        if start < len(text):
-            if len(current_text) + (len(text) - start) <= self.max_sentence_length:
-                current_text += text[start:]
-                current_chars.extend(chars[start:])
-                result.append((current_text.strip(), current_chars))
-            else:
-                if current_text:
-                    result.append((current_text.strip(), current_chars))
-                result.extend(self.semantic_split(text[start:], chars[start:]))
-                
-        return result
+        return self._materialize(text, chars, self._comma_spans(text, 0, len(text), [], self.span_measure(text)))
 
-    def split_sentences(self, text, chars):
+    def split_sentences(self, text, chars, clean=True):
         """
         将文本分成句子，同时保持bbox信息的对应关系
+
+        Args:
+            clean: 是否先清理文本；传入已由 TextCleaner.clean_document 清理过的文本时设为False
         """
         if not text or not isinstance(text, str):
             return []
             
         # 预处理：清理文本和对应的bbox
-        text, chars = self.clean_text_with_bbox(text, chars)
+        if clean:
+            text, chars = self.clean_text_with_bbox(text, chars)
+
+        return self._materialize(text, chars, self.sentence_spans(text))
+
+    def sentence_spans(self, text, pending=None):
+        """
+        将文本切分为句子区间
+
+        所有切分都在同一份text上以(start, end)偏移进行，不复制中间字符串和字符列表
+
+        Args:
+            pending: 传入列表时不做语义切分，只把需要分词的片段文本记录到该列表中
+
+        Returns:
+            [(start, end), ...]，按顺序覆盖整个text
+        """
+        measure = self.span_measure(text)
+        spans = []
+        start = 0
+        # 根据句子结束符分割，过长的句子再按逗号和语义进一步切分
+        for match in SENTENCE_END_PATTERN.finditer(text):
+            self._comma_spans(text, start, match.end(), spans, measure, pending)
+            start = match.end()
+        # 处理最后一段
+        if start < len(text):
+            self._comma_spans(text, start, len(text), spans, measure, pending)
+
+        # token模式下把短句合并到预算长度，减少过短的生成调用
+        if self.length_unit == 'token' and pending is None:
+            spans = pack_spans(spans, measure, self.token_budget)
+        return spans
+
+    def pending_semantic_texts(self, text):
+        """返回切分text时需要交给tokenizer做语义切分的片段文本"""
+        pending = []
+        self.sentence_spans(text, pending)
+        return pending
+
+    def _comma_spans(self, text, start, end, spans, measure, pending=None):
+        """使用逗号切分 text[start:end]，结果追加到spans"""
+        limit = self.length_limit
+        if measure(start, end) <= limit:
+            spans.append((start, end))
+            return spans
+
+        comma_ends = [match.end() for match in COMMA_PATTERN.finditer(text, start, end)]
+        if not comma_ends:
+            return self._semantic_spans(text, start, end, spans, measure, pending)
+
+        # 把相邻的逗号分句合并到不超过最大长度，current为当前累积的区间
+        current_start = current_end = start
+        for clause_end in comma_ends:
+            if measure(current_start, clause_end) > limit and current_end > current_start:
+                spans.append((current_start, current_end))
+                current_start = current_end
+            current_end = clause_end
+
+        # 处理最后一段
+        if measure(current_start, end) <= limit:
+            spans.append((current_start, end))
+        else:
+            if current_end > current_start:
+                spans.append((current_start, current_end))
+            if current_end < end:
+                self._semantic_spans(text, current_end, end, spans, measure, pending)
+        return spans
+
+    def _semantic_spans(self, text, start, end, spans, measure, pending=None):
+        """基于语义切分 text[start:end]，结果追加到spans"""
+        limit = self.length_limit
+        if measure(start, end) <= limit:
+            spans.append((start, end))
+            return spans
+        if pending is not None:
+            pending.append(text[start:end])
+            spans.append((start, end))
+            return spans
+
+        # 一次扫描找出所有分割词的结束位置
+        marker_ends = self.marker_matcher.shortest_match_ends(text, start, end)
+
+        # 使用tokenizer分词，按字符偏移确定每个token覆盖的范围
+        # 每个token从上一个token的结尾延伸到自身结尾，token之间被跳过的字符归入后一个token
+        token_ends = [start + token_end for _, token_end in self.token_offsets(text[start:end]) if token_end > 0]
+        if not token_ends or token_ends[-1] < end:
+            token_ends.append(end)
+
+        segment_start = token_start = start
+        for token_end in token_ends:
+            if token_end <= token_start:
+                continue
             
-        # 预处理：统一全角半角符号
-        punctuation_map = {
-            '．': '。',
-            '!': '！',
-            '?': '？',
-            ';': '；'
+            # 如果当前片段加上新token超过最大长度
+            if measure(segment_start, token_end) > limit:
+                if segment_start < token_start:
+                    spans.append((segment_start, token_start))
+                    segment_start = token_start
+            # 检查是否遇到语义分割词（分割词需完整落在当前片段内）
+            elif 0 < marker_ends.get(token_end, 0) <= token_end - segment_start:
+                spans.append((segment_start, token_end))
+                segment_start = token_end
+            token_start = token_end
+
+        # 添加最后一个片段
+        if segment_start < end:
+            spans.append((segment_start, end))
+        return spans
+
+    @staticmethod
+    def _materialize(text, chars, spans):
+        """把句子区间转换为 (句子文本, 字符列表)，去掉首尾空白后为空的句子"""
+        result = []
+        for start, end in spans:
+            sentence = text[start:end].strip()
+            if sentence:
+                result.append((sentence, chars[start:end]))
+        return result
+
+    def load_document(self, input_file):
+        """
+        读取单个ocr_summary文件并清理
+
+        Returns:
+            文档字典：img_id、拼接后的原始文本raw_text、清理后的text与chars
+        """
+        # 从文件名中提取图片ID（去掉_results.json后缀）
+        img_id = os.path.basename(input_file).replace('_results.json', '')
+        
+        with open(input_file, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        
+        return self.load_record(data, img_id)
+
+    def load_record(self, data, img_id=None):
+        """
+        清理一条已读入内存的OCR解析结果（ocr_summary中 *_results.json 的内容）
+
+        Args:
+            img_id: 文档ID，默认使用记录中的doc_id
+        """
+        img_id = img_id if img_id is not None else str(data.get('doc_id', ''))
+
+        # 提取所有文本和对应的bbox信息，整篇文档只调用一次清理引擎
+        fragments = [
+            (result.get('source_text', ''), result.get('char_boxes', []))
+            for result in data.get('results', [])
+        ]
+        raw_text, text, chars = self.cleaner.clean_document(fragments)
+        return {"img_id": img_id, "raw_text": raw_text, "text": text, "chars": chars}
+
+    def build_outputs(self, document):
+        """
+        对已清理的文档分句，构建bbox_washed和ocr_washed输出
+
+        Returns:
+            (bbox_washed, ocr_washed)
+        """
+        img_path = f"{document['img_id']}"  # 默认使用jpg格式
+        
+        # 分句处理
+        sentences = self.split_sentences(document["text"], document["chars"], clean=False)
+        
+        # 构建bbox_washed输出（包含分句信息）
+        bbox_washed = {
+            "path": img_path,
+            "text": document["raw_text"],
+            "sentences": []
         }
         
-        # 找到所有句子结束符的位置
-        end_positions = []
-        for i, char in enumerate(text):
-            if char in '。！？；':
-                end_positions.append(i)
-                
-        if not end_positions:
-            return self.split_by_comma(text, chars)
-            
-        # 根据句子结束符分割
-        result = []
-        start = 0
+        # 为每个句子添加其对应的字符和bbox信息
+        for idx, (sentence_text, sentence_chars) in enumerate(sentences):
+            sentence_info = {
+                "sentence_id": idx,
+                "sentence": sentence_text,
+                "chars": sentence_chars
+            }
+            bbox_washed["sentences"].append(sentence_info)
         
-        for pos in end_positions:
-            sentence = text[start:pos + 1]
-            sentence_chars = chars[start:pos + 1]
-            
-            # 对长句子进行进一步处理
-            if len(sentence) > self.max_sentence_length:
-                sub_sentences = self.split_by_comma(sentence, sentence_chars)
-                result.extend(sub_sentences)
-            else:
-                result.append((sentence, sentence_chars))
-            start = pos + 1
-            
-        # 处理最后一段
-        if start < len(text):
-            last_sentence = text[start:]
-            last_chars = chars[start:]
-            if len(last_sentence) > self.max_sentence_length:
-                sub_sentences = self.split_by_comma(last_sentence, last_chars)
-                result.extend(sub_sentences)
-            else:
-                result.append((last_sentence, last_chars))
-                
-        return [(sent.strip(), sent_chars) for sent, sent_chars in result if sent.strip()]
+        # 构建ocr_washed输出
+        washed_text_list = [
+            {
+                "sentence_id": idx,
+                "sentence": sent
+            } for idx, (sent, _) in enumerate(sentences)
+        ]
+        
+        ocr_washed = {
+            "path": img_path,
+            "washed_text_list": washed_text_list
+        }
+        
+        return bbox_washed, ocr_washed
+
+    def build_washed_document(self, document):
+        """对已清理的文档分句，构建紧凑格式的WashedDocument"""
+        spans = self.sentence_spans(document["text"])
+        return WashedDocument.from_chars(document["img_id"], document["chars"], spans)
 
     def process_file(self, input_file):
         """处理单个JSON文件"""
         try:
-            # 从文件名中提取图片ID（去掉_results.json后缀）
-            img_id = os.path.basename(input_file).replace('_results.json', '')
-            img_path = f"{img_id}"  # 默认使用jpg格式
-            
-            with open(input_file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-            
-            # 提取所有文本和对应的bbox信息
-            all_text = ""
-            all_chars = []
-            
-            # 遍历所有结果
-            for result in data.get('results', []):
-                # 获取文本和字符框信息
-                text = result.get('source_text', '')
-                chars = result.get('char_boxes', [])
-                
-                if text and chars:
-                    # 清理文本和bbox
-                    cleaned_text, cleaned_chars = self.clean_text_with_bbox(text, chars)
-                    if cleaned_text and cleaned_chars:
-                        all_text += cleaned_text
-                        all_chars.extend(cleaned_chars)
-            
-            # 分句处理
-            sentences = self.split_sentences(all_text, all_chars)
-            
-            # 构建bbox_washed输出（包含分句信息）
-            bbox_washed = {
-                "path": img_path,
-                "text": all_text,
-                "sentences": []
-            }
-            
-            # 为每个句子添加其对应的字符和bbox信息
-            for idx, (sentence_text, sentence_chars) in enumerate(sentences):
-                sentence_info = {
-                    "sentence_id": idx,
-                    "sentence": sentence_text,
-                    "chars": sentence_chars
-                }
-                bbox_washed["sentences"].append(sentence_info)
-            
-            # 构建ocr_washed输出
-            washed_text_list = [
-                {
-                    "sentence_id": idx,
-                    "sentence": sent
-                } for idx, (sent, _) in enumerate(sentences)
-            ]
-            
-            ocr_washed = {
-                "path": img_path,
-                "washed_text_list": washed_text_list
-            }
-            
-            return img_id, bbox_washed, ocr_washed
+            document = self.load_document(input_file)
+            bbox_washed, ocr_washed = self.build_outputs(document)
+            return document["img_id"], bbox_washed, ocr_washed
             
         except Exception as e:
             print(f"处理文件 {input_file} 时出错: {str(e)}")
             return None, None, None
 
+
+def save_washed_outputs(img_id, bbox_result, ocr_result, bbox_washed_dir, ocr_washed_dir):
+    """使用图片ID作为文件名保存bbox_washed和ocr_washed结果"""
+    bbox_output_file = os.path.join(bbox_washed_dir, f"{img_id}.json")
+    ocr_output_file = os.path.join(ocr_washed_dir, f"{img_id}.json")
+    
+    # 保存bbox_washed结果
+    with open(bbox_output_file, 'w', encoding='utf-8') as f:
+        json.dump(bbox_result, f, ensure_ascii=False, indent=2)
+        
+    # 保存ocr_washed结果
+    with open(ocr_output_file, 'w', encoding='utf-8') as f:
+        json.dump(ocr_result, f, ensure_ascii=False, indent=2)
+
+
+class WashedOutput:
+    """
+    清洗结果的保存方式
+
+    compact: 每个文档一个紧凑文件（washed_dir），或所有文档写入同一个 .jsonl（batch_file）
+    legacy: 旧的 bbox_washed + ocr_washed 两个缩进JSON文件
+    """
+
+    def __init__(self, output_format=COMPACT_FORMAT, washed_dir="data/paddleocr_version/washed",
+                 bbox_washed_dir="data/paddleocr_version/bbox_washed",
+                 ocr_washed_dir="data/paddleocr_version/ocr_washed", batch_file=None):
+        if output_format not in (COMPACT_FORMAT, LEGACY_FORMAT):
+            raise ValueError(f"未知的输出格式: {output_format}")
+        if batch_file and output_format != COMPACT_FORMAT:
+            raise ValueError("批量文件只支持紧凑格式")
+        self.output_format = output_format
+        self.washed_dir = washed_dir
+        self.bbox_washed_dir = bbox_washed_dir
+        self.ocr_washed_dir = ocr_washed_dir
+        self.batch_file = batch_file
+        self._batch_writer = None
+
+    def makedirs(self):
+        """创建输出目录"""
+        if self.output_format == LEGACY_FORMAT:
+            os.makedirs(self.bbox_washed_dir, exist_ok=True)
+            os.makedirs(self.ocr_washed_dir, exist_ok=True)
+        elif self.batch_file:
+            os.makedirs(os.path.dirname(self.batch_file) or '.', exist_ok=True)
+        else:
+            os.makedirs(self.washed_dir, exist_ok=True)
+
+    def build(self, washer, document):
+        """对已清理的文档分句并构建对应格式的结果"""
+        if self.output_format == LEGACY_FORMAT:
+            return washer.build_outputs(document)
+        return washer.build_washed_document(document)
+
+    def save(self, img_id, result):
+        """保存单个文档的结果（批量文件模式下追加到 .jsonl）"""
+        if self.output_format == LEGACY_FORMAT:
+            bbox_result, ocr_result = result
+            save_washed_outputs(img_id, bbox_result, ocr_result, self.bbox_washed_dir, self.ocr_washed_dir)
+        elif self.batch_file:
+            if self._batch_writer is None:
+                self._batch_writer = WashedBatchWriter(self.batch_file)
+            self._batch_writer.write(result)
+        else:
+            save_washed_file(result, os.path.join(self.washed_dir, f"{img_id}.json"))
+
+    def close(self):
+        if self._batch_writer is not None:
+            self._batch_writer.close()
+            self._batch_writer = None
+
+    def __getstate__(self):
+        # 传给子进程时不带打开的批量文件
+        state = self.__dict__.copy()
+        state['_batch_writer'] = None
+        return state
+
+
+# 子进程中的清洗器实例（由进程池initializer创建，不加载tokenizer）
+_worker_washer = None
+
+
+def _init_wash_worker(washer_kwargs):
+    global _worker_washer
+    _worker_washer = PaddleTextWasher(**washer_kwargs)
+
+
+def _prepare_document(input_file):
+    """第一轮（子进程）：读取、清理文档，并找出需要语义切分的片段"""
+    try:
+        document = _worker_washer.load_document(input_file)
+        return document, _worker_washer.pending_semantic_texts(document["text"])
+    except Exception as e:
+        print(f"处理文件 {input_file} 时出错: {str(e)}")
+        return None, []
+
+
+def _finish_document(args):
+    """
+    第二轮（子进程）：使用主进程批量计算的分词偏移完成分句并保存
+
+    批量文件模式下由主进程统一写入，子进程只返回结果
+    """
+    document, offsets, output = args
+    try:
+        _worker_washer.offset_cache = offsets
+        result = output.build(_worker_washer, document)
+        if output.batch_file:
+            return document["img_id"], result
+        output.save(document["img_id"], result)
+        return document["img_id"], None
+    except Exception as e:
+        print(f"处理文件 {document['img_id']} 时出错: {str(e)}")
+        return None, None
+    finally:
+        _worker_washer.offset_cache = {}
+
+
+def list_input_files(input_dir):
+    """返回ocr_summary目录下按文件名排序的所有 _results.json"""
+    return [
+        os.path.join(input_dir, filename)
+        for filename in sorted(os.listdir(input_dir))
+        if filename.endswith('_results.json')
+    ]
+
+
+def wash_directory_parallel(input_dir, output, workers, batch_size=64, **washer_kwargs):
+    """
+    多进程清洗目录下的所有文件，输出与顺序处理完全一致
+
+    每批文档先在进程池中读取、清理并收集需要语义切分的片段，
+    主进程对整批片段做一次批量分词，再交回进程池完成分句和保存。
+
+    Args:
+        output: WashedOutput，结果的保存方式
+        washer_kwargs: 传给PaddleTextWasher的参数，主进程与子进程使用相同配置
+
+    Returns:
+        成功处理的文档数
+    """
+    # 语义切分用的tokenizer只在主进程中加载
+    washer = PaddleTextWasher(**washer_kwargs)
+    input_files = list_input_files(input_dir)
+    total = len(input_files)
+    done = 0
+    tokenized_spans = 0
+    start_time = time.perf_counter()
+
+    # 使用spawn启动子进程，避免fork已经加载的tokenizer
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                             initializer=_init_wash_worker, initargs=(washer_kwargs,)) as executor:
+        for batch_start in range(0, total, batch_size):
+            batch_files = input_files[batch_start:batch_start + batch_size]
+            prepared = list(executor.map(_prepare_document, batch_files))
+
+            # 整批需要语义切分的片段一次性分词
+            pending = [text for document, texts in prepared if document for text in texts]
+            offsets = washer.batch_token_offsets(pending)
+            tokenized_spans += len(offsets)
+
+            tasks = [
+                (document, {text: offsets[text] for text in texts}, output)
+                for document, texts in prepared if document
+            ]
+            for img_id, result in executor.map(_finish_document, tasks):
+                if img_id:
+                    if result is not None:
+                        output.save(img_id, result)
+                    done += 1
+
+            processed = min(batch_start + batch_size, total)
+            elapsed = time.perf_counter() - start_time
+            print(f"进度: {processed}/{total}, 成功 {done}, 批量分词片段 {len(offsets)}, "
+                  f"{processed / elapsed:.1f} 文件/秒")
+
+    elapsed = time.perf_counter() - start_time
+    print(f"清洗完成: {done}/{total} 个文件, 耗时 {elapsed:.2f} 秒, "
+          f"{done / elapsed if elapsed > 0 else 0.0:.1f} 文件/秒, 共分词片段 {tokenized_spans} (workers={workers})")
+    return done
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='清洗OCR解析结果并分句')
+    parser.add_argument('--input_dir', type=str, default="data/paddleocr_version/ocr_summary", help='ocr_summary目录')
+    parser.add_argument('--output_format', type=str, default=COMPACT_FORMAT, choices=[COMPACT_FORMAT, LEGACY_FORMAT],
+                        help='compact: 每个文档一个紧凑文件；legacy: 旧的bbox_washed + ocr_washed')
+    parser.add_argument('--washed_dir', type=str, default="data/paddleocr_version/washed", help='紧凑格式输出目录')
+    parser.add_argument('--batch_file', type=str, default=None, help='紧凑格式下把所有文档写入同一个 .jsonl 文件')
+    parser.add_argument('--bbox_washed_dir', type=str, default="data/paddleocr_version/bbox_washed")
+    parser.add_argument('--ocr_washed_dir', type=str, default="data/paddleocr_version/ocr_washed")
+    parser.add_argument('--workers', type=int, default=1, help='并行进程数，1为顺序处理')
+    parser.add_argument('--batch_size', type=int, default=64, help='并行模式下每批文档数（批量分词的粒度）')
+    parser.add_argument('--length_unit', type=str, default='char', choices=['char', 'token'],
+                        help='句子长度计量单位：char按字符（上限50），token按纠错模型token并合并短句')
+    parser.add_argument('--token_budget', type=int, default=48, help='token模式下每个句子的目标token数')
+    parser.add_argument('--corrector_tokenizer', type=str, default="models/ChineseErrorCorrector2-7B",
+                        help='token模式下用于计量长度的纠错模型tokenizer')
+    return parser.parse_args()
+
 def main():
+    args = parse_args()
+
     # 创建输出目录
-    bbox_washed_dir = "data/paddleocr_version/bbox_washed"
-    ocr_washed_dir = "data/paddleocr_version/ocr_washed"
-    os.makedirs(bbox_washed_dir, exist_ok=True)
-    os.makedirs(ocr_washed_dir, exist_ok=True)
-    
-    # 初始化清洗器
-    washer = PaddleTextWasher()
+    output = WashedOutput(args.output_format, args.washed_dir, args.bbox_washed_dir, args.ocr_washed_dir,
+                          args.batch_file)
+    output.makedirs()
     
     # 处理输入目录中的所有JSON文件
-    input_dir = "data/paddleocr_version/ocr_summary"
-    
-    for filename in os.listdir(input_dir):
-        if filename.endswith('_results.json'):
-            input_file = os.path.join(input_dir, filename)
-            
-            # 处理文件
-            img_id, bbox_result, ocr_result = washer.process_file(input_file)
-            
-            if img_id and bbox_result and ocr_result:
-                # 使用图片ID作为输出文件名
-                bbox_output_file = os.path.join(bbox_washed_dir, f"{img_id}.json")
-                ocr_output_file = os.path.join(ocr_washed_dir, f"{img_id}.json")
-                
-                # 保存bbox_washed结果
-                with open(bbox_output_file, 'w', encoding='utf-8') as f:
-                    json.dump(bbox_result, f, ensure_ascii=False, indent=2)
-                    
-                # 保存ocr_washed结果
-                with open(ocr_output_file, 'w', encoding='utf-8') as f:
-                    json.dump(ocr_result, f, ensure_ascii=False, indent=2)
-                    
-                print(f"已处理并保存文件: {img_id}")
-            else:
+    input_dir = args.input_dir
+    washer_kwargs = {
+        "length_unit": args.length_unit,
+        "token_budget": args.token_budget,
+        "corrector_tokenizer_path": args.corrector_tokenizer,
+    }
+
+    try:
+        if args.workers > 1:
+            wash_directory_parallel(input_dir, output, args.workers, args.batch_size, **washer_kwargs)
+            return
+
+        # 初始化清洗器
+        washer = PaddleTextWasher(**washer_kwargs)
+
+        for input_file in list_input_files(input_dir):
+            filename = os.path.basename(input_file)
+            try:
+                # 处理文件
+                document = washer.load_document(input_file)
+                output.save(document["img_id"], output.build(washer, document))
+                print(f"已处理并保存文件: {document['img_id']}")
+            except Exception as e:
+                print(f"处理文件 {input_file} 时出错: {str(e)}")
                 print(f"处理文件失败: {filename}")
+    finally:
+        output.close()
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
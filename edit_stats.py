@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+纠错编辑汇总
+读取纠错结果中每句的编辑列表（batch_corrector写入的edits字段；没有该字段的旧结果在这里对齐一次），统计：
+改动的句子比例、各类编辑的数量和字符数、编辑在句中的位置分布，以及最常见的替换/插入/删除内容
+
+用法:
+    python edit_stats.py data/paddleocr_version/ocr_corrected --top 20
+"""
+
+import argparse
+import glob
+import json
+import os
+from collections import Counter
+
+from text_alignment import edit_spans
+
+OPS = ("replace", "delete", "insert")
+
+
+def load_sentences(paths):
+    """读取纠错结果目录或文件（支持通配符），返回 [(文件名, 纠错结果条目), ...]"""
+    entries = []
+    for pattern in paths:
+        for path in sorted(glob.glob(pattern)) or [pattern]:
+            files = sorted(glob.glob(os.path.join(path, "*.json"))) if os.path.isdir(path) else [path]
+            for file in files:
+                with open(file, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                for item in data.get("corrected_text_list", []):
+                    if item.get("edits") is None:
+                        item["edits"] = edit_spans(item["source_sentence"], item["predict_sentence"])
+                    entries.append((os.path.basename(file), item))
+    return entries
+
+
+def summarize(entries, top=20):
+    """打印编辑统计"""
+    if not entries:
+        print("没有纠错结果")
+        return
+
+    counts = Counter()
+    chars = Counter()
+    positions = Counter()
+    contents = {op: Counter() for op in OPS}
+    changed = 0
+    for _, item in entries:
+        source, predict = item["source_sentence"], item["predict_sentence"]
+        changed += bool(item["edits"])
+        for edit in item["edits"]:
+            op = edit["op"]
+            (i1, i2), (j1, j2) = edit["source_span"], edit["target_span"]
+            counts[op] += 1
+            chars[op] += max(i2 - i1, j2 - j1)
+            # 编辑起点在句子前/中/后三分之一
+            positions[min(2, i1 * 3 // max(len(source), 1))] += 1
+            if op == "replace":
+                contents[op][f"{source[i1:i2]} -> {predict[j1:j2]}"] += 1
+            elif op == "delete":
+                contents[op][source[i1:i2]] += 1
+            else:
+                contents[op][predict[j1:j2]] += 1
+
+    total = sum(counts.values())
+    print(f"句子: {len(entries)}, 有改动的句子: {changed} ({changed / len(entries):.1%}), 编辑: {total} "
+          f"(每个改动句 {total / max(changed, 1):.2f} 处)")
+    print(f"\n{'类型':<8} {'次数':>8} {'字符数':>8} {'平均长度':>8}")
+    for op in OPS:
+        print(f"{op:<8} {counts[op]:>8} {chars[op]:>8} {chars[op] / max(counts[op], 1):>8.2f}")
+    if total:
+        print("\n位置分布: " + ", ".join(f"{name} {positions[index] / total:.1%}"
+                                     for index, name in enumerate(("句首", "句中", "句末"))))
+    for op, name in zip(OPS, ("替换", "删除", "插入")):
+        if contents[op]:
+            print(f"\n最常见的{name}:")
+            for content, count in contents[op].most_common(top):
+                print(f"  {count:>6}  {content!r}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='纠错编辑汇总')
+    parser.add_argument('paths', nargs='*', default=['data/paddleocr_version/ocr_corrected'],
+                        help='纠错结果目录或文件，可用通配符')
+    parser.add_argument('--top', type=int, default=20, help='列出最常见的编辑内容数')
+    args = parser.parse_args()
+    summarize(load_sentences(args.paths), args.top)
+
+
+if __name__ == '__main__':
+    main()
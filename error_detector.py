@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+基于掩码语言模型（chinese-roberta-wwm-ext）的错误检测
+逐个遮住句中每个token，计算模型对原token的惊奇度（-log p），句子得分取最大值；
+得分低于阈值的句子认为无需纠错，不送入生成模型。
+
+同一批句子的所有遮盖位置一次前向计算，只在被遮盖的位置上计算词表logits。
+"""
+
+import time
+
+DEFAULT_DETECTOR_PATH = "models/chinese-roberta-wwm-ext"
+
+
+class MLMErrorDetector:
+    """
+    掩码语言模型惊奇度检测器
+
+    Args:
+        model_path: 掩码语言模型路径
+        threshold: 句子得分（最大token惊奇度，单位nat）达到该值才需要纠错
+        max_rows: 每次前向的遮盖行数（一行对应一个被遮盖的位置）
+        max_length: 句子最多取的token数
+    """
+
+    def __init__(self, model_path=DEFAULT_DETECTOR_PATH, threshold=8.0, max_rows=256, max_length=128):
+        self.model_path = model_path
+        # 模型在首次打分时加载，没有待纠错句子的运行不需要导入torch
+        self.model = None
+        self.threshold = threshold
+        self.max_rows = max_rows
+        self.max_length = max_length
+        self.stats = {"scored": 0, "passed": 0, "seconds": 0.0}
+
+    def load(self):
+        import torch
+        from transformers import AutoModelForMaskedLM, AutoTokenizer
+
+        self.tokenizer = AutoTokenizer.from_pretrained(self.model_path)
+        self.model = AutoModelForMaskedLM.from_pretrained(self.model_path)
+        self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+        self.model.to(self.device).eval()
+        # 只对被遮盖位置的隐状态做词表投影，避免 行数 x 长度 x 词表 的logits
+        self.encoder = self.model.base_model
+        self.head = self.model.cls if hasattr(self.model, "cls") else self.model.lm_head
+
+    def score(self, sentences):
+        """
+        每个句子的得分（最大token惊奇度），空句子为0
+
+        Returns:
+            [float, ...]，与输入顺序一致
+        """
+        if self.model is None:
+            self.load()
+        start = time.perf_counter()
+        encoded = self.tokenizer(list(sentences), truncation=True, max_length=self.max_length).input_ids
+        scores = [0.0] * len(encoded)
+        # 按长度排序，同一次前向的句子长度相近
+        order = sorted(range(len(encoded)), key=lambda i: len(encoded[i]))
+
+        chunk, rows = [], 0
+        for index in order:
+            # 去掉[CLS]和[SEP]后的token数
+            count = len(encoded[index]) - 2
+            if count <= 0:
+                continue
+            if chunk and rows + count > self.max_rows:
+                self._score_chunk(encoded, chunk, scores)
+                chunk, rows = [], 0
+            chunk.append(index)
+            rows += count
+        if chunk:
+            self._score_chunk(encoded, chunk, scores)
+
+        self.stats["scored"] += len(encoded)
+        self.stats["seconds"] += time.perf_counter() - start
+        return scores
+
+    def _score_chunk(self, encoded, chunk, scores):
+        import torch
+
+        max_len = max(len(encoded[index]) for index in chunk)
+        pad_id = self.tokenizer.pad_token_id
+        ids = torch.tensor([encoded[index] + [pad_id] * (max_len - len(encoded[index])) for index in chunk])
+        mask = (torch.arange(max_len)[None, :] < torch.tensor([len(encoded[index]) for index in chunk])[:, None]).long()
+
+        # 每个被遮盖位置一行：sentence为所在句子在chunk中的下标，position为遮盖位置
+        sentence = torch.cat([torch.full((len(encoded[index]) - 2,), row) for row, index in enumerate(chunk)])
+        position = torch.cat([torch.arange(1, len(encoded[index]) - 1) for index in chunk])
+        rows = torch.arange(len(sentence))
+        input_ids = ids[sentence]
+        original = input_ids[rows, position].clone()
+        input_ids[rows, position] = self.tokenizer.mask_token_id
+
+        with torch.no_grad():
+            hidden = self.encoder(input_ids=input_ids.to(self.device),
+                                  attention_mask=mask[sentence].to(self.device))[0]
+            logits = self.head(hidden[rows.to(self.device), position.to(self.device)])
+            surprisal = -torch.log_softmax(logits.float(), dim=-1)[rows.to(self.device), original.to(self.device)]
+
+        maxima = torch.zeros(len(chunk), device=surprisal.device).scatter_reduce(
+            0, sentence.to(surprisal.device), surprisal, reduce="amax", include_self=False)
+        for row, index in enumerate(chunk):
+            scores[index] = maxima[row].item()
+
+    def needs_correction(self, sentences):
+        """
+        按阈值判断每个句子是否需要送入纠错模型
+
+        Returns:
+            [bool, ...]，与输入顺序一致
+        """
+        flags = [score >= self.threshold for score in self.score(sentences)]
+        self.stats["passed"] += flags.count(False)
+        return flags
+
+
+def add_detector_args(parser):
+    """添加检测器相关的命令行参数"""
+    parser.add_argument('--detector_threshold', type=float, default=None,
+                        help='启用掩码语言模型检测：句子最大token惊奇度低于该值时不纠错，直接保留原句')
+    parser.add_argument('--detector_model_path', type=str, default=DEFAULT_DETECTOR_PATH)
+    parser.add_argument('--detector_max_rows', type=int, default=256, help='检测时每次前向的遮盖行数')
+
+
+def build_detector(args):
+    """按命令行参数创建检测器，未指定阈值时返回None"""
+    if args.detector_threshold is None:
+        return None
+    return MLMErrorDetector(args.detector_model_path, threshold=args.detector_threshold,
+                            max_rows=args.detector_max_rows)
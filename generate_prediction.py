@@ -2,12 +2,18 @@ import json
 import os
 import zipfile
 import re
-from difflib import SequenceMatcher
 import numpy as np
 
+from text_alignment import edit_spans
+from washed_store import WashedDocument, WashedStore, load_washed_file
+
 # 全局配置：bbox数量限制
 MAX_BBOX_LIMIT = 1  # 可以通过修改这个数值统一控制所有函数的bbox数量限制
 
+# 清洗结果位置：优先使用紧凑格式（目录或 .jsonl 批量文件），不存在时回退到旧的bbox_washed目录
+WASHED_PATH = 'data/paddleocr_version/washed'
+LEGACY_BBOX_WASHED_DIR = 'data/paddleocr_version/bbox_washed'
+
 def get_file_id(path):
     """从文件路径中提取ID"""
     base_name = os.path.basename(path)
@@ -195,7 +201,7 @@ def process_corrected_file(corrected_file_path, bbox_file_path):
     处理纠错文件和bbox文件，生成预测文本和bbox列表
     Args:
         corrected_file_path: 纠错结果文件路径
-        bbox_file_path: bbox文件路径
+        bbox_file_path: 清洗结果文件路径（紧凑格式或旧bbox_washed），或已读取的WashedDocument
     Returns:
         tuple: (predict_text, bounding_box_list)
     """
@@ -204,34 +210,45 @@ def process_corrected_file(corrected_file_path, bbox_file_path):
         with open(corrected_file_path, 'r', encoding='utf-8') as f:
             corrected_data = json.load(f)
         
-        # 读取bbox文件
-        with open(bbox_file_path, 'r', encoding='utf-8') as f:
-            bbox_data = json.load(f)
+        # 读取bbox信息
+        if isinstance(bbox_file_path, WashedDocument):
+            washed_document = bbox_file_path
+        else:
+            washed_document = load_washed_file(bbox_file_path)
+        bbox_data = washed_document.to_bbox_washed()
         
-        # 提取纠错后的文本和变化信息
+        # 提取纠错后的文本和编辑信息
         predict_text = ""
-        correction_chars = []  # 存储发生变化的字符信息
+        sentence_edits = {}  # {sentence_id: 编辑列表}
         
         if 'corrected_text_list' in corrected_data:
             corrected_sentences = []
-            for item in corrected_data['corrected_text_list']:
+            for sentence_id, item in enumerate(corrected_data['corrected_text_list']):
                 source_sentence = item.get('source_sentence', '')
                 predict_sentence = item.get('predict_sentence', '')
                 corrected_sentences.append(predict_sentence)
                 
-                # 找出发生变化的字符位置
-                changes = find_text_changes(source_sentence, predict_sentence)
-                correction_chars.extend(changes)
+                # 纠错阶段写入的编辑列表；旧的纠错结果没有时在这里对齐一次
+                edits = item.get('edits')
+                if edits is None:
+                    edits = edit_spans(source_sentence, predict_sentence)
+                if edits:
+                    sentence_edits[item.get('sentence_id', sentence_id)] = edits
             
             predict_text = ' '.join(corrected_sentences)
         
         # 提取所有字符的bbox信息
         all_char_bboxes = []
+        char_index = {}  # {(sentence_id, 句内字符偏移): all_char_bboxes中的下标}
         if 'sentences' in bbox_data:
             for sentence in bbox_data['sentences']:
                 if 'chars' in sentence:
-                    for char_info in sentence['chars']:
+                    # chars对应句子所在的原始区间，句子文本去掉了首尾空白
+                    raw = ''.join(char_info.get('char', '') for char_info in sentence['chars'])
+                    lead = len(raw) - len(raw.lstrip())
+                    for offset, char_info in enumerate(sentence['chars']):
                         if 'bbox' in char_info and len(char_info['bbox']) >= 4:
+                            char_index[(sentence.get('sentence_id', 0), offset - lead)] = len(all_char_bboxes)
                             bbox_info = {
                                 'start_x': float(char_info['bbox'][0]),
                                 'start_y': float(char_info['bbox'][1]),
@@ -245,6 +262,7 @@ def process_corrected_file(corrected_file_path, bbox_file_path):
         
         # 选择错误相关的bbox
         selected_bboxes = []
+        correction_chars = edit_positions(sentence_edits, char_index)
         
         if correction_chars:
             # 基于纠错信息选择bbox
@@ -270,46 +288,28 @@ def process_corrected_file(corrected_file_path, bbox_file_path):
         print(f"处理文件时出错: {str(e)}")
         return "", []
 
-def find_text_changes(source_text, predict_text):
+def edit_positions(sentence_edits, char_index):
     """
-    找出两个文本之间的变化位置
+    把各句的编辑换算为字符bbox的下标
+    Args:
+        sentence_edits: {sentence_id: 编辑列表}，编辑的source_span为在句子中的字符偏移
+        char_index: {(sentence_id, 句内字符偏移): all_char_bboxes中的下标}
     Returns: 变化字符的位置信息列表
     """
     changes = []
-    
-    # 使用简单的字符对比找出不同之处
-    min_len = min(len(source_text), len(predict_text))
-    
-    for i in range(min_len):
-        if source_text[i] != predict_text[i]:
-            changes.append({
-                'position': i,
-                'source_char': source_text[i],
-                'predict_char': predict_text[i],
-                'change_type': 'substitution'
-            })
-    
-    # 处理长度不同的情况
-    if len(source_text) != len(predict_text):
-        if len(source_text) > len(predict_text):
-            # 删除操作
-            for i in range(min_len, len(source_text)):
-                changes.append({
-                    'position': i,
-                    'source_char': source_text[i],
-                    'predict_char': '',
-                    'change_type': 'deletion'
-                })
-        else:
-            # 插入操作
-            for i in range(min_len, len(predict_text)):
-                changes.append({
-                    'position': i,
-                    'source_char': '',
-                    'predict_char': predict_text[i],
-                    'change_type': 'insertion'
-                })
-    
+    for sentence_id, edits in sentence_edits.items():
+        for edit in edits:
+            start, end = edit['source_span']
+            # 插入没有对应的原文字符，取插入点前一个字符（句首插入取第一个字符）
+            offsets = range(start, end) if end > start else [max(start - 1, 0)]
+            for offset in offsets:
+                position = char_index.get((sentence_id, offset))
+                if position is not None:
+                    changes.append({
+                        'position': position,
+                        'sentence_id': sentence_id,
+                        'change_type': edit['op']
+                    })
     return changes
 
 def select_correction_bboxes(correction_chars, all_char_bboxes):
@@ -428,17 +428,17 @@ def main():
     
     processed_count = 0
     total_bbox_count = 0
+    washed_store = WashedStore(WASHED_PATH if os.path.exists(WASHED_PATH) else LEGACY_BBOX_WASHED_DIR)
     
     print(f"开始处理 {len(test_data)} 个文件...")
     
     for i, item in enumerate(test_data):
         file_id = get_file_id(item['path'])
         corrected_file_path = f'data/paddleocr_version/ocr_corrected/{file_id}.json'
-        bbox_file_path = f'data/paddleocr_version/bbox_washed/{file_id}.json'
         
-        if os.path.exists(corrected_file_path) and os.path.exists(bbox_file_path):
+        if os.path.exists(corrected_file_path) and file_id in washed_store:
             try:
-                predict_text, bounding_box_list = process_corrected_file(corrected_file_path, bbox_file_path)
+                predict_text, bounding_box_list = process_corrected_file(corrected_file_path, washed_store.get(file_id))
                 item['predict_text'] = predict_text
                 item['bounding_box_list'] = bounding_box_list
                 
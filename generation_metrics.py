@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+生成调用级别的性能记录
+每次生成调用（一批句子）写一行JSON：批大小、每句输入/输出token数、prefill耗时、首token时间（TTFT）、
+解码速度、输入填充比例及解码阶段已结束行的比例；直接运行本文件汇总一个或多个记录文件。
+
+每行格式:
+    {
+        "time": 1700000000.0, "batch_size": 8, "mode": "batch",
+        "prefill_seconds": 0.12, "ttft_seconds": 0.13, "decode_seconds": 0.8, "total_seconds": 0.93,
+        "steps": 40, "decode_tokens_per_second": 300.0,
+        "prompt_padding_fraction": 0.1, "decode_padding_fraction": 0.3,
+        "rows": [{"sentence": "...", "input_tokens": 30, "output_tokens": 28, "reason": "eos", "latency_seconds": 0.7}]
+    }
+
+用法:
+    python generation_metrics.py data/paddleocr_version/generation_metrics.jsonl --top 10
+"""
+
+import argparse
+import glob
+import json
+import math
+import os
+import time
+
+
+class StepTimer:
+    """
+    记录每个解码步得到logits的时间，不修改分数
+
+    第一次调用发生在prefill完成后，之后每生成一个token调用一次；
+    generate只要求logits处理器可调用，不继承transformers的LogitsProcessor，导入本模块时不必加载torch
+    """
+
+    def __init__(self):
+        self.step_times = []
+
+    def __call__(self, input_ids, scores):
+        self.step_times.append(time.perf_counter())
+        return scores
+
+
+def build_record(call_start, generate_start, step_times, end, texts, input_tokens, output_tokens, reasons,
+                 prompt_padding_fraction, mode="batch"):
+    """
+    由一次生成调用的计时构建记录
+
+    Args:
+        call_start: 调用开始时间（含分词、组batch，不含流水线中排队等待的时间）
+        generate_start: 开始前向计算的时间
+        step_times: 每个解码步得到logits的时间
+        output_tokens: 每行生成的token数（含结束token）
+    """
+    first = step_times[0] if step_times else end
+    decode_seconds = end - first
+    # 首token之后的token由解码阶段生成
+    decoded = sum(max(0, count - 1) for count in output_tokens)
+    steps = max(output_tokens, default=0)
+    rows = []
+    for text, in_count, out_count, reason in zip(texts, input_tokens, output_tokens, reasons):
+        # 行在第out_count步结束，该步的logits在step_times[out_count - 1]得到
+        finish = step_times[out_count - 1] if 0 < out_count <= len(step_times) else end
+        rows.append({
+            "sentence": text,
+            "input_tokens": in_count,
+            "output_tokens": out_count,
+            "reason": reason,
+            "latency_seconds": finish - call_start,
+        })
+    return {
+        "time": time.time(),
+        "mode": mode,
+        "batch_size": len(texts),
+        "prefill_seconds": first - generate_start,
+        "ttft_seconds": first - call_start,
+        "decode_seconds": decode_seconds,
+        "total_seconds": end - call_start,
+        "steps": steps,
+        "decode_tokens_per_second": decoded / decode_seconds if decode_seconds > 0 else 0.0,
+        "prompt_padding_fraction": prompt_padding_fraction,
+        # 解码阶段已结束的行仍参与计算的比例
+        "decode_padding_fraction": 1 - sum(output_tokens) / (steps * len(texts)) if steps else 0.0,
+        "rows": rows,
+    }
+
+
+class MetricsWriter:
+    """追加写入生成记录（JSON Lines），每行写完立即flush"""
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._file = open(path, 'a', encoding='utf-8')
+
+    def write(self, record):
+        self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+def load_records(paths):
+    """读取一个或多个记录文件（支持通配符），忽略不完整的行"""
+    records = []
+    for pattern in paths:
+        for path in sorted(glob.glob(pattern)) or [pattern]:
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        records.append(json.loads(line))
+                    except json.JSONDecodeError:
+                        continue
+    return records
+
+
+def percentile(values, q):
+    """最近秩百分位数"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, math.ceil(q / 100 * len(ordered)) - 1)
+    return ordered[index]
+
+
+def summarize(records, top=10):
+    """打印各指标的分位数和最慢的句子"""
+    rows = [dict(row, batch_size=record["batch_size"]) for record in records for row in record["rows"]]
+    if not rows:
+        print("没有生成记录")
+        return
+
+    total_seconds = sum(record["total_seconds"] for record in records)
+    output_tokens = sum(row["output_tokens"] for row in rows)
+    print(f"生成调用: {len(records)}, 句子: {len(rows)}, 输入token: {sum(row['input_tokens'] for row in rows)}, "
+          f"输出token: {output_tokens}, 生成总耗时: {total_seconds:.2f} 秒 "
+          f"({output_tokens / total_seconds if total_seconds else 0:.1f} token/秒)")
+
+    metrics = [
+        ("批大小", [record["batch_size"] for record in records], "{:.0f}"),
+        ("prefill (ms)", [record["prefill_seconds"] * 1000 for record in records], "{:.1f}"),
+        ("TTFT (ms)", [record["ttft_seconds"] * 1000 for record in records], "{:.1f}"),
+        ("调用耗时 (ms)", [record["total_seconds"] * 1000 for record in records], "{:.1f}"),
+        ("解码 token/秒", [record["decode_tokens_per_second"] for record in records], "{:.1f}"),
+        ("输入填充比例", [record["prompt_padding_fraction"] for record in records], "{:.1%}"),
+        ("解码空转比例", [record["decode_padding_fraction"] for record in records], "{:.1%}"),
+        ("句子输入token", [row["input_tokens"] for row in rows], "{:.0f}"),
+        ("句子输出token", [row["output_tokens"] for row in rows], "{:.0f}"),
+        ("句子延迟 (ms)", [row["latency_seconds"] * 1000 for row in rows], "{:.1f}"),
+    ]
+    print(f"\n{'指标':<14} {'p50':>10} {'p90':>10} {'p99':>10} {'max':>10}")
+    for name, values, fmt in metrics:
+        print(f"{name:<14} " + " ".join(f"{fmt.format(percentile(values, q)):>10}" for q in (50, 90, 99, 100)))
+
+    reasons = {}
+    for row in rows:
+        reasons[row["reason"]] = reasons.get(row["reason"], 0) + 1
+    print("\n结束方式: " + ", ".join(f"{reason} {count}" for reason, count in sorted(reasons.items())))
+
+    print(f"\n最慢的 {min(top, len(rows))} 个句子:")
+    for row in sorted(rows, key=lambda row: row["latency_seconds"], reverse=True)[:top]:
+        print(f"  {row['latency_seconds'] * 1000:>8.1f} ms  输入 {row['input_tokens']:>4} 输出 {row['output_tokens']:>4} "
+              f"批 {row['batch_size']:>3} {row['reason']:<12} {row['sentence'][:40]}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='汇总生成调用记录')
+    parser.add_argument('metrics_files', nargs='+', help='记录文件（JSONL），可用通配符合并多个分片')
+    parser.add_argument('--top', type=int, default=10, help='列出最慢的句子数')
+    args = parser.parse_args()
+    summarize(load_records(args.metrics_files), args.top)
+
+
+if __name__ == '__main__':
+    main()
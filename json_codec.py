@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+JSON编解码工具
+优先使用orjson（可选依赖），不可用时回退到标准库json
+"""
+
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+BACKENDS = ('auto', 'json', 'orjson')
+
+
+def resolve_backend(backend='auto'):
+    """
+    解析实际使用的JSON后端
+
+    Args:
+        backend: 'auto' / 'json' / 'orjson'
+
+    Returns:
+        实际使用的后端名称
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"未知的JSON后端: {backend}")
+    if backend == 'auto':
+        return 'orjson' if orjson is not None else 'json'
+    if backend == 'orjson' and orjson is None:
+        raise ImportError("未安装orjson，请执行 pip install orjson 或改用 json 后端")
+    return backend
+
+
+def loads(data, backend='auto'):
+    """解析JSON字符串或UTF-8字节串"""
+    if resolve_backend(backend) == 'orjson':
+        return orjson.loads(data)
+    if isinstance(data, (bytes, bytearray)):
+        data = data.decode('utf-8')
+    return json.loads(data)
+
+
+def dumps(obj, compact=False, backend='auto'):
+    """
+    序列化为UTF-8字节串（非ASCII字符原样保留）
+
+    Args:
+        obj: 待序列化对象
+        compact: True时输出无缩进的紧凑格式，否则使用2空格缩进
+        backend: JSON后端
+    """
+    if resolve_backend(backend) == 'orjson':
+        return orjson.dumps(obj) if compact else orjson.dumps(obj, option=orjson.OPT_INDENT_2)
+    if compact:
+        text = json.dumps(obj, ensure_ascii=False, separators=(',', ':'))
+    else:
+        text = json.dumps(obj, ensure_ascii=False, indent=2)
+    return text.encode('utf-8')
+
+
+def load_file(path, backend='auto'):
+    """读取JSON文件"""
+    with open(path, 'rb') as f:
+        return loads(f.read(), backend)
+
+
+def dump_file(obj, path, compact=False, backend='auto'):
+    """
+    写入JSON文件
+
+    Returns:
+        写入的字节数
+    """
+    data = dumps(obj, compact=compact, backend=backend)
+    with open(path, 'wb') as f:
+        f.write(data)
+    return len(data)
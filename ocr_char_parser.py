@@ -5,13 +5,17 @@
 能够更准确地从表格和图片OCR结果中提取每个字符的坐标框
 """
 
-import json
+import argparse
 import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from typing import Dict, List, Any
 from pathlib import Path
 import logging
 from bs4 import BeautifulSoup
 
+import json_codec
+
 # 配置日志
 logging.basicConfig(
     level=logging.INFO,
@@ -19,8 +23,11 @@ logging.basicConfig(
 )
 
 class ImprovedCharParser:
-    def __init__(self):
+    def __init__(self, json_backend='auto', compact=False):
         self.logger = logging.getLogger(__name__)
+        # JSON后端（auto优先使用orjson）及是否输出紧凑格式
+        self.json_backend = json_codec.resolve_backend(json_backend)
+        self.compact = compact
     
     def parse_table_ocr_result(self, ocr_data: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -83,6 +90,8 @@ class ImprovedCharParser:
             if 'text' in text_item:
                 text = text_item.get('text', '')
                 all_text += text
+                # 行识别置信度，记录到该行的每个字符上
+                confidence = text_item.get('confidence')
                 
                 words = text_item.get('text_word', [])
                 word_regions = text_item.get('text_word_region', [])
@@ -124,6 +133,8 @@ class ImprovedCharParser:
                                         "char": char,
                                         "bbox": [round(char_x1, 2), round(y1, 2), round(char_x2, 2), round(y2, 2)]
                                     }
+                                    if confidence is not None:
+                                        char_box["confidence"] = round(float(confidence), 4)
                                     char_boxes.append(char_box)
         
         # 构建结果
@@ -220,94 +231,230 @@ class ImprovedCharParser:
         
         return char_boxes
     
-    def save_results(self, results: Dict[str, Any], output_path: str):
+    def save_results(self, results: Dict[str, Any], output_path: str) -> int:
         """
         保存解析结果到JSON文件
+
+        Returns:
+            写入的字节数，失败时为0
         """
         try:
             os.makedirs(os.path.dirname(output_path), exist_ok=True)
-            with open(output_path, 'w', encoding='utf-8') as f:
-                json.dump(results, f, ensure_ascii=False, indent=2)
+            # 先写临时文件再改名，监听目录的下游（stream_washer --watch）不会读到写了一半的文件
+            temp_path = output_path + '.tmp'
+            written = json_codec.dump_file(results, temp_path, compact=self.compact, backend=self.json_backend)
+            os.replace(temp_path, output_path)
             self.logger.info(f"单字解析结果已保存到: {output_path}")
+            return written
         except Exception as e:
             self.logger.error(f"保存结果失败: {e}")
+            return 0
+
+def read_ocr_results(res_file: str, json_backend: str = 'auto'):
+    """
+    按行读取res_0.txt中的OCR结果
+
+    Returns:
+        (OCR结果列表, 读取的字节数)
+    """
+    with open(res_file, 'rb') as f:
+        raw = f.read()
+
+    ocr_results = []
+    for line in raw.splitlines():
+        line = line.strip()
+        if not line:  # 跳过空行
+            continue
+        try:
+            ocr_results.append(json_codec.loads(line, json_backend))
+        except ValueError as e:
+            logging.warning(f"解析JSON行失败: {e}, 行内容: {line[:100].decode('utf-8', 'replace')}...")
+
+    return ocr_results, len(raw)
+
+
+def parse_document(doc_id: str, input_dir: str, parser: "ImprovedCharParser" = None):
+    """
+    解析单个文档目录的OCR结果
+
+    Returns:
+        (解析结果字典, 读取的字节数)；找不到res_0.txt时解析结果为None
+    """
+    parser = parser or ImprovedCharParser()
+
+    # 修正res_0.txt文件路径
+    res_file = os.path.join(input_dir, doc_id, "structure", doc_id, "res_0.txt")
+    if not os.path.exists(res_file):
+        logging.warning(f"找不到文件: {res_file}")
+        return None, 0
+
+    # 读取OCR结果 - 按行读取
+    ocr_results, bytes_read = read_ocr_results(res_file, parser.json_backend)
+
+    # 处理OCR结果
+    parsed_results = []
+    for result in ocr_results:
+        result_type = result.get('type', '')
+        if result_type == 'table':
+            parsed_result = parser.parse_table_ocr_result(result)
+            if parsed_result:
+                parsed_results.append(parsed_result)
+        elif result_type == 'figure':
+            parsed_result = parser.parse_figure_ocr_result(result)
+            if parsed_result:
+                parsed_results.append(parsed_result)
+
+    final_results = {
+        'doc_id': doc_id,
+        'result_count': len(parsed_results),
+        'results': parsed_results
+    }
+    return final_results, bytes_read
+
+
+def process_document(doc_id: str, input_dir: str, output_dir: str,
+                     json_backend: str = 'auto', compact: bool = False) -> Dict[str, Any]:
+    """
+    处理单个文档目录，可在子进程中执行
+
+    Returns:
+        处理统计：doc_id、是否成功、读取/写入字节数
+    """
+    stats = {'doc_id': doc_id, 'ok': False, 'bytes_read': 0, 'bytes_written': 0}
+    parser = ImprovedCharParser(json_backend=json_backend, compact=compact)
+
+    try:
+        final_results, stats['bytes_read'] = parse_document(doc_id, input_dir, parser)
+        if final_results is None:
+            return stats
+        logging.info(f"处理文档 {doc_id}")
+
+        # 保存结果
+        output_path = os.path.join(output_dir, f"{doc_id}_results.json")
+        stats['bytes_written'] = parser.save_results(final_results, output_path)
+        stats['ok'] = stats['bytes_written'] > 0
+
+    except Exception as e:
+        logging.error(f"处理文档 {doc_id} 时出错: {e}")
+
+    return stats
+
 
-def process_ocr_output(input_dir: str, output_dir: str):
+def _parse_document_args(args):
+    """进程池入口：只解析不保存"""
+    doc_id, input_dir = args
+    try:
+        return parse_document(doc_id, input_dir)[0]
+    except Exception as e:
+        logging.error(f"处理文档 {doc_id} 时出错: {e}")
+        return None
+
+
+def iter_parsed_documents(input_dir: str, workers: int = 1):
+    """
+    逐个产出解析结果（与ocr_summary中 *_results.json 的内容相同），不写文件
+
+    多进程时按完成顺序产出，下游可以边解析边处理
+    """
+    doc_ids = [doc_id for doc_id in sorted(os.listdir(input_dir))
+               if os.path.isdir(os.path.join(input_dir, doc_id))]
+    tasks = [(doc_id, input_dir) for doc_id in doc_ids]
+
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(_parse_document_args, task) for task in tasks]
+            for future in as_completed(futures):
+                result = future.result()
+                if result is not None:
+                    yield result
+    else:
+        for task in tasks:
+            result = _parse_document_args(task)
+            if result is not None:
+                yield result
+
+
+def _process_document_args(args):
+    """进程池入口（参数打包为元组）"""
+    return process_document(*args)
+
+
+def process_ocr_output(input_dir: str, output_dir: str, workers: int = 1,
+                       json_backend: str = 'auto', compact: bool = False) -> Dict[str, Any]:
     """
     批量处理OCR输出目录下的所有文件
     
     Args:
         input_dir: OCR输出目录路径
         output_dir: 结果保存目录路径
+        workers: 并行进程数，1表示在当前进程中顺序处理
+        json_backend: JSON后端（auto/json/orjson）
+        compact: 是否输出无缩进的紧凑JSON
+
+    Returns:
+        汇总统计信息
     """
-    parser = ImprovedCharParser()
-    
+    # 提前校验后端，避免每个子进程各自报错
+    json_backend = json_codec.resolve_backend(json_backend)
+
     # 遍历所有文档目录
-    for doc_id in os.listdir(input_dir):
-        doc_path = os.path.join(input_dir, doc_id)
-        if not os.path.isdir(doc_path):
-            continue
-            
-        # 修正res_0.txt文件路径
-        res_file = os.path.join(doc_path, "structure", doc_id, "res_0.txt")
-        if not os.path.exists(res_file):
-            logging.warning(f"找不到文件: {res_file}")
-            continue
-            
-        logging.info(f"处理文档 {doc_id}")
-        
-        try:
-            # 读取OCR结果 - 修改为按行读取
-            ocr_results = []
-            with open(res_file, 'r', encoding='utf-8') as f:
-                for line in f:
-                    try:
-                        line = line.strip()
-                        if line:  # 跳过空行
-                            ocr_data = json.loads(line)
-                            ocr_results.append(ocr_data)
-                    except json.JSONDecodeError as e:
-                        logging.warning(f"解析JSON行失败: {e}, 行内容: {line[:100]}...")
-                        continue
-            
-            # 处理OCR结果
-            parsed_results = []
-            for result in ocr_results:
-                result_type = result.get('type', '')
-                if result_type == 'table':
-                    parsed_result = parser.parse_table_ocr_result(result)
-                    if parsed_result:
-                        parsed_results.append(parsed_result)
-                elif result_type == 'figure':
-                    parsed_result = parser.parse_figure_ocr_result(result)
-                    if parsed_result:
-                        parsed_results.append(parsed_result)
-            
-            # 保存结果
-            output_path = os.path.join(output_dir, f"{doc_id}_results.json")
-            final_results = {
-                'doc_id': doc_id,
-                'result_count': len(parsed_results),
-                'results': parsed_results
-            }
-            parser.save_results(final_results, output_path)
-            
-        except Exception as e:
-            logging.error(f"处理文档 {doc_id} 时出错: {e}")
+    doc_ids = [doc_id for doc_id in sorted(os.listdir(input_dir))
+               if os.path.isdir(os.path.join(input_dir, doc_id))]
+    tasks = [(doc_id, input_dir, output_dir, json_backend, compact) for doc_id in doc_ids]
+
+    start_time = time.perf_counter()
+    if workers > 1 and len(tasks) > 1:
+        chunksize = max(1, len(tasks) // (workers * 4))
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            doc_stats = list(executor.map(_process_document_args, tasks, chunksize=chunksize))
+    else:
+        doc_stats = [_process_document_args(task) for task in tasks]
+    elapsed = time.perf_counter() - start_time
+
+    summary = {
+        'docs': sum(1 for s in doc_stats if s['ok']),
+        'failed': sum(1 for s in doc_stats if not s['ok']),
+        'workers': workers,
+        'json_backend': json_backend,
+        'compact': compact,
+        'elapsed_seconds': elapsed,
+        'bytes_read': sum(s['bytes_read'] for s in doc_stats),
+        'bytes_written': sum(s['bytes_written'] for s in doc_stats),
+    }
+    summary['docs_per_second'] = summary['docs'] / elapsed if elapsed > 0 else 0.0
+
+    logging.info(
+        f"解析完成: {summary['docs']} 个文档 (失败 {summary['failed']}), "
+        f"耗时 {elapsed:.2f} 秒, {summary['docs_per_second']:.1f} docs/s, "
+        f"读取 {summary['bytes_read'] / 1024 / 1024:.2f} MB, "
+        f"写入 {summary['bytes_written'] / 1024 / 1024:.2f} MB "
+        f"(workers={workers}, backend={json_backend}, compact={compact})"
+    )
+    return summary
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='解析OCR输出，生成单字级别的字符框')
+    # 修正输入输出目录路径
+    parser.add_argument('--input_dir', type=str, default="data/paddleocr_version/ocr_output", help='OCR输出目录')
+    parser.add_argument('--output_dir', type=str, default="data/paddleocr_version/ocr_summary", help='解析结果保存目录')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='并行进程数，1为顺序处理')
+    parser.add_argument('--json_backend', type=str, default='auto', choices=json_codec.BACKENDS,
+                        help='JSON后端，auto时优先使用orjson')
+    parser.add_argument('--compact', action='store_true', help='输出无缩进的紧凑JSON')
+    return parser.parse_args()
 
 def main():
     """主函数"""
-    # 修正输入输出目录路径
-    input_dir = "data/paddleocr_version/ocr_output"
-    output_dir = "data/paddleocr_version/ocr_summary"
+    args = parse_args()
     
     # 确保输出目录存在
-    os.makedirs(output_dir, exist_ok=True)
+    os.makedirs(args.output_dir, exist_ok=True)
     
     # 处理所有文件
-    process_ocr_output(input_dir, output_dir)
+    process_ocr_output(args.input_dir, args.output_dir, workers=args.workers,
+                       json_backend=args.json_backend, compact=args.compact)
     
     print("\n处理完成!")
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main() 
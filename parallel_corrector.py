@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+多进程数据并行纠错
+把清洗结果按句子数（或token数）均衡地分成N片，每片由一个独立进程加载一份模型处理，
+进程绑定各自的GPU或CPU核心；全部完成后合并各片的时间记录。
+
+输出文件各片互不重叠，直接写入同一个输出目录；结果缓存为SQLite（WAL），各进程共享。
+"""
+
+import argparse
+import heapq
+import json
+import multiprocessing
+import os
+import time
+from datetime import datetime
+
+from washed_store import WashedStore
+
+
+def document_weights(input_dir, balance='sentences', tokenizer_path=None):
+    """
+    每个文档的工作量
+
+    Args:
+        balance: 'sentences' 按句子数，'tokens' 按纠错模型分词后的token数
+    """
+    tokenizer = None
+    if balance == 'tokens':
+        from transformers import AutoTokenizer
+        tokenizer = AutoTokenizer.from_pretrained(tokenizer_path)
+
+    weights = {}
+    for doc_id, document in WashedStore(input_dir):
+        sentences = document.sentences()
+        if tokenizer is not None:
+            weights[doc_id] = sum(len(ids) for ids in tokenizer(sentences, add_special_tokens=False).input_ids) \
+                if sentences else 0
+        else:
+            weights[doc_id] = len(sentences)
+    return weights
+
+
+def shard_documents(weights, num_shards):
+    """
+    按工作量把文档分到num_shards片（从大到小依次放入当前最轻的一片）
+
+    Returns:
+        [[doc_id, ...], ...]，每片内按文档ID排序；相同输入得到相同分片，便于断点续跑
+    """
+    shards = [[] for _ in range(num_shards)]
+    heap = [(0, shard_id) for shard_id in range(num_shards)]
+    for doc_id, weight in sorted(weights.items(), key=lambda item: (-item[1], item[0])):
+        load, shard_id = heapq.heappop(heap)
+        shards[shard_id].append(doc_id)
+        heapq.heappush(heap, (load + weight, shard_id))
+    return [sorted(shard) for shard in shards]
+
+
+def assign_devices(num_workers, devices=None):
+    """
+    为每个进程分配设备
+
+    Args:
+        devices: 逗号分隔的GPU编号（如 "0,1"），为空时使用CPU，并把可用核心平均分给各进程
+
+    Returns:
+        [(cuda_visible_devices, cpu_set), ...]，cpu_set为None表示不绑定核心
+    """
+    if devices:
+        gpus = devices.split(',')
+        return [(gpus[i % len(gpus)], None) for i in range(num_workers)]
+
+    cores = sorted(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else list(range(os.cpu_count()))
+    per_worker = max(1, len(cores) // num_workers)
+    assignments = []
+    for i in range(num_workers):
+        cpu_set = cores[i * per_worker:(i + 1) * per_worker] or [cores[i % len(cores)]]
+        assignments.append(("", cpu_set))
+    return assignments
+
+
+def shard_time_log(time_log_file, shard_id):
+    """分片的时间记录文件，与合并后的文件放在一起"""
+    base, ext = os.path.splitext(time_log_file)
+    return f"{base}.shard{shard_id}{ext}"
+
+
+def _run_shard(shard_id, doc_ids, args, cuda_visible_devices, cpu_set):
+    """子进程入口：绑定设备后加载模型并处理本片文档"""
+    os.environ["CUDA_VISIBLE_DEVICES"] = cuda_visible_devices
+    if cpu_set is not None:
+        os.environ["OMP_NUM_THREADS"] = str(len(cpu_set))
+        if hasattr(os, 'sched_setaffinity'):
+            os.sched_setaffinity(0, cpu_set)
+
+    # 环境变量设置后再导入（torch在加载模型时才导入）
+    from batch_corrector import CorrectionJournal, build_batch_corrector
+
+    if cpu_set is not None:
+        # 加载模型时按num_threads设置torch线程数，不超过本片绑定的核心数，避免各片互相争抢核心
+        args.num_threads = min(args.num_threads or len(cpu_set), len(cpu_set))
+    if args.metrics_file:
+        # 各分片写各自的生成记录，汇总时用通配符合并
+        args.metrics_file = shard_time_log(args.metrics_file, shard_id)
+    corrector = build_batch_corrector(args)
+    corrector.time_log_file = shard_time_log(args.time_log_file, shard_id)
+    corrector.journal = CorrectionJournal(os.path.join(args.output_dir, f"correction_journal.shard{shard_id}.jsonl"))
+    corrector.process_all_files(resume=args.resume, doc_ids=doc_ids)
+
+
+def merge_time_logs(num_shards, wall_seconds, start_time, output_file="correction_time_log.json"):
+    """合并各片的时间记录，吞吐量按整体墙钟时间计算"""
+    merged = {
+        "start_time": datetime.fromtimestamp(start_time).strftime('%Y-%m-%d %H:%M:%S'),
+        "end_time": datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        "total_duration": wall_seconds,
+        "files": [],
+        "workers": num_shards,
+        "sentences": 0,
+        "generated_sentences": 0,
+        "generation_calls": 0,
+        "generation_stats": {},
+        "shards": [],
+    }
+    for shard_id in range(num_shards):
+        log_file = shard_time_log(output_file, shard_id)
+        if not os.path.exists(log_file):
+            print(f"第 {shard_id} 片没有时间记录（进程可能异常退出）")
+            continue
+        with open(log_file, 'r', encoding='utf-8') as f:
+            records = json.load(f)
+        merged["files"].extend(records.get("files", []))
+        merged["sentences"] += records.get("sentences", 0)
+        merged["generated_sentences"] += records.get("generated_sentences", 0)
+        merged["generation_calls"] += records.get("generation_calls", 0)
+        for reason, count in records.get("generation_stats", {}).items():
+            merged["generation_stats"][reason] = merged["generation_stats"].get(reason, 0) + count
+        if "detector" in records:
+            detector = merged.setdefault("detector", {"threshold": records["detector"]["threshold"]})
+            for name in ("scored", "passed", "seconds"):
+                detector[name] = detector.get(name, 0) + records["detector"].get(name, 0)
+        if "routing" in records:
+            routing = merged.setdefault("routing", {"threshold": records["routing"]["threshold"],
+                                                    "route": records["routing"]["route"]})
+            for name in ("sentences", "confident", "skipped", "seconds"):
+                routing[name] = routing.get(name, 0) + records["routing"].get(name, 0)
+        if "cascade" in records:
+            cascade = merged.setdefault("cascade", {})
+            for name, value in records["cascade"].items():
+                cascade[name] = cascade.get(name, 0) + value
+        merged["shards"].append({
+            "shard": shard_id,
+            "files": len(records.get("files", [])),
+            "sentences": records.get("sentences", 0),
+            "total_duration": records.get("total_duration", 0),
+            "generation_seconds": records.get("generation_seconds", 0),
+            "sentences_per_second": records.get("sentences_per_second", 0),
+            "generation_utilisation": records.get("pipeline", {}).get("generation_utilisation", 0),
+        })
+        os.remove(log_file)
+
+    merged["batch_size"] = records.get("batch_size") if merged["shards"] else None
+    merged["window_tokens"] = records.get("window_tokens") if merged["shards"] else None
+    merged["sentences_per_second"] = merged["generated_sentences"] / wall_seconds if wall_seconds > 0 else 0.0
+    tmp_file = output_file + '.tmp'
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        json.dump(merged, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_file, output_file)
+    return merged
+
+
+def run_sharded(args, num_workers):
+    """
+    分片并行纠错
+
+    Returns:
+        合并后的时间记录
+    """
+    from batch_corrector import resolve_input_path
+
+    args.input_dir = resolve_input_path(args.input_dir)
+    weights = document_weights(args.input_dir, args.balance, args.model_path)
+    shards = shard_documents(weights, num_workers)
+    assignments = assign_devices(num_workers, args.devices)
+    os.makedirs(args.output_dir, exist_ok=True)
+
+    for shard_id, (doc_ids, (gpu, cpu_set)) in enumerate(zip(shards, assignments)):
+        device = f"GPU {gpu}" if gpu else f"CPU核心 {cpu_set[0]}-{cpu_set[-1]}"
+        print(f"第 {shard_id} 片: {len(doc_ids)} 个文件, 工作量 {sum(weights[d] for d in doc_ids)} ({args.balance}), {device}")
+
+    start_time = time.time()
+    context = multiprocessing.get_context('spawn')
+    processes = []
+    for shard_id, (doc_ids, (gpu, cpu_set)) in enumerate(zip(shards, assignments)):
+        process = context.Process(target=_run_shard, args=(shard_id, doc_ids, args, gpu, cpu_set))
+        process.start()
+        processes.append(process)
+    for process in processes:
+        process.join()
+    wall_seconds = time.time() - start_time
+
+    failed = [shard_id for shard_id, process in enumerate(processes) if process.exitcode != 0]
+    if failed:
+        print(f"以下分片异常退出: {failed}，可加 --resume 重新运行")
+    return merge_time_logs(num_workers, wall_seconds, start_time, args.time_log_file)
+
+
+def parse_args():
+    from batch_corrector import add_corrector_args
+
+    parser = argparse.ArgumentParser(description='多进程数据并行纠错')
+    add_corrector_args(parser)
+    parser.add_argument('--num_workers', type=int, default=2, help='进程数（每个进程一份模型）')
+    parser.add_argument('--balance', type=str, default='sentences', choices=['sentences', 'tokens'],
+                        help='分片时按句子数或token数均衡')
+    parser.add_argument('--devices', type=str, default=None, help='逗号分隔的GPU编号，不指定时使用CPU并按核心划分')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    merged = run_sharded(args, args.num_workers)
+    print(f"\n全部分片完成！")
+    print(f"总处理时间: {merged['total_duration']:.2f} 秒")
+    print(f"吞吐量: {merged['sentences_per_second']:.2f} 句/秒 ({merged['workers']} 个进程)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+流式增量清洗
+不必等待字符解析阶段全部结束：逐个消费OCR解析结果，清洗分句后立即产出，
+下游（纠错）可以先处理已经完成的文档。
+
+三种输入方式：
+1. wash_stream(records)：records为解析结果的迭代器或queue.Queue（以None结束）
+2. --watch：监听ocr_summary目录，新的 *_results.json 出现后立即清洗
+3. --from_ocr_output：在同一进程中边解析OCR输出边清洗，不落地ocr_summary
+"""
+
+import argparse
+import os
+import queue
+import time
+
+from data_washer import PaddleTextWasher, WashedOutput, list_input_files
+from washed_store import COMPACT_FORMAT, LEGACY_FORMAT
+
+
+def iter_queue(records_queue, sentinel=None):
+    """从队列中逐个取出记录，直到取到sentinel"""
+    while True:
+        record = records_queue.get()
+        if record is sentinel:
+            return
+        yield record
+
+
+def wash_stream(records, washer=None):
+    """
+    逐个清洗OCR解析结果
+
+    Args:
+        records: 解析结果（含doc_id和results）的可迭代对象，或以None结束的queue.Queue
+        washer: PaddleTextWasher实例，默认新建
+
+    Yields:
+        (doc_id, WashedDocument)，每处理完一个文档立即产出
+    """
+    washer = washer or PaddleTextWasher()
+    if isinstance(records, queue.Queue):
+        records = iter_queue(records)
+
+    for record in records:
+        document = washer.load_record(record)
+        yield document["img_id"], washer.build_washed_document(document)
+
+
+def watch_directory(input_dir, poll_interval=1.0, idle_timeout=None):
+    """
+    监听目录，按出现顺序产出新的 *_results.json 路径
+
+    字符解析阶段以“临时文件+改名”的方式写入，产出的文件都是完整的。
+
+    Args:
+        poll_interval: 轮询间隔（秒）
+        idle_timeout: 连续多少秒没有新文件后结束，None表示一直监听
+    """
+    seen = set()
+    last_new_file = time.monotonic()
+    while True:
+        new_files = [path for path in list_input_files(input_dir) if path not in seen] \
+            if os.path.isdir(input_dir) else []
+        for path in new_files:
+            seen.add(path)
+            yield path
+
+        if new_files:
+            last_new_file = time.monotonic()
+        elif idle_timeout is not None and time.monotonic() - last_new_file >= idle_timeout:
+            return
+        else:
+            time.sleep(poll_interval)
+
+
+def wash_watched_directory(input_dir, output, washer=None, poll_interval=1.0, idle_timeout=None):
+    """
+    监听ocr_summary目录并增量清洗，结果按output的格式保存
+
+    Returns:
+        成功处理的文档数
+    """
+    washer = washer or PaddleTextWasher()
+    done = 0
+    start_time = time.perf_counter()
+    for input_file in watch_directory(input_dir, poll_interval, idle_timeout):
+        try:
+            document = washer.load_document(input_file)
+            output.save(document["img_id"], output.build(washer, document))
+            done += 1
+            elapsed = time.perf_counter() - start_time
+            print(f"已清洗: {document['img_id']} (共 {done} 个, {done / elapsed:.1f} 文件/秒)")
+        except Exception as e:
+            print(f"处理文件 {input_file} 时出错: {str(e)}")
+    return done
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='流式增量清洗OCR解析结果')
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument('--watch', type=str, nargs='?', const="data/paddleocr_version/ocr_summary", default=None,
+                        help='监听ocr_summary目录（默认data/paddleocr_version/ocr_summary）')
+    source.add_argument('--from_ocr_output', type=str, nargs='?', const="data/paddleocr_version/ocr_output",
+                        default=None, help='直接解析OCR输出目录并清洗，不写ocr_summary')
+    parser.add_argument('--parse_workers', type=int, default=1, help='--from_ocr_output时的解析进程数')
+    parser.add_argument('--poll_interval', type=float, default=1.0, help='监听目录的轮询间隔（秒）')
+    parser.add_argument('--idle_timeout', type=float, default=None, help='连续多少秒没有新文件后退出，默认一直监听')
+    parser.add_argument('--output_format', type=str, default=COMPACT_FORMAT, choices=[COMPACT_FORMAT, LEGACY_FORMAT])
+    parser.add_argument('--washed_dir', type=str, default="data/paddleocr_version/washed")
+    parser.add_argument('--batch_file', type=str, default=None, help='紧凑格式下把所有文档写入同一个 .jsonl 文件')
+    parser.add_argument('--bbox_washed_dir', type=str, default="data/paddleocr_version/bbox_washed")
+    parser.add_argument('--ocr_washed_dir', type=str, default="data/paddleocr_version/ocr_washed")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    output = WashedOutput(args.output_format, args.washed_dir, args.bbox_washed_dir, args.ocr_washed_dir,
+                          args.batch_file)
+    output.makedirs()
+    washer = PaddleTextWasher()
+
+    try:
+        if args.from_ocr_output:
+            from ocr_char_parser import iter_parsed_documents
+
+            records = iter_parsed_documents(args.from_ocr_output, workers=args.parse_workers)
+            done = 0
+            for record in records:
+                img_id = str(record.get('doc_id', ''))
+                try:
+                    document = washer.load_record(record, img_id)
+                    output.save(img_id, output.build(washer, document))
+                    done += 1
+                    print(f"已清洗: {img_id} (共 {done} 个)")
+                except Exception as e:
+                    print(f"处理文档 {img_id} 时出错: {str(e)}")
+        else:
+            wash_watched_directory(args.watch or "data/paddleocr_version/ocr_summary", output, washer,
+                                   args.poll_interval, args.idle_timeout)
+    except KeyboardInterrupt:
+        print("\n已停止监听")
+    finally:
+        output.close()
+
+
+if __name__ == "__main__":
+    main()
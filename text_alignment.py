@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+原文与纠错结果的字符对齐（difflib）
+用于把整段纠错结果按原文的句子边界切回各句，以及生成每句的编辑列表
+"""
+
+import difflib
+
+
+def alignment_map(source, target):
+    """
+    原文每个位置（0..len(source)）在纠错结果中的对应位置
+
+    替换部分按比例映射；插入部分归到前一段（如句末补的标点），开头的插入归到第一段
+    """
+    mapping = [0] * (len(source) + 1)
+    matcher = difflib.SequenceMatcher(None, source, target, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if i1 == i2:
+            # 插入：位置i1之前的一段延伸到插入内容之后
+            if i1 > 0:
+                mapping[i1] = j2
+            continue
+        for k in range(i1, i2 + 1):
+            if tag == 'equal':
+                mapping[k] = j1 + k - i1
+            else:
+                mapping[k] = j1 + round((k - i1) * (j2 - j1) / (i2 - i1))
+    mapping[0] = 0
+    mapping[len(source)] = len(target)
+    return mapping
+
+
+def edit_spans(source, target):
+    """
+    原文到纠错结果的编辑列表
+
+    Returns:
+        [{"op": "replace"/"delete"/"insert", "source_span": [i1, i2], "target_span": [j1, j2]}, ...]，
+        区间为字符偏移（左闭右开）；插入的source_span为空区间，位置为插入点，删除的target_span同理
+    """
+    matcher = difflib.SequenceMatcher(None, source, target, autojunk=False)
+    return [{"op": tag, "source_span": [i1, i2], "target_span": [j1, j2]}
+            for tag, i1, i2, j1, j2 in matcher.get_opcodes() if tag != 'equal']
+
+
+def split_by_alignment(source, target, spans):
+    """
+    按原文中的区间切分纠错结果
+
+    Args:
+        spans: 原文中的 [(start, end), ...]
+
+    Returns:
+        每个区间对应的纠错结果片段
+    """
+    mapping = alignment_map(source, target)
+    return [target[mapping[start]:mapping[end]] for start, end in spans]
+
+
+def segment_spans(text, separator=' '):
+    """
+    按分隔符切分文本，返回各段在文本中的区间
+
+    区间包含其后的分隔符，各区间首尾相接，分隔符被改写（如空格改为标点）时不会丢失；使用时自行去掉首尾空白
+    """
+    spans = []
+    start = 0
+    parts = text.split(separator)
+    for i, part in enumerate(parts):
+        end = start + len(part) + (len(separator) if i < len(parts) - 1 else 0)
+        spans.append((start, end))
+        start = end
+    return spans
@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+清洗结果的紧凑存储格式及读取接口
+
+每个文档只保存一次全文，字符框保存为数组，句子保存为全文中的偏移区间：
+    {
+        "path": "2097",
+        "text": "清洗后的全文",
+        "boxes": [[x1, y1, x2, y2], ...],   # 与text逐字符对应
+        "sentences": [[start, end], ...],   # 句子文本为 text[start:end].strip()
+        "confidences": [0.99, ...]          # 可选，与text逐字符对应的OCR行识别置信度，未知为null
+    }
+
+可以每个文档一个 .json 文件，也可以一批文档写入一个 .jsonl 文件（每行一个文档）。
+读取接口同时兼容旧的 ocr_washed / bbox_washed 文件。
+"""
+
+import os
+
+import json_codec
+
+COMPACT_FORMAT = 'compact'
+LEGACY_FORMAT = 'legacy'
+
+
+class WashedDocument:
+    """单个文档的清洗结果"""
+
+    def __init__(self, path, text, boxes, spans, sentence_texts=None, confidences=None):
+        self.path = path
+        self.text = text
+        self.boxes = boxes
+        self.spans = spans
+        # 每个字符所在OCR行的识别置信度，没有时为None
+        self.confidences = confidences
+        # 旧格式只有句子文本，没有全文和偏移
+        self._sentence_texts = sentence_texts
+
+    @classmethod
+    def from_record(cls, record):
+        """从紧凑格式或旧格式（ocr_washed / bbox_washed）的字典构建"""
+        if 'boxes' in record:
+            return cls(record['path'], record['text'], record['boxes'], [tuple(span) for span in record['sentences']],
+                       confidences=record.get('confidences'))
+
+        if 'washed_text_list' in record:
+            sentence_texts = [item['sentence'] for item in record['washed_text_list']]
+            return cls(record['path'], ''.join(sentence_texts), None, None, sentence_texts)
+
+        # bbox_washed：把每句的字符重新拼成全文和偏移
+        text_parts, boxes, spans, sentence_texts, confidences = [], [], [], [], []
+        offset = 0
+        for sentence in record.get('sentences', []):
+            chars = sentence.get('chars', [])
+            text_parts.extend(char_info['char'] for char_info in chars)
+            boxes.extend(char_info['bbox'] for char_info in chars)
+            confidences.extend(char_info.get('confidence') for char_info in chars)
+            spans.append((offset, offset + len(chars)))
+            sentence_texts.append(sentence['sentence'])
+            offset += len(chars)
+        return cls(record['path'], ''.join(text_parts), boxes, spans, sentence_texts,
+                   _known_confidences(confidences))
+
+    @classmethod
+    def from_chars(cls, path, chars, spans):
+        """由清洗后的字符列表和句子区间构建（字符列表中每项为单个字符）"""
+        text = ''.join(char_info['char'] for char_info in chars)
+        boxes = [char_info['bbox'] for char_info in chars]
+        confidences = _known_confidences([char_info.get('confidence') for char_info in chars])
+        # 去掉首尾空白后为空的句子不保存，与旧格式保持一致
+        spans = [(start, end) for start, end in spans if text[start:end].strip()]
+        return cls(path, text, boxes, spans, confidences=confidences)
+
+    def to_record(self):
+        """转换为紧凑格式的字典"""
+        record = {
+            "path": self.path,
+            "text": self.text,
+            "boxes": self.boxes,
+            "sentences": [list(span) for span in self.spans],
+        }
+        if self.confidences is not None:
+            record["confidences"] = self.confidences
+        return record
+
+    @property
+    def has_boxes(self):
+        return self.boxes is not None
+
+    def sentences(self):
+        """按顺序返回所有句子文本，下标即sentence_id"""
+        if self._sentence_texts is not None:
+            return list(self._sentence_texts)
+        return [self.text[start:end].strip() for start, end in self.spans]
+
+    def sentence_confidence(self, sentence_id):
+        """
+        句子中字符所在OCR行置信度的最小值
+
+        没有置信度、或句中有字符的置信度未知（如表格识别结果）时返回None
+        """
+        if self.confidences is None or self.spans is None:
+            return None
+        start, end = self.spans[sentence_id]
+        values = [self.confidences[i] for i in range(start, end) if self.text[i].strip()]
+        if not values or any(value is None for value in values):
+            return None
+        return min(values)
+
+    def sentence_chars(self, sentence_id):
+        """返回句子对应的字符和bbox，格式与旧bbox_washed中的chars相同"""
+        if not self.has_boxes:
+            return []
+        start, end = self.spans[sentence_id]
+        return [{"char": self.text[i], "bbox": self.boxes[i]} for i in range(start, end)]
+
+    def to_ocr_washed(self):
+        """转换为旧的ocr_washed格式"""
+        return {
+            "path": self.path,
+            "washed_text_list": [
+                {"sentence_id": idx, "sentence": sentence} for idx, sentence in enumerate(self.sentences())
+            ],
+        }
+
+    def to_bbox_washed(self):
+        """转换为旧的bbox_washed格式（text字段为清洗后的全文）"""
+        return {
+            "path": self.path,
+            "text": self.text,
+            "sentences": [
+                {"sentence_id": idx, "sentence": sentence, "chars": self.sentence_chars(idx)}
+                for idx, sentence in enumerate(self.sentences())
+            ],
+        }
+
+
+def _known_confidences(confidences):
+    """全部未知时返回None，不写入清洗结果"""
+    return confidences if any(value is not None for value in confidences) else None
+
+
+def load_washed_file(path, json_backend='auto'):
+    """读取单个文档的清洗结果文件（紧凑格式或旧格式）"""
+    return WashedDocument.from_record(json_codec.load_file(path, json_backend))
+
+
+def save_washed_file(document, path, json_backend='auto'):
+    """以紧凑格式保存单个文档，返回写入字节数"""
+    return json_codec.dump_file(document.to_record(), path, compact=True, backend=json_backend)
+
+
+class WashedBatchWriter:
+    """把多个文档的紧凑清洗结果追加写入同一个 .jsonl 文件"""
+
+    def __init__(self, path, json_backend='auto'):
+        self.path = path
+        self.json_backend = json_backend
+        self._file = open(path, 'wb')
+
+    def write(self, document):
+        data = json_codec.dumps(document.to_record(), compact=True, backend=self.json_backend)
+        self._file.write(data + b'\n')
+        return len(data) + 1
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class WashedStore:
+    """
+    按文档ID访问清洗结果
+
+    path可以是每个文档一个 .json 的目录（紧凑格式或旧格式），也可以是 .jsonl 批量文件。
+    """
+
+    def __init__(self, path, json_backend='auto'):
+        self.path = path
+        self.json_backend = json_backend
+        self._batch = None
+        if os.path.isfile(path):
+            self._batch = {}
+            with open(path, 'rb') as f:
+                for line in f:
+                    if line.strip():
+                        document = WashedDocument.from_record(json_codec.loads(line, json_backend))
+                        self._batch[str(document.path)] = document
+
+    def doc_ids(self):
+        """返回所有文档ID"""
+        if self._batch is not None:
+            return list(self._batch)
+        return sorted(filename[:-len('.json')] for filename in os.listdir(self.path) if filename.endswith('.json'))
+
+    def __contains__(self, doc_id):
+        if self._batch is not None:
+            return doc_id in self._batch
+        return os.path.exists(os.path.join(self.path, f"{doc_id}.json"))
+
+    def get(self, doc_id):
+        """读取文档，不存在时返回None"""
+        if self._batch is not None:
+            return self._batch.get(doc_id)
+        file_path = os.path.join(self.path, f"{doc_id}.json")
+        if not os.path.exists(file_path):
+            return None
+        return load_washed_file(file_path, self.json_backend)
+
+    def __iter__(self):
+        """按文档ID顺序返回 (doc_id, WashedDocument)"""
+        for doc_id in self.doc_ids():
+            yield doc_id, self.get(doc_id)